@@ -12,5 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'EventWall.settings')
+# Con ASGI servimos las variantes async de las vistas de lectura (views_async.py)
+os.environ.setdefault('EVENTWALL_VISTAS_ASYNC', '1')
+# Cada petición async usa un hilo distinto para el ORM: las conexiones
+# persistentes no se reutilizarían y se irían acumulando
+os.environ.setdefault('EVENTWALL_DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,24 @@
+"""
+Ajustes de EventWall divididos por entorno:
+
+- base.py: lo común.
+- dev.py: desarrollo (DEBUG, caché en memoria, tareas en línea).
+- prod.py: producción (conexiones persistentes, plantillas cacheadas,
+  sesiones cached_db, caché compartida, estáticos con hash).
+
+DJANGO_SETTINGS_MODULE sigue siendo "EventWall.settings"; el perfil se
+elige con EVENTWALL_ENTORNO=dev|prod. También se puede apuntar directamente
+a EventWall.settings.prod.
+"""
+import os
+
+ENTORNO = os.environ.get("EVENTWALL_ENTORNO", "dev")
+
+if ENTORNO == "prod":
+    from .prod import *  # noqa: F401,F403
+elif ENTORNO == "dev":
+    from .dev import *  # noqa: F401,F403
+else:
+    from django.core.exceptions import ImproperlyConfigured
+
+    raise ImproperlyConfigured(f"EVENTWALL_ENTORNO desconocido: {ENTORNO!r} (dev o prod)")
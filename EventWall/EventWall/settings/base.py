@@ -0,0 +1,199 @@
+"""
+Django settings for EventWall project: lo común a todos los entornos.
+
+dev.py y prod.py parten de aquí; __init__.py elige uno según
+EVENTWALL_ENTORNO ("dev" por defecto, "prod" en producción). Lo que cambia
+entre máquinas (base de datos, caché, correo, secretos) se lee del entorno.
+
+Generated by 'django-admin startproject' using Django 5.2.8.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/5.2/ref/settings/
+"""
+
+import os
+from pathlib import Path
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'appEventWall'
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'appEventWall.replicas.ReplicasMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'EventWall.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # La carpeta de plantillas se llama 'Templates' (con mayúscula), así que
+        # APP_DIRS no la encuentra en sistemas de archivos sensibles a mayúsculas.
+        'DIRS': [BASE_DIR / 'appEventWall' / 'Templates'],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'EventWall.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        "ENGINE": os.environ.get("EVENTWALL_DB_ENGINE", "django.db.backends.mysql"),
+        "NAME": os.environ.get("EVENTWALL_DB_NAME", "eventwall"),
+        "USER": os.environ.get("EVENTWALL_DB_USER", "DAOZ"),
+        "PASSWORD": os.environ.get("EVENTWALL_DB_PASSWORD", "12345"),
+        "HOST": os.environ.get("EVENTWALL_DB_HOST", "127.0.0.1"),
+        "PORT": os.environ.get("EVENTWALL_DB_PORT", "3306"),
+    }
+}
+
+# Réplicas de lectura (appEventWall/replicas.py): mismas credenciales que la
+# primaria en otros hosts, p.ej. EVENTWALL_DB_HOSTS_REPLICAS=10.0.0.2,10.0.0.3:3307
+EVENTWALL_DB_REPLICAS = []
+for _n, _host in enumerate(filter(None, os.environ.get("EVENTWALL_DB_HOSTS_REPLICAS", "").split(",")), 1):
+    _host, _, _puerto = _host.strip().partition(":")
+    DATABASES[f"replica{_n}"] = {
+        **DATABASES["default"],
+        "HOST": _host,
+        "PORT": _puerto or DATABASES["default"]["PORT"],
+        # En los tests la réplica es la misma base de datos que la primaria
+        "TEST": {"MIRROR": "default"},
+    }
+    EVENTWALL_DB_REPLICAS.append(f"replica{_n}")
+
+DATABASE_ROUTERS = ['appEventWall.replicas.RouterReplicas']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+def caches_desde_url(url):
+    """
+    CACHES a partir de EVENTWALL_CACHE_URL:
+    locmem://, redis://host:puerto/db (paquete redis) o
+    memcached://host:puerto (paquete pymemcache).
+    """
+    if url.startswith(("redis://", "rediss://")):
+        default = {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": url}
+    elif url.startswith("memcached://"):
+        default = {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": url.removeprefix("memcached://"),
+        }
+    elif url.startswith("locmem://"):
+        default = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    else:
+        raise ValueError(f"EVENTWALL_CACHE_URL no reconocida: {url!r}")
+    default["KEY_PREFIX"] = "eventwall"
+    return {"default": default}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/5.2/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/5.2/howto/static-files/
+
+STATIC_URL = 'static/'
+# Destino de collectstatic (en producción se sirve desde aquí)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Archivos subidos (Profile.foto y sus miniaturas, ver appEventWall/miniaturas.py)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+LOGIN_URL = '/login/'
+LOGIN_REDIRECT_URL = '/'
+
+# Vistas de lectura async (appEventWall/views_async.py). asgi.py lo activa
+# por defecto; con WSGI se quedan las síncronas.
+EVENTWALL_VISTAS_ASYNC = os.environ.get("EVENTWALL_VISTAS_ASYNC") == "1"
+
+# Pub/sub de los cambios en vivo (SSE, appEventWall/en_vivo.py): "memoria"
+# vale con un solo proceso; con varios workers hace falta "redis".
+EVENTWALL_EN_VIVO_BACKEND = os.environ.get("EVENTWALL_EN_VIVO_BACKEND", "memoria")
+EVENTWALL_REDIS_URL = os.environ.get("EVENTWALL_REDIS_URL", "redis://localhost:6379/0")
+
+# Cola de tareas (appEventWall/tareas.py). "1": se ejecutan en la misma
+# petición (desarrollo, tests). En producción "0" y manage.py run_worker.
+EVENTWALL_TAREAS_EN_LINEA = os.environ.get("EVENTWALL_TAREAS_EN_LINEA", "1") == "1"
+
+# Correo (resúmenes de notificaciones, appEventWall/notificaciones.py). Por
+# defecto no se envía nada: cada correo queda como archivo en EMAIL_FILE_PATH.
+# Para SMTP real: EVENTWALL_EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend
+# y EMAIL_HOST/EMAIL_PORT/... en el entorno.
+EMAIL_BACKEND = os.environ.get("EVENTWALL_EMAIL_BACKEND", "django.core.mail.backends.filebased.EmailBackend")
+EMAIL_FILE_PATH = BASE_DIR / "correos"
+EMAIL_HOST = os.environ.get("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.environ.get("EMAIL_PORT", 25))
+EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS") == "1"
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "EventWall <no-responder@eventwall.local>")
@@ -0,0 +1,12 @@
+"""Ajustes de desarrollo: runserver, DEBUG y todo en el mismo proceso."""
+from .base import *  # noqa: F401,F403
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = 'django-insecure-_p2a+)gclwl)&sua00c^n5+5#c#m$d06d=lpxn+k=pater3b)w'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = True
+
+ALLOWED_HOSTS = []
+
+CACHES = caches_desde_url(os.environ.get("EVENTWALL_CACHE_URL", "locmem://"))
@@ -0,0 +1,85 @@
+"""
+Ajustes de producción. Todo lo específico de la máquina viene del entorno:
+
+    EVENTWALL_ENTORNO=prod
+    EVENTWALL_SECRET_KEY=...            (obligatoria)
+    EVENTWALL_ALLOWED_HOSTS=eventwall.example.com,www.eventwall.example.com
+    EVENTWALL_DB_NAME / _USER / _PASSWORD / _HOST / _PORT
+    EVENTWALL_DB_HOSTS_REPLICAS=10.0.0.2,10.0.0.3   (opcional, réplicas de lectura)
+    EVENTWALL_CACHE_URL=redis://127.0.0.1:6379/1
+
+Antes de arrancar: manage.py collectstatic (los estáticos llevan hash en el
+nombre y van comprimidos, ver STORAGES) y manage.py run_worker para la cola de tareas.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+
+try:
+    SECRET_KEY = os.environ["EVENTWALL_SECRET_KEY"]
+except KeyError:
+    raise ImproperlyConfigured("En producción hay que definir EVENTWALL_SECRET_KEY.")
+
+DEBUG = False
+
+ALLOWED_HOSTS = [h.strip() for h in os.environ.get("EVENTWALL_ALLOWED_HOSTS", "").split(",") if h.strip()]
+
+# Conexiones persistentes: sin esto cada petición abre y cierra su conexión
+# a MySQL. CONN_HEALTH_CHECKS comprueba al reutilizarla que sigue viva (p.ej.
+# tras un reinicio de MySQL o wait_timeout) en vez de fallar la petición.
+# Con ASGI cada petición va en su propio hilo y las conexiones persistentes se
+# acumulan, así que asgi.py pone EVENTWALL_DB_CONN_MAX_AGE=0.
+DATABASES = {
+    alias: {
+        **db,
+        'CONN_MAX_AGE': int(os.environ.get("EVENTWALL_DB_CONN_MAX_AGE", 300)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+    for alias, db in DATABASES.items()
+}
+
+# Plantillas compiladas una vez por proceso y sin volver a mirar el disco.
+# Con 'loaders' explícito APP_DIRS tiene que ser False.
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+# Caché compartida entre workers: cache_muro, membresías y el contador de
+# versiones tienen que verse igual desde todos los procesos.
+CACHES = caches_desde_url(os.environ.get("EVENTWALL_CACHE_URL", EVENTWALL_REDIS_URL))
+
+# La sesión se lee de la caché y solo se escribe en la base de datos al cambiar
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# collectstatic copia los estáticos con el hash del contenido en el nombre
+# (home.3f2a9c.css), minifica el CSS y guarda versiones .gz/.br; el
+# middleware los sirve con caché de un año (appEventWall/estaticos.py).
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'appEventWall.estaticos.EstaticosComprimidos'},
+}
+MIDDLEWARE = [
+    MIDDLEWARE[0],  # SecurityMiddleware
+    'appEventWall.estaticos.EstaticosMiddleware',
+    *MIDDLEWARE[1:],
+]
+
+# Detrás de un proxy HTTPS. EVENTWALL_HTTPS=0 para probar en local sin TLS.
+https = os.environ.get("EVENTWALL_HTTPS", "1") == "1"
+SESSION_COOKIE_SECURE = https
+CSRF_COOKIE_SECURE = https
+if https:
+    SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+
+# En producción las tareas van a run_worker, salvo que se diga lo contrario
+EVENTWALL_TAREAS_EN_LINEA = os.environ.get("EVENTWALL_TAREAS_EN_LINEA", "0") == "1"
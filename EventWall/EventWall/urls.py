@@ -15,8 +15,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+from django.conf import settings
+from django.conf.urls.static import static
 from django.urls import path
-from appEventWall import views
+from appEventWall import api, views, views_async
 
 urlpatterns = [
     # ---------------- AUTENTICACIÓN ----------------
@@ -26,10 +28,17 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('logout/', views.logout_view, name='logout'),
     path('perfil/', views.perfil_view, name='perfil'),
+    path('notificaciones/', views.notificaciones_view, name='notificaciones'),
+    path(
+        'usuarios/<int:user_id>/foto/<str:tamano>.<str:formato>',
+        views.miniatura_perfil,
+        name='miniatura_perfil'
+    ),
 
     # ---------------- EVENTOS ----------------
     path('eventosLista/', views.eventos_list, name='eventos_list'),
     path('eventos/nuevo/', views.evento_crear, name='evento_crear'),
+    path('eventos/proximos/', views.eventos_proximos, name='eventos_proximos'),
     path('eventos/<int:pk>/', views.evento_detalle, name='evento_detalle'),
     path('eventos/<int:pk>/editar/', views.evento_editar, name='evento_editar'),
     path('eventos/<int:pk>/eliminar/', views.evento_eliminar, name='evento_eliminar'),
@@ -65,10 +74,70 @@ urlpatterns = [
         name="salir_comunidad"
     ),
 
+    # Exportar eventos de la comunidad
+    path(
+        "comunidades/<int:pk>/eventos.csv",
+        views.comunidad_eventos_csv,
+        name="comunidad_eventos_csv"
+    ),
+    path(
+        "comunidades/<int:pk>/eventos.ics",
+        views.comunidad_eventos_ics,
+        name="comunidad_eventos_ics"
+    ),
+
+    # Calendario de la comunidad (mes y semana)
+    path(
+        "comunidades/<int:pk>/calendario/",
+        views.comunidad_calendario,
+        name="comunidad_calendario"
+    ),
+    path(
+        "comunidades/<int:pk>/calendario/<int:anio>/<int:mes>/",
+        views.comunidad_calendario,
+        name="comunidad_calendario_mes"
+    ),
+    path(
+        "comunidades/<int:pk>/calendario/semana/",
+        views.comunidad_semana,
+        name="comunidad_semana"
+    ),
+
+    # Cambios en vivo de los eventos (SSE, siempre async)
+    path(
+        "comunidades/<int:pk>/eventos/stream/",
+        views_async.comunidad_eventos_stream,
+        name="comunidad_eventos_stream"
+    ),
+
     # Lista de miembros
     path(
         "comunidades/<int:pk>/miembros/",
         views.comunidad_miembros,
         name="comunidad_miembros"
     ),
-]
\ No newline at end of file
+
+    # ---------------- API JSON (solo lectura) ----------------
+    path("api/eventos/", api.eventos, name="api_eventos"),
+    path("api/eventos/<int:pk>/", api.evento, name="api_evento"),
+    path("api/comunidades/", api.comunidades, name="api_comunidades"),
+    path("api/comunidades/autocompletar/", api.comunidades_autocompletar, name="api_comunidades_autocompletar"),
+    path("api/comunidades/<int:pk>/", api.comunidad, name="api_comunidad"),
+]
+
+# Fotos subidas y sus miniaturas (solo con DEBUG; en producción las sirve el servidor web)
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+
+def con_vistas_async(patrones):
+    """Mismas rutas, con la variante de views_async en las vistas de lectura."""
+    return [
+        path(str(p.pattern), getattr(views_async, p.callback.__name__), name=p.name)
+        if getattr(p, "callback", None) and p.callback.__name__ in views_async.VISTAS
+        else p
+        for p in patrones
+    ]
+
+
+if settings.EVENTWALL_VISTAS_ASYNC:
+    urlpatterns = con_vistas_async(urlpatterns)
@@ -0,0 +1,245 @@
+"""
+API JSON de solo lectura para eventos y comunidades.
+
+- Paginación por cursor (?after=, ?page_size=) igual que las vistas HTML.
+- ?fields=titulo,fecha,... elige las columnas: se piden con .values(), así
+  que no se crean instancias del modelo ni viajan columnas que nadie usa.
+- ETag fuerte + Cache-Control. En eventos el ETag sale de las versiones de
+  cache_muro (un 304 no toca la base de datos); en comunidades se calcula
+  sobre el cuerpo, porque lleva datos por usuario (es_miembro).
+- Mismas reglas de acceso que las vistas: hay que iniciar sesión, y
+  es_miembro sale del set cacheado que usa Comunidad.es_miembro.
+- comunidades_autocompletar alimenta el selector de comunidad de
+  EventForm (ver membresias.sugerencias).
+"""
+import hashlib
+import json
+from datetime import date
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition, require_GET
+
+from .models import Comunidad, Evento
+from .paginacion import paginar_eventos, paginar_por_id
+from . import cache_muro, membresias
+
+# Segundos que el cliente puede reutilizar una respuesta sin revalidar
+MAX_AGE = getattr(settings, "EVENTWALL_API_MAX_AGE", 30)
+
+# Campo público -> columna. Las claves de la respuesta son las del campo público.
+CAMPOS_EVENTO = {
+    "id": "id",
+    "titulo": "titulo",
+    "descripcion": "descripcion",
+    "fecha": "fecha",
+    "hora": "hora",
+    "lugar": "lugar",
+    "tipo": "tipo",
+    "recurrencia": "recurrencia",
+    "comunidad": "comunidad_id",
+    "creado_por": "creado_por_id",
+}
+CAMPOS_COMUNIDAD = {
+    "id": "id",
+    "nombre": "nombre",
+    "descripcion": "descripcion",
+    "propietario": "propietario_id",
+    "creada_en": "creada_en",
+    "num_miembros": "num_miembros",
+    "num_eventos": "num_eventos",
+    "es_miembro": None,  # calculado con el set de membresías del usuario
+}
+
+# Columnas que necesita la paginación aunque no se pidan
+CURSOR_EVENTO = ("id", "fecha", "hora")
+
+TIPOS = {valor for valor, _ in Evento.TIPO_CHOICES}
+
+
+class ErrorAPI(Exception):
+    """Parámetro inválido: se responde 400 con el mensaje."""
+
+
+def error(mensaje, status=400):
+    return JsonResponse({"error": mensaje}, status=status)
+
+
+def api_view(vista):
+    """GET con sesión iniciada; 401/400 en JSON en vez de redirigir al login."""
+
+    @require_GET
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error("Autenticación requerida.", status=401)
+        try:
+            response = vista(request, *args, **kwargs)
+        except ErrorAPI as e:
+            return error(str(e))
+        except Http404:
+            return error("No encontrado.", status=404)
+        patch_cache_control(response, private=True, max_age=MAX_AGE)
+        patch_vary_headers(response, ("Cookie",))
+        return response
+
+    return envoltura
+
+
+# ---------------- Parámetros ----------------
+
+
+def campos_pedidos(request, disponibles):
+    """Lista de campos de ?fields= (todos si no viene), validada contra 'disponibles'."""
+    valor = request.GET.get("fields", "").strip()
+    if not valor:
+        return list(disponibles)
+    pedidos = list(dict.fromkeys(c.strip() for c in valor.split(",") if c.strip()))
+    desconocidos = [c for c in pedidos if c not in disponibles]
+    if desconocidos:
+        raise ErrorAPI(
+            f"Campos desconocidos: {', '.join(desconocidos)}. Disponibles: {', '.join(disponibles)}."
+        )
+    return pedidos
+
+
+def fecha_param(request, nombre):
+    valor = request.GET.get(nombre)
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ErrorAPI(f"'{nombre}' debe ser una fecha AAAA-MM-DD.")
+
+
+def entero_param(request, nombre):
+    valor = request.GET.get(nombre)
+    if not valor:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ErrorAPI(f"'{nombre}' debe ser un número entero.")
+
+
+def filtrar_eventos(request, queryset):
+    """?desde= / ?hasta= (incluidos), ?tipo=a,b y ?comunidad=<id>."""
+    desde, hasta = fecha_param(request, "desde"), fecha_param(request, "hasta")
+    if desde:
+        queryset = queryset.filter(fecha__gte=desde)
+    if hasta:
+        queryset = queryset.filter(fecha__lte=hasta)
+    tipos = [t for t in request.GET.get("tipo", "").split(",") if t]
+    if tipos:
+        if not TIPOS.issuperset(tipos):
+            raise ErrorAPI(f"'tipo' debe ser uno de: {', '.join(sorted(TIPOS))}.")
+        queryset = queryset.filter(tipo__in=tipos)
+    comunidad = entero_param(request, "comunidad")
+    if comunidad is not None:
+        queryset = queryset.filter(comunidad_id=comunidad)
+    return queryset
+
+
+# ---------------- Serialización ----------------
+
+
+def filas_a_json(filas, campos, columnas):
+    return [{campo: fila[columnas[campo]] for campo in campos} for fila in filas]
+
+
+def respuesta_json(datos):
+    cuerpo = json.dumps(datos, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return HttpResponse(cuerpo, content_type="application/json")
+
+
+def responder_con_etag(request, datos):
+    """ETag fuerte calculado sobre el cuerpo; 304 sin cuerpo si el cliente ya lo tiene."""
+    response = respuesta_json(datos)
+    response["ETag"] = '"%s"' % hashlib.sha1(response.content).hexdigest()
+    return get_conditional_response(request, etag=response["ETag"], response=response)
+
+
+# ---------------- Eventos ----------------
+
+
+def _etag_eventos(request, pk=None):
+    # Cualquier cambio en un evento sube la versión de la lista "todos" y la
+    # del propio evento, así que (versión, query string) identifica la respuesta.
+    par = ("evento", pk) if pk is not None else ("lista", "todos")
+    version = cache_muro.versiones([par])[par]
+    crudo = f"{par}:{version}:{request.GET.urlencode()}"
+    return hashlib.sha1(crudo.encode()).hexdigest()
+
+
+@api_view
+@condition(etag_func=_etag_eventos)
+def eventos(request):
+    campos = campos_pedidos(request, CAMPOS_EVENTO)
+    columnas = {CAMPOS_EVENTO[c] for c in campos} | set(CURSOR_EVENTO)
+    queryset = filtrar_eventos(request, Evento.objects.values(*columnas))
+    filas, siguiente = paginar_eventos(
+        queryset, after=request.GET.get("after"), page_size=request.GET.get("page_size")
+    )
+    # @condition añade el ETag de _etag_eventos a la respuesta
+    return respuesta_json({"resultados": filas_a_json(filas, campos, CAMPOS_EVENTO), "siguiente": siguiente})
+
+
+@api_view
+@condition(etag_func=_etag_eventos)
+def evento(request, pk):
+    campos = campos_pedidos(request, CAMPOS_EVENTO)
+    fila = Evento.objects.filter(pk=pk).values(*{CAMPOS_EVENTO[c] for c in campos}).first()
+    if fila is None:
+        raise Http404
+    return respuesta_json(filas_a_json([fila], campos, CAMPOS_EVENTO)[0])
+
+
+# ---------------- Comunidades ----------------
+
+
+def comunidades_a_json(request, filas, campos):
+    mias = membresias.comunidades_de(request.user) if "es_miembro" in campos else frozenset()
+    resultado = []
+    for fila in filas:
+        datos = {c: fila[CAMPOS_COMUNIDAD[c]] for c in campos if c != "es_miembro"}
+        if "es_miembro" in campos:
+            datos["es_miembro"] = fila["id"] in mias
+        resultado.append({c: datos[c] for c in campos})
+    return resultado
+
+
+def columnas_comunidad(campos):
+    return {CAMPOS_COMUNIDAD[c] for c in campos if CAMPOS_COMUNIDAD[c]} | {"id"}
+
+
+@api_view
+def comunidades(request):
+    """?miembro=1 limita a las comunidades propias o de las que se es miembro."""
+    campos = campos_pedidos(request, CAMPOS_COMUNIDAD)
+    queryset = Comunidad.objects.values(*columnas_comunidad(campos))
+    if request.GET.get("miembro") in ("1", "true"):
+        queryset = queryset.filter(pk__in=membresias.comunidades_de(request.user))
+    filas, siguiente = paginar_por_id(
+        queryset, after=request.GET.get("after"), page_size=request.GET.get("page_size")
+    )
+    return responder_con_etag(request, {"resultados": comunidades_a_json(request, filas, campos), "siguiente": siguiente})
+
+
+@api_view
+def comunidad(request, pk):
+    campos = campos_pedidos(request, CAMPOS_COMUNIDAD)
+    fila = Comunidad.objects.filter(pk=pk).values(*columnas_comunidad(campos)).first()
+    if fila is None:
+        raise Http404
+    return responder_con_etag(request, comunidades_a_json(request, [fila], campos)[0])
+
+
+@api_view
+def comunidades_autocompletar(request):
+    """?q=prefijo: comunidades propias o de las que se es miembro, por nombre."""
+    filas = membresias.sugerencias(request.user, request.GET.get("q", ""))
+    return respuesta_json({"resultados": [{"id": pk, "nombre": nombre} for pk, nombre in filas]})
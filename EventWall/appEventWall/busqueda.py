@@ -0,0 +1,205 @@
+"""
+Búsqueda de texto completo para Comunidad y Evento.
+
+Según el motor de base de datos se usa:
+- MySQL: índice FULLTEXT + MATCH ... AGAINST (lo mantiene el propio MySQL).
+- SQLite: tabla virtual FTS5 "sombra" (<tabla>_fts) sincronizada por señales.
+- Otro / sin índice: el filtro icontains de siempre.
+
+Todos los backends devuelven un QuerySet anotado con 'relevancia' y ordenado
+de más a menos relevante, para poder seguir encadenando filtros en la vista.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import IntegerField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Comunidad, Evento
+
+# Máximo de resultados rankeados que devuelve una búsqueda
+LIMITE_RESULTADOS = getattr(settings, "EVENTWALL_BUSQUEDA_LIMITE", 200)
+
+# Campos indexados por modelo (nombre del modelo en minúsculas)
+CAMPOS = {
+    "comunidad": ("nombre", "descripcion"),
+    "evento": ("titulo", "descripcion", "lugar"),
+}
+
+
+def terminos(q):
+    """Palabras de la consulta, sin operadores del motor de búsqueda."""
+    return re.findall(r"\w+", q or "")
+
+
+def campos_de(modelo):
+    return CAMPOS[modelo._meta.model_name]
+
+
+class BackendIcontains:
+    """LIKE '%q%' sobre todos los campos. Sin ranking real."""
+
+    nombre = "icontains"
+
+    def buscar(self, modelo, q):
+        palabras = terminos(q)
+        if not palabras:
+            return modelo.objects.none()
+        filtro = Q()
+        for campo in campos_de(modelo):
+            filtro |= Q(**{f"{campo}__icontains": q.strip()})
+        return modelo.objects.filter(filtro).annotate(relevancia=Value(0))
+
+    def indexar(self, instancia):
+        pass
+
+    def desindexar(self, instancia):
+        pass
+
+    def reconstruir(self, modelo):
+        pass
+
+    def indexar_desde(self, modelo, pk):
+        """Indexa las filas con id > pk (las de un bulk_create, que no dispara señales)."""
+        pass
+
+
+class BackendMySQL(BackendIcontains):
+    """MATCH ... AGAINST en modo booleano (prefijos, todas las palabras)."""
+
+    nombre = "mysql"
+
+    def buscar(self, modelo, q):
+        palabras = terminos(q)
+        if not palabras:
+            return modelo.objects.none()
+        columnas = ", ".join(campos_de(modelo))
+        consulta = " ".join(f"+{p}*" for p in palabras)
+        return (
+            modelo.objects.annotate(
+                relevancia=RawSQL(
+                    f"MATCH({columnas}) AGAINST (%s IN BOOLEAN MODE)", (consulta,)
+                )
+            )
+            .filter(relevancia__gt=0)
+            .order_by("-relevancia")
+        )
+
+
+class BackendSQLiteFTS5(BackendIcontains):
+    """Tabla FTS5 con rowid = pk del modelo, rankeada con bm25()."""
+
+    nombre = "fts5"
+
+    @staticmethod
+    def tabla(modelo):
+        return f"{modelo._meta.db_table}_fts"
+
+    def buscar(self, modelo, q):
+        palabras = terminos(q)
+        if not palabras:
+            return modelo.objects.none()
+        tabla = self.tabla(modelo)
+        consulta = " ".join('"%s"*' % p for p in palabras)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {tabla} WHERE {tabla} MATCH %s "
+                f"ORDER BY bm25({tabla}) LIMIT %s",
+                [consulta, LIMITE_RESULTADOS],
+            )
+            ids = [fila[0] for fila in cursor.fetchall()]
+        if not ids:
+            return modelo.objects.none()
+        # Posición de cada id en ",id1,id2,...," -> cuanto antes, más relevante.
+        # (Más barato que un CASE con una rama por id.)
+        orden = "," + ",".join(str(pk) for pk in ids) + ","
+        return (
+            modelo.objects.filter(pk__in=ids)
+            .annotate(
+                relevancia=RawSQL(
+                    f"-instr(%s, ',' || \"{modelo._meta.db_table}\".\"id\" || ',')",
+                    (orden,),
+                    output_field=IntegerField(),
+                )
+            )
+            .order_by("-relevancia")
+        )
+
+    def indexar(self, instancia):
+        modelo = type(instancia)
+        tabla = self.tabla(modelo)
+        campos = campos_de(modelo)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {tabla} WHERE rowid = %s", [instancia.pk])
+            cursor.execute(
+                f"INSERT INTO {tabla} (rowid, {', '.join(campos)}) "
+                f"VALUES (%s, {', '.join(['%s'] * len(campos))})",
+                [instancia.pk] + [getattr(instancia, c) or "" for c in campos],
+            )
+
+    def desindexar(self, instancia):
+        tabla = self.tabla(type(instancia))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {tabla} WHERE rowid = %s", [instancia.pk])
+
+    def reconstruir(self, modelo):
+        tabla = self.tabla(modelo)
+        columnas = ", ".join(campos_de(modelo))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {tabla}")
+            cursor.execute(
+                f"INSERT INTO {tabla} (rowid, {columnas}) "
+                f"SELECT id, {columnas} FROM {modelo._meta.db_table}"
+            )
+
+    def indexar_desde(self, modelo, pk):
+        tabla = self.tabla(modelo)
+        columnas = ", ".join(campos_de(modelo))
+        with connection.cursor() as cursor:
+            # Las que ya indexó una señal (eventos creados mientras tanto) se rehacen
+            cursor.execute(f"DELETE FROM {tabla} WHERE rowid > %s", [pk])
+            cursor.execute(
+                f"INSERT INTO {tabla} (rowid, {columnas}) "
+                f"SELECT id, {columnas} FROM {modelo._meta.db_table} WHERE id > %s",
+                [pk],
+            )
+
+
+BACKENDS = {
+    "icontains": BackendIcontains,
+    "mysql": BackendMySQL,
+    "fts5": BackendSQLiteFTS5,
+}
+
+
+# Backend ya resuelto por (alias, base de datos, setting)
+_backends = {}
+
+
+def obtener_backend():
+    """
+    Backend según settings.EVENTWALL_BUSQUEDA_BACKEND o, por defecto, según
+    el motor de la conexión. En SQLite se comprueba que exista la tabla FTS5
+    (puede faltar si SQLite se compiló sin FTS5). Se resuelve una sola vez.
+    """
+    nombre = getattr(settings, "EVENTWALL_BUSQUEDA_BACKEND", None)
+    clave = (connection.alias, connection.settings_dict["NAME"], nombre)
+    if clave not in _backends:
+        if nombre is None:
+            nombre = "icontains"
+            if connection.vendor == "mysql":
+                nombre = "mysql"
+            elif connection.vendor == "sqlite":
+                if BackendSQLiteFTS5.tabla(Comunidad) in connection.introspection.table_names():
+                    nombre = "fts5"
+        _backends[clave] = BACKENDS[nombre]()
+    return _backends[clave]
+
+
+def buscar_comunidades(q):
+    return obtener_backend().buscar(Comunidad, q)
+
+
+def buscar_eventos(q):
+    return obtener_backend().buscar(Evento, q)
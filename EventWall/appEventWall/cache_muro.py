@@ -0,0 +1,268 @@
+"""
+Caché del muro de eventos: fragmentos HTML por evento, listas de eventos
+por comunidad y la página de detalle de cada evento.
+
+Las claves llevan un número de versión que vive también en la caché
+("eventwall:v:<tipo>:<id>"). Las señales de Evento/Comunidad suben la
+versión (ver signals.py) y las entradas viejas simplemente dejan de
+leerse hasta que caducan. Lo que se guarda se lee de la primaria
+(replicas.en_primaria) para no cachear una réplica atrasada. Funciona igual
+con LocMem (tests) que con Redis/Memcached (producción). Los aciertos/fallos
+se cuentan en la propia caché para que se vean desde cualquier proceso
+(manage.py estadisticas_cache).
+
+Las variantes con prefijo "a" son para views_async. Los backends de caché
+de Django no son async de verdad (cada aget es un salto a un hilo), así
+que todas las lecturas de una llamada se agrupan en un solo sync_to_async.
+"""
+import copy
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Evento
+from .paginacion import obtener_tamano_pagina
+from .replicas import en_primaria
+
+TTL = getattr(settings, "EVENTWALL_CACHE_TTL", 60 * 60)
+
+ESPACIOS = ("fragmentos", "listas", "detalle", "calendario")
+
+# ---------------- Versiones ----------------
+
+
+def clave_version(tipo, pk):
+    return f"eventwall:v:{tipo}:{pk}"
+
+
+def versiones(pares):
+    """
+    {(tipo, pk): versión} con un solo get_many. Las que no existen se
+    inicializan con un valor basado en la hora, así una versión expulsada
+    de la caché nunca vuelve a coincidir con fragmentos antiguos.
+    """
+    claves = {par: clave_version(*par) for par in pares}
+    guardadas = cache.get_many(claves.values())
+    nuevas = {}
+    resultado = {}
+    for par, clave in claves.items():
+        if clave not in guardadas:
+            nuevas[clave] = guardadas[clave] = time.time_ns()
+        resultado[par] = guardadas[clave]
+    if nuevas:
+        cache.set_many(nuevas, None)
+    return resultado
+
+
+def subir_version(tipo, pk):
+    clave = clave_version(tipo, pk)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, time.time_ns(), None)
+
+
+# ---------------- Contadores ----------------
+
+
+def contar(espacio, aciertos=0, fallos=0):
+    for nombre, n in (("aciertos", aciertos), ("fallos", fallos)):
+        if n:
+            clave = f"eventwall:stats:{espacio}:{nombre}"
+            try:
+                cache.incr(clave, n)
+            except ValueError:
+                cache.set(clave, n, None)
+
+
+def estadisticas():
+    """{espacio: {"aciertos": n, "fallos": n}}"""
+    claves = [f"eventwall:stats:{e}:{n}" for e in ESPACIOS for n in ("aciertos", "fallos")]
+    valores = cache.get_many(claves)
+    return {
+        e: {n: valores.get(f"eventwall:stats:{e}:{n}", 0) for n in ("aciertos", "fallos")}
+        for e in ESPACIOS
+    }
+
+
+# ---------------- Listas de eventos ----------------
+
+
+def pagina(ambito, after, page_size, cargar):
+    """
+    Página de una lista de eventos ("todos" o "comunidad:<id>").
+    Guarda solo (id, creado_por_id, comunidad_id, fecha de la ocurrencia) de
+    cada evento y el cursor; la fecha es None salvo en los eventos
+    recurrentes (ver recurrencia.py). Devuelve (filas, siguiente,
+    eventos_cargados) donde eventos_cargados es un dict id -> Evento si hubo
+    que ir a la BD (None si fue un acierto).
+    """
+    clave, guardada = _leer_pagina(ambito, after, page_size)
+    if guardada is not None:
+        return guardada["filas"], guardada["siguiente"], None
+    with en_primaria():
+        eventos, siguiente = cargar()
+    filas = [fila(e) for e in eventos]
+    cache.set(clave, {"filas": filas, "siguiente": siguiente}, TTL)
+    return filas, siguiente, {e.id: e for e in eventos}
+
+
+async def apagina(ambito, after, page_size, cargar):
+    """pagina() para views_async: 'cargar' es una corrutina."""
+    clave, guardada = await sync_to_async(_leer_pagina)(ambito, after, page_size)
+    if guardada is not None:
+        return guardada["filas"], guardada["siguiente"], None
+    with en_primaria():
+        eventos, siguiente = await cargar()
+    filas = [fila(e) for e in eventos]
+    await cache.aset(clave, {"filas": filas, "siguiente": siguiente}, TTL)
+    return filas, siguiente, {e.id: e for e in eventos}
+
+
+def fila(evento):
+    return evento.id, evento.creado_por_id, evento.comunidad_id, evento.fecha if evento.recurrencia else None
+
+
+def _leer_pagina(ambito, after, page_size):
+    version = versiones([("lista", ambito)])[("lista", ambito)]
+    cursor = hashlib.sha1(after.encode()).hexdigest() if after else ""
+    clave = f"eventwall:pagina:{ambito}:{version}:{cursor}:{obtener_tamano_pagina(page_size)}"
+    guardada = cache.get(clave)
+    if guardada is not None:
+        contar("listas", aciertos=1)
+    else:
+        contar("listas", fallos=1)
+    return clave, guardada
+
+
+# ---------------- Fragmentos ----------------
+
+
+def tarjetas(plantilla, filas, eventos=None):
+    """
+    HTML de cada evento renderizado con 'plantilla', leyendo de la caché
+    todo lo posible en una sola ida (get_many). Las ocurrencias de un evento
+    recurrente tienen cada una su fragmento (cambia la fecha). Devuelve
+    dicts con id, creado_por_id y html, listos para la plantilla de la lista.
+    """
+    claves, html, faltan = _leer_fragmentos(plantilla, filas)
+    if faltan:
+        if eventos is None:
+            with en_primaria():
+                eventos = Evento.objects.select_related("comunidad").in_bulk({pk for pk, _ in faltan})
+        nuevos = _renderizar(plantilla, claves, faltan, eventos)
+        cache.set_many(nuevos, TTL)
+        html.update(nuevos)
+    return _con_html(filas, claves, html)
+
+
+async def atarjetas(plantilla, filas, eventos=None):
+    """tarjetas() para views_async (ain_bulk para los que faltan)."""
+    claves, html, faltan = await sync_to_async(_leer_fragmentos)(plantilla, filas)
+    if faltan:
+        if eventos is None:
+            with en_primaria():
+                eventos = await Evento.objects.select_related("comunidad").ain_bulk({pk for pk, _ in faltan})
+        nuevos = _renderizar(plantilla, claves, faltan, eventos)
+        await cache.aset_many(nuevos, TTL)
+        html.update(nuevos)
+    return _con_html(filas, claves, html)
+
+
+def _leer_fragmentos(plantilla, filas):
+    """(claves por (id, fecha de la ocurrencia), html ya cacheado, (id, fecha) que faltan)."""
+    pares = {("evento", pk) for pk, _, _, _ in filas}
+    pares |= {("comunidad", cid) for _, _, cid, _ in filas if cid}
+    v = versiones(pares)
+    claves = {
+        (pk, fecha): f"eventwall:frag:{plantilla}:{pk}:{v[('evento', pk)]}:{v.get(('comunidad', cid), 0)}"
+        + (f":{fecha.isoformat()}" if fecha else "")
+        for pk, _, cid, fecha in filas
+    }
+    html = cache.get_many(claves.values())
+    faltan = [par for par, clave in claves.items() if clave not in html]
+    contar("fragmentos", aciertos=len(claves) - len(faltan), fallos=len(faltan))
+    return claves, html, faltan
+
+
+def _ocurrencia(evento, fecha):
+    if fecha is None or evento.fecha == fecha:
+        return evento
+    ocurrencia = copy.copy(evento)
+    ocurrencia.fecha = fecha
+    return ocurrencia
+
+
+def _renderizar(plantilla, claves, faltan, eventos):
+    return {
+        claves[pk, fecha]: render_to_string(plantilla, {"evento": _ocurrencia(eventos[pk], fecha)})
+        for pk, fecha in faltan
+        if pk in eventos
+    }
+
+
+def _con_html(filas, claves, html):
+    return [
+        {"id": pk, "creado_por_id": creado_por_id, "html": mark_safe(html[claves[pk, fecha]])}
+        for pk, creado_por_id, _, fecha in filas
+        if claves[pk, fecha] in html
+    ]
+
+
+# ---------------- Página de detalle ----------------
+
+
+def detalle(pk, renderizar):
+    """HTML completo de evento_detalle (no depende del usuario)."""
+    clave, html = _leer_detalle(pk)
+    if html is None:
+        with en_primaria():
+            html = renderizar()
+        cache.set(clave, html, TTL)
+    return html
+
+
+async def adetalle(pk, renderizar):
+    """detalle() para views_async: 'renderizar' es una corrutina."""
+    clave, html = await sync_to_async(_leer_detalle)(pk)
+    if html is None:
+        with en_primaria():
+            html = await renderizar()
+        await cache.aset(clave, html, TTL)
+    return html
+
+
+def _leer_detalle(pk):
+    version = versiones([("evento", pk)])[("evento", pk)]
+    clave = f"eventwall:detalle:{pk}:{version}"
+    html = cache.get(clave)
+    if html is not None:
+        contar("detalle", aciertos=1)
+    else:
+        contar("detalle", fallos=1)
+    return clave, html
+
+
+# ---------------- Invalidación ----------------
+
+
+def invalidar_evento(evento, comunidades):
+    subir_version("evento", evento.pk)
+    invalidar_listas(comunidades)
+
+
+def invalidar_listas(comunidades):
+    """Listas "todos" y de las comunidades (y con ellas sus calendarios y el ETag de la API)."""
+    subir_version("lista", "todos")
+    for cid in comunidades:
+        subir_version("lista", f"comunidad:{cid}")
+
+
+def invalidar_comunidad(comunidad):
+    subir_version("comunidad", comunidad.pk)
+    subir_version("lista", f"comunidad:{comunidad.pk}")
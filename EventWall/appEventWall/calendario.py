@@ -0,0 +1,137 @@
+"""
+Consultas de calendario: eventos de un rango de fechas agrupados por día.
+
+Todas las consultas filtran por fecha BETWEEN desde AND hasta (más la
+comunidad cuando la hay), así que recorren solo ese tramo del índice
+(comunidad, fecha, hora, id) y nunca leen eventos anteriores al rango.
+El mes de cada comunidad se cachea con la misma versión que su lista de
+eventos en cache_muro: cualquier cambio en un evento lo invalida. La semana
+se arma a partir de los meses cacheados que toca.
+
+Las series (eventos recurrentes) se leen aparte, de la tabla Ocurrencia o
+generadas al vuelo, y se intercalan con el resto (ver recurrencia.py).
+"""
+import calendar
+import heapq
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Evento
+from .paginacion import ORDEN_EVENTOS
+from .replicas import en_primaria
+from . import cache_muro, membresias, recurrencia
+
+# Columnas que necesitan las vistas de calendario
+CAMPOS = ("id", "titulo", "fecha", "hora", "lugar", "tipo", "comunidad_id")
+
+# ?dias= del feed de próximos eventos
+DIAS_PROXIMOS = getattr(settings, "EVENTWALL_PROXIMOS_DIAS", 14)
+MAX_DIAS_PROXIMOS = getattr(settings, "EVENTWALL_PROXIMOS_MAX_DIAS", 90)
+
+MESES = (
+    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio",
+    "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre",
+)
+
+
+def rango_mes(anio, mes):
+    """(primer día, último día) del mes."""
+    return date(anio, mes, 1), date(anio, mes, calendar.monthrange(anio, mes)[1])
+
+
+def rango_semana(dia):
+    """(lunes, domingo) de la semana de 'dia'."""
+    lunes = dia - timedelta(days=dia.weekday())
+    return lunes, lunes + timedelta(days=6)
+
+
+def por_dia(comunidad_ids, desde, hasta):
+    """
+    {fecha: [filas]} de los eventos de las comunidades entre desde y hasta
+    (incluidos): los simples en una consulta y las ocurrencias de las series
+    en otra (ver recurrencia.en_ventana), mezclados en orden.
+    """
+    dias = {}
+    simples = (
+        Evento.objects.filter(
+            comunidad_id__in=comunidad_ids, fecha__gte=desde, fecha__lte=hasta, recurrencia_hasta__isnull=True
+        )
+        .order_by(*ORDEN_EVENTOS)
+        .values(*CAMPOS)
+    )
+    series = recurrencia.en_ventana(comunidad_ids, desde, hasta, CAMPOS)
+    for fila in heapq.merge(simples, series, key=recurrencia.clave_orden):
+        dias.setdefault(fila["fecha"], []).append(fila)
+    return dias
+
+
+def mes_de_comunidad(comunidad_id, anio, mes):
+    """por_dia() del mes para una comunidad, cacheado por (comunidad, mes)."""
+    ambito = ("lista", f"comunidad:{comunidad_id}")
+    version = cache_muro.versiones([ambito])[ambito]
+    clave = f"eventwall:calendario:{comunidad_id}:{anio}-{mes:02d}:{version}"
+    dias = cache.get(clave)
+    if dias is not None:
+        cache_muro.contar("calendario", aciertos=1)
+        return dias
+    cache_muro.contar("calendario", fallos=1)
+    with en_primaria():
+        dias = por_dia([comunidad_id], *rango_mes(anio, mes))
+    cache.set(clave, dias, cache_muro.TTL)
+    return dias
+
+
+def semana_de_comunidad(comunidad_id, dia):
+    """Eventos de la semana de 'dia', sacados de los meses (cacheados) que abarca."""
+    lunes, domingo = rango_semana(dia)
+    dias = {}
+    for anio, mes in dict.fromkeys([(lunes.year, lunes.month), (domingo.year, domingo.month)]):
+        for fecha, filas in mes_de_comunidad(comunidad_id, anio, mes).items():
+            if lunes <= fecha <= domingo:
+                dias[fecha] = filas
+    return dias
+
+
+def proximos(user, dias=None, hoy=None):
+    """Eventos de hoy a hoy + dias en todas las comunidades del usuario."""
+    hoy = hoy or date.today()
+    comunidades = membresias.comunidades_de(user)
+    if not comunidades:
+        return {}
+    return por_dia(
+        comunidades,
+        hoy,
+        hoy + timedelta(days=obtener_dias(dias) - 1),
+    )
+
+
+def obtener_dias(valor):
+    """Convierte ?dias= en un entero dentro de [1, MAX_DIAS_PROXIMOS]."""
+    try:
+        dias = int(valor)
+    except (TypeError, ValueError):
+        return DIAS_PROXIMOS
+    return max(1, min(dias, MAX_DIAS_PROXIMOS))
+
+
+def cuadricula(desde, hasta, dias, mes=None):
+    """
+    Semanas (listas de 7 días) de lunes a domingo que cubren [desde, hasta],
+    cada día como dict con fecha, eventos y si cae fuera del mes mostrado.
+    """
+    inicio, _ = rango_semana(desde)
+    _, fin = rango_semana(hasta)
+    semanas, dia = [], inicio
+    while dia <= fin:
+        semanas.append([
+            {
+                "fecha": d,
+                "eventos": dias.get(d, []),
+                "fuera": mes is not None and d.month != mes,
+            }
+            for d in (dia + timedelta(days=i) for i in range(7))
+        ])
+        dia += timedelta(days=7)
+    return semanas
@@ -0,0 +1,196 @@
+"""
+Conflictos de lugar: eventos en el mismo lugar y día cuyos horarios se solapan.
+
+Cada evento ocupa [hora, hora_fin). Los que no tienen hora_fin cuentan como
+si duraran DURACION minutos, y los que no tienen hora (día completo) o lugar
+no entran. Dos eventos chocan si uno empieza antes de que acabe el otro:
+uno que acaba a las 11:00 no choca con otro que empieza a las 11:00. Los
+lugares se comparan por Evento.lugar_clave ("Aula Magna" y "aula  magna"
+son el mismo), que es igual en todas las colaciones de la base de datos.
+
+- solapados(): la comprobación de un evento (EventForm.clean), solo contra
+  los de su misma comunidad. Consulta el índice (lugar_clave, fecha, hora)
+  como un rango: lugar_clave = X AND fecha = D AND hora < fin. Las series
+  del lugar se miran aparte (recurrencia.py).
+- conflictos(): auditoría en bloque, de todo o de unas comunidades (manage.py
+  check_conflicts). Se recorren los eventos en el orden de ese índice con
+  iterator(), así que llegan agrupados por (lugar, día) sin cargar la tabla
+  en memoria. Cada grupo se barre por hora de inicio con un montículo de
+  los que siguen abiertos (ordenados por hora de fin): O(n log n) en total
+  y nada de comparar todos con todos. Fecha y horas se leen como texto: con
+  un millón de filas, convertirlas a date/time cuesta más que el barrido.
+"""
+import heapq
+import unicodedata
+from datetime import date, time, timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db.models import CharField
+from django.db.models.functions import Cast
+
+from .models import Evento
+from . import recurrencia
+
+# Minutos que se supone que dura un evento sin hora_fin
+DURACION = getattr(settings, "EVENTWALL_CONFLICTOS_DURACION", 60)
+
+# Días que revisa la auditoría si no se da 'hasta' (las series no tienen fin)
+DIAS = getattr(settings, "EVENTWALL_CONFLICTOS_DIAS", 365)
+
+CHUNK_SIZE = getattr(settings, "EVENTWALL_CONFLICTOS_CHUNK_SIZE", 5000)
+
+DIA = 24 * 3600
+
+# Columnas de cada evento en la auditoría, en este orden (fecha y horas como texto)
+CAMPOS = ("lugar_clave", "fecha", "hora", "hora_fin", "id", "comunidad_id", "lugar", "titulo")
+
+
+def clave_lugar(lugar):
+    """'Aula  Mágna ' -> 'aula magna' (Evento.lugar_clave)."""
+    # Solo se quitan las marcas combinantes: "Зал 1" sigue siendo "зал 1"
+    sin_acentos = "".join(c for c in unicodedata.normalize("NFKD", lugar or "") if unicodedata.category(c) != "Mn")
+    return " ".join(sin_acentos.casefold().split())
+
+
+def segundos(hora):
+    """Segundos desde medianoche de un time o de su texto 'HH:MM:SS[.ffffff]'."""
+    if isinstance(hora, str):
+        return int(hora[:2]) * 3600 + int(hora[3:5]) * 60 + int(hora[6:8])
+    return hora.hour * 3600 + hora.minute * 60 + hora.second
+
+
+def intervalo(hora, hora_fin):
+    """(inicio, fin) en segundos; sin hora_fin (o con una que no es posterior), DURACION sin pasar del día."""
+    inicio = segundos(hora)
+    fin = segundos(hora_fin) if hora_fin else 0
+    return inicio, fin if fin > inicio else min(inicio + DURACION * 60, DIA)
+
+
+def _hora(total):
+    return time.max if total >= DIA else time(total // 3600, total % 3600 // 60, total % 60)
+
+
+def _tramo(hora, hora_fin):
+    """
+    intervalo() con las horas en texto 'HH:MM:SS', que se ordena igual que
+    las horas: sin pasar a números salvo cuando falta hora_fin ("24:00:00"
+    es el final del día).
+    """
+    inicio, fin = hora[:8], (hora_fin or "")[:8]
+    if fin > inicio:
+        return inicio, fin
+    fin = min(segundos(inicio) + DURACION * 60, DIA)
+    return inicio, f"{fin // 3600:02d}:{fin % 3600 // 60:02d}:{fin % 60:02d}"
+
+
+def hora_fin_efectiva(evento):
+    """hora_fin, o la supuesta con DURACION (para mostrarla en los avisos)."""
+    return _hora(intervalo(evento.hora, evento.hora_fin)[1])
+
+
+# ---------------- Comprobación de un evento ----------------
+
+
+def solapados(lugar, fecha, hora, hora_fin=None, excluir=None, comunidades=None, regla=None):
+    """
+    Eventos (instancias) en 'lugar' el día 'fecha' que chocan con
+    [hora, hora_fin), en orden. Las ocurrencias de una serie llegan como
+    copias con la fecha del día. 'excluir' es el pk del evento que se edita
+    y 'comunidades', si se da, los ids de las únicas comunidades que se
+    miran. Con 'regla' (una serie nueva) se miran todas sus fechas desde
+    'fecha' hasta DIAS después, no solo la primera.
+    """
+    clave = clave_lugar(lugar)
+    if not clave or not fecha or not hora:
+        return []
+    dias = [fecha] if not regla else list(recurrencia.fechas(regla, fecha, hasta=fecha + timedelta(days=DIAS - 1)))
+    if not dias:
+        return []
+    inicio, fin = intervalo(hora, hora_fin)
+    candidatos = Evento.objects.filter(lugar_clave=clave, hora__isnull=False, hora__lt=_hora(fin))
+    if excluir is not None:
+        candidatos = candidatos.exclude(pk=excluir)
+    if comunidades is not None:
+        candidatos = candidatos.filter(comunidad_id__in=comunidades)
+    # Un rango del índice entre la primera y la última fecha; las del medio
+    # que no son de la serie se descartan aquí
+    simples = candidatos.filter(fecha__gte=dias[0], fecha__lte=dias[-1], recurrencia_hasta__isnull=True)
+    series = candidatos.filter(recurrencia_hasta__gte=dias[0], fecha__lte=dias[-1])
+    encontrados = list(simples) + [o for s in series for o in recurrencia.ocurrencias(s, dias[0], dias[-1])]
+    en_dias = set(dias)
+    return sorted(
+        (e for e in encontrados if e.fecha in en_dias and intervalo(e.hora, e.hora_fin)[1] > inicio),
+        key=recurrencia.clave_orden,
+    )
+
+
+# ---------------- Auditoría en bloque ----------------
+
+
+def barrer(eventos):
+    """
+    Pares (a, b) que se solapan entre 'eventos' (tuplas de CAMPOS del mismo
+    lugar y día), con a el que empieza antes. Barrido por hora de inicio.
+    """
+    abiertos = []  # montículo de (fin, id, evento)
+    for inicio, fin, pk, evento in sorted((*_tramo(e[2], e[3]), e[4], e) for e in eventos):
+        # Los que acabaron antes de que empiece este ya no chocan con nadie más
+        while abiertos and abiertos[0][0] <= inicio:
+            heapq.heappop(abiertos)
+        for _, _, otro in abiertos:
+            yield otro, evento
+        heapq.heappush(abiertos, (fin, pk, evento))
+
+
+def _series(candidatos, desde, hasta):
+    """{(lugar_clave, fecha): [tuplas de CAMPOS]} de las ocurrencias de las series entre desde y hasta."""
+    por_dia = {}
+    series = candidatos.filter(recurrencia_hasta__gte=desde, fecha__lte=hasta)
+    for serie in series.values(*CAMPOS, "recurrencia"):
+        for o in recurrencia.ocurrencias(serie, desde, hasta):
+            fila = (
+                o["lugar_clave"], o["fecha"].isoformat(), o["hora"].isoformat(),
+                o["hora_fin"].isoformat() if o["hora_fin"] else None, o["id"], o["comunidad_id"], o["lugar"], o["titulo"],
+            )
+            por_dia.setdefault(fila[:2], []).append(fila)
+    return por_dia
+
+
+def _filtrar(pares, ids):
+    if ids is None:
+        return pares
+    return ((a, b) for a, b in pares if a[5] in ids or b[5] in ids)
+
+
+def conflictos(comunidad_ids=None, desde=None, hasta=None, chunk_size=CHUNK_SIZE):
+    """
+    Genera los pares (a, b) de eventos que chocan entre desde (hoy) y hasta
+    (DIAS después), como tuplas de CAMPOS con la fecha y las horas en
+    texto ISO. Con comunidad_ids, solo los pares en los que está alguna de
+    esas comunidades (el otro puede ser de cualquiera: el lugar es de todos).
+    """
+    desde = desde or date.today()
+    hasta = hasta or desde + timedelta(days=DIAS - 1)
+    ids = set(comunidad_ids) if comunidad_ids is not None else None
+    candidatos = Evento.objects.exclude(lugar_clave="").filter(hora__isnull=False)
+    if ids is not None:
+        lugares = Evento.objects.filter(comunidad_id__in=ids, fecha__lte=hasta).values("lugar_clave").distinct()
+        candidatos = candidatos.filter(lugar_clave__in=lugares)
+
+    series = _series(candidatos, desde, hasta)
+    simples = (
+        candidatos.filter(fecha__gte=desde, fecha__lte=hasta, recurrencia_hasta__isnull=True)
+        .order_by("lugar_clave", "fecha", "hora")
+        .annotate(
+            fecha_texto=Cast("fecha", CharField()),
+            hora_texto=Cast("hora", CharField()),
+            hora_fin_texto=Cast("hora_fin", CharField()),
+        )
+        .values_list("lugar_clave", "fecha_texto", "hora_texto", "hora_fin_texto", *CAMPOS[4:])
+        .iterator(chunk_size=chunk_size)
+    )
+    for clave, filas in groupby(simples, key=lambda e: (e[0], e[1])):
+        yield from _filtrar(barrer([*filas, *series.pop(clave, ())]), ids)
+    for filas in series.values():
+        yield from _filtrar(barrer(filas), ids)
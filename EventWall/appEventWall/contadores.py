@@ -0,0 +1,76 @@
+"""
+Contadores desnormalizados de Comunidad (num_miembros, num_eventos).
+
+Se actualizan con UPDATE ... SET n = n + delta (expresiones F()), así dos
+peticiones concurrentes no se pisan. Las señales que los mantienen están en
+signals.py; recontar() repara cualquier desvío (manage.py recount_comunidades).
+"""
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Comunidad, Evento
+
+
+def _sumar(campo, comunidad_ids, delta):
+    comunidad_ids = [pk for pk in comunidad_ids if pk is not None]
+    if comunidad_ids and delta:
+        nuevo = F(campo) + delta
+        if delta < 0:
+            # Si ya había desvío se queda en 0. Sin calcular n + delta < 0:
+            # en un PositiveIntegerField MySQL da error (1690) en vez de negativo
+            nuevo = Case(When(**{f"{campo}__gte": -delta}, then=nuevo), default=Value(0))
+        Comunidad.objects.filter(pk__in=comunidad_ids).update(**{campo: nuevo})
+
+
+def sumar_miembros(comunidad_ids, delta):
+    _sumar("num_miembros", comunidad_ids, delta)
+
+
+def sumar_eventos(comunidad_ids, delta):
+    _sumar("num_eventos", comunidad_ids, delta)
+
+
+def conteos_reales(queryset):
+    """Anota real_miembros / real_eventos con subconsultas COUNT."""
+    Miembro = Comunidad.miembros.through
+    miembros = (
+        Miembro.objects.filter(comunidad_id=OuterRef("pk"))
+        .order_by().values("comunidad_id").annotate(n=Count("*")).values("n")
+    )
+    eventos = (
+        Evento.objects.filter(comunidad_id=OuterRef("pk"))
+        .order_by().values("comunidad_id").annotate(n=Count("*")).values("n")
+    )
+    return queryset.annotate(
+        real_miembros=Coalesce(Subquery(miembros), 0),
+        real_eventos=Coalesce(Subquery(eventos), 0),
+    )
+
+
+def recontar(comunidad_ids=None, batch_size=1000):
+    """
+    Recalcula los contadores por lotes de ids (keyset sobre pk) y guarda solo
+    las comunidades con desvío. Devuelve (revisadas, corregidas).
+    """
+    revisadas = corregidas = 0
+    ultimo = 0
+    while True:
+        lote = Comunidad.objects.filter(pk__gt=ultimo).order_by("pk")
+        if comunidad_ids is not None:
+            lote = lote.filter(pk__in=comunidad_ids)
+        lote = list(
+            conteos_reales(lote.only("pk", "num_miembros", "num_eventos"))[:batch_size]
+        )
+        if not lote:
+            break
+        desviadas = []
+        for c in lote:
+            if (c.num_miembros, c.num_eventos) != (c.real_miembros, c.real_eventos):
+                c.num_miembros, c.num_eventos = c.real_miembros, c.real_eventos
+                desviadas.append(c)
+        if desviadas:
+            Comunidad.objects.bulk_update(desviadas, ["num_miembros", "num_eventos"])
+        revisadas += len(lote)
+        corregidas += len(desviadas)
+        ultimo = lote[-1].pk
+    return revisadas, corregidas
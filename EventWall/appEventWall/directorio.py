@@ -0,0 +1,108 @@
+"""
+Directorio de miembros de una comunidad (comunidad_miembros).
+
+Se consulta la tabla intermedia Miembro, que guarda una copia del username.
+Así el orden, el cursor y la búsqueda por prefijo recorren el índice
+(comunidad, username) como un rango. Cada página cuesta lo mismo sea la
+primera o la mil de una comunidad de 50k miembros. El User (select_related)
+y la foto de su Profile llegan en la misma consulta.
+
+El total sin búsqueda es el contador num_miembros (ver contadores.py). El
+de una búsqueda se cuenta una vez y se guarda TTL segundos en la caché.
+"""
+import base64
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Miembro
+from .paginacion import obtener_tamano_pagina
+
+TTL = getattr(settings, "EVENTWALL_DIRECTORIO_TTL", 5 * 60)
+
+
+def codificar_cursor(username):
+    return base64.urlsafe_b64encode(username.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(token):
+    """El username del cursor ?after=, o None si el token no es válido."""
+    if not token:
+        return None
+    try:
+        return base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _miembros(comunidad_id, q):
+    miembros = Miembro.objects.filter(comunidad_id=comunidad_id)
+    if q:
+        miembros = miembros.filter(username__startswith=q)
+    return miembros
+
+
+def _pagina(comunidad_id, q, after, page_size):
+    tamano = obtener_tamano_pagina(page_size)
+    # La foto con un JOIN y no user.profile: el perfil perezoso haría una
+    # consulta por cada usuario sin Profile (y fallaría en las vistas async)
+    miembros = (
+        _miembros(comunidad_id, q).select_related("user")
+        .annotate(foto=F("user__profile__foto")).order_by("username")
+    )
+    cursor = decodificar_cursor(after)
+    if cursor is not None:
+        miembros = miembros.filter(username__gt=cursor)
+    # Uno de más para saber si hay página siguiente
+    return miembros[: tamano + 1], tamano
+
+
+def _cortar(filas, tamano):
+    siguiente = None
+    if len(filas) > tamano:
+        filas = filas[:tamano]
+        siguiente = codificar_cursor(filas[-1].username)
+    usuarios = []
+    for m in filas:
+        m.user.foto = m.foto
+        usuarios.append(m.user)
+    return usuarios, siguiente
+
+
+def pagina(comunidad_id, q="", after=None, page_size=None):
+    """(usuarios, siguiente) ordenados por username; 'siguiente' es el token ?after= o None."""
+    filas, tamano = _pagina(comunidad_id, q, after, page_size)
+    return _cortar(list(filas), tamano)
+
+
+async def apagina(comunidad_id, q="", after=None, page_size=None):
+    """pagina con el ORM async (views_async)."""
+    filas, tamano = _pagina(comunidad_id, q, after, page_size)
+    return _cortar([m async for m in filas], tamano)
+
+
+def clave(comunidad_id, q):
+    # Hash: el texto buscado puede tener caracteres que Memcached no acepta.
+    # Sin pasar a minúsculas: username__startswith distingue mayúsculas
+    # (salvo en SQLite), así que "Ana" y "ana" pueden tener totales distintos
+    return f"eventwall:directorio:{comunidad_id}:{hashlib.sha1(q.encode()).hexdigest()}"
+
+
+def total(comunidad, q=""):
+    """Miembros de la comunidad que empiezan por 'q' (todos sin 'q')."""
+    if not q:
+        return comunidad.num_miembros
+    return cache.get_or_set(clave(comunidad.pk, q), lambda: _miembros(comunidad.pk, q).count(), TTL)
+
+
+async def atotal(comunidad, q=""):
+    """total con la caché y el ORM async."""
+    if not q:
+        return comunidad.num_miembros
+    n = await cache.aget(clave(comunidad.pk, q))
+    if n is None:
+        n = await _miembros(comunidad.pk, q).acount()
+        await cache.aset(clave(comunidad.pk, q), n, TTL)
+    return n
@@ -0,0 +1,241 @@
+"""
+Actualizaciones en vivo del muro de una comunidad (Server-Sent Events).
+
+Las señales de Evento publican un mensaje por cambio en el canal
+"comunidad:<id>" (ver signals.py) y cada conexión SSE abierta
+(views_async.comunidad_eventos_stream) tiene su propia cola asyncio.
+
+Backends (settings.EVENTWALL_EN_VIVO_BACKEND):
+- "memoria" (por defecto): pub/sub dentro del proceso. Basta con un solo
+  worker ASGI.
+- "redis": publica en Redis (EVENTWALL_REDIS_URL) y cada proceso tiene una
+  sola tarea suscrita por patrón que reparte a sus colas locales. Necesita
+  el paquete redis.
+
+Solo con ASGI: una conexión ociosa es solo una tarea esperando en su cola,
+así que un worker aguanta miles. Con WSGI, StreamingHttpResponse consume el
+generador async con async_to_sync y junta todo antes de mandar nada; como
+escuchar() no acaba nunca, el cliente no recibiría ningún mensaje y el
+worker quedaría ocupado. Por eso con WSGI la página no abre el stream y la
+vista responde 204 (ver disponible()). Las ráfagas se agrupan: tras el primer mensaje
+se espera VENTANA segundos y se manda un solo lote con el último estado de
+cada evento.
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Segundos que se agrupan los cambios antes de enviarlos
+VENTANA = getattr(settings, "EVENTWALL_EN_VIVO_VENTANA", 0.5)
+# Comentario SSE cada LATIDO segundos para que proxies no corten la conexión
+LATIDO = getattr(settings, "EVENTWALL_EN_VIVO_LATIDO", 15)
+# Mensajes pendientes por conexión; si se llena, el cliente debe recargar
+COLA_MAX = getattr(settings, "EVENTWALL_EN_VIVO_COLA_MAX", 100)
+
+PREFIJO_REDIS = "eventwall:en_vivo:"
+
+RECARGAR = {"accion": "recargar"}
+
+
+def disponible(request):
+    """True si la petición llega por ASGI, el único modo en que el stream funciona."""
+    return isinstance(request, ASGIRequest)
+
+
+def canal_comunidad(comunidad_id):
+    return f"comunidad:{comunidad_id}"
+
+
+def _entregar(colas, mensaje):
+    for cola in colas:
+        try:
+            cola.put_nowait(mensaje)
+        except asyncio.QueueFull:
+            # Cliente muy atrasado: en vez de acumular memoria, que recargue
+            while not cola.empty():
+                cola.get_nowait()
+            cola.put_nowait(RECARGAR)
+
+
+class BackendMemoria:
+    """Suscriptores del proceso: canal -> {(loop, cola)}."""
+
+    nombre = "memoria"
+
+    def __init__(self):
+        self._suscriptores = {}
+        # publicar() llega desde hilos síncronos (vistas, señales)
+        self._lock = threading.Lock()
+
+    def publicar(self, canal, mensaje):
+        self._repartir(canal, mensaje)
+
+    def _repartir(self, canal, mensaje):
+        # Un solo call_soon_threadsafe por loop (despertar el loop no es
+        # gratis), no uno por conexión
+        por_loop = {}
+        with self._lock:
+            for loop, cola in self._suscriptores.get(canal, ()):
+                por_loop.setdefault(loop, []).append(cola)
+        for loop, colas in por_loop.items():
+            try:
+                loop.call_soon_threadsafe(_entregar, colas, mensaje)
+            except RuntimeError:
+                pass  # loop cerrado; cancelar() lo quitará
+
+    async def suscribir(self, canal):
+        suscripcion = (asyncio.get_running_loop(), asyncio.Queue(maxsize=COLA_MAX))
+        with self._lock:
+            self._suscriptores.setdefault(canal, set()).add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, canal, suscripcion):
+        with self._lock:
+            restantes = self._suscriptores.get(canal, set())
+            restantes.discard(suscripcion)
+            if not restantes:
+                self._suscriptores.pop(canal, None)
+
+    def total_suscripciones(self):
+        with self._lock:
+            return sum(len(s) for s in self._suscriptores.values())
+
+
+class BackendRedis(BackendMemoria):
+    """PUBLISH en Redis + una tarea PSUBSCRIBE por loop que reparte en local."""
+
+    nombre = "redis"
+
+    def __init__(self, url):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("EVENTWALL_EN_VIVO_BACKEND='redis' necesita el paquete redis.")
+        self._url = url
+        self._cliente = redis.Redis.from_url(url)
+        self._oyentes = {}
+
+    def publicar(self, canal, mensaje):
+        self._cliente.publish(PREFIJO_REDIS + canal, json.dumps(mensaje, cls=DjangoJSONEncoder))
+
+    async def suscribir(self, canal):
+        loop = asyncio.get_running_loop()
+        if loop not in self._oyentes or self._oyentes[loop].done():
+            self._oyentes[loop] = loop.create_task(self._escuchar())
+        return await super().suscribir(canal)
+
+    async def _escuchar(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            try:
+                pubsub = aioredis.Redis.from_url(self._url).pubsub()
+                await pubsub.psubscribe(PREFIJO_REDIS + "*")
+                async for m in pubsub.listen():
+                    if m["type"] == "pmessage":
+                        canal = m["channel"].decode().removeprefix(PREFIJO_REDIS)
+                        self._repartir(canal, json.loads(m["data"]))
+            except (OSError, aioredis.RedisError):
+                # Redis caído o reiniciado: reintentamos sin tirar las conexiones SSE
+                await asyncio.sleep(1)
+
+
+_backend = None
+
+
+def obtener_backend():
+    global _backend
+    if _backend is None:
+        nombre = getattr(settings, "EVENTWALL_EN_VIVO_BACKEND", "memoria")
+        if nombre == "redis":
+            _backend = BackendRedis(getattr(settings, "EVENTWALL_REDIS_URL", "redis://localhost:6379/0"))
+        elif nombre == "memoria":
+            _backend = BackendMemoria()
+        else:
+            raise ImproperlyConfigured(f"EVENTWALL_EN_VIVO_BACKEND desconocido: {nombre!r}")
+    return _backend
+
+
+# ---------------- Publicación (desde signals.py) ----------------
+
+
+def datos_evento(evento):
+    return {
+        "id": evento.pk,
+        "titulo": evento.titulo,
+        "descripcion": evento.descripcion,
+        "fecha": evento.fecha,
+        "hora": evento.hora,
+        "lugar": evento.lugar,
+        "tipo": evento.tipo,
+        "tipo_display": evento.get_tipo_display(),
+        "comunidad": evento.comunidad_id,
+        "creado_por": evento.creado_por_id,
+    }
+
+
+def mensaje(accion, evento):
+    """accion: "creado", "editado" o "borrado" (este solo lleva el id)."""
+    datos = {"accion": accion, "id": evento.pk}
+    if accion != "borrado":
+        datos["evento"] = datos_evento(evento)
+    return datos
+
+
+def publicar(mensajes):
+    """mensajes: [(comunidad_id, mensaje)]."""
+    backend = obtener_backend()
+    for comunidad_id, datos in mensajes:
+        backend.publicar(canal_comunidad(comunidad_id), datos)
+
+
+# ---------------- Suscripción (vista SSE) ----------------
+
+
+def agrupar(mensajes):
+    """Último mensaje de cada evento, en el orden de su último cambio."""
+    if any(m.get("accion") == "recargar" for m in mensajes):
+        return [RECARGAR]
+    ultimos = {}
+    for m in mensajes:
+        ultimos.pop(m["id"], None)
+        ultimos[m["id"]] = m
+    return list(ultimos.values())
+
+
+def formatear(mensajes):
+    return f"event: eventos\ndata: {json.dumps(mensajes, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def escuchar(canal, ventana=None, latido=None):
+    """
+    Generador async con el texto SSE para una conexión: lotes agrupados de
+    mensajes del canal y un comentario de latido cuando no hay nada.
+    """
+    ventana = VENTANA if ventana is None else ventana
+    latido = LATIDO if latido is None else latido
+    backend = obtener_backend()
+    suscripcion = await backend.suscribir(canal)
+    _, cola = suscripcion
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                primero = await asyncio.wait_for(cola.get(), latido)
+            except asyncio.TimeoutError:
+                yield ": latido\n\n"
+                continue
+            if ventana:
+                await asyncio.sleep(ventana)
+            lote = [primero]
+            while not cola.empty():
+                lote.append(cola.get_nowait())
+            yield formatear(agrupar(lote))
+    finally:
+        backend.cancelar(canal, suscripcion)
@@ -0,0 +1,211 @@
+"""
+Estáticos en producción: compilación con collectstatic y servidos desde el
+propio Django, sin proxy delante.
+
+Compilación (STORAGES["staticfiles"] = EstaticosComprimidos, ver
+settings/prod.py; se ejecuta con manage.py collectstatic):
+- El CSS se minifica antes de calcular el hash.
+- Cada archivo lleva el hash de su contenido en el nombre
+  (styles.3f2a9c1b.css). Es lo que ya hace ManifestStaticFilesStorage.
+- Junto a cada archivo comprimible se guarda su versión .gz y, con el
+  paquete brotli instalado, la .br.
+
+Servicio (EstaticosMiddleware, justo después de SecurityMiddleware):
+- Responde las peticiones bajo STATIC_URL con los archivos de STATIC_ROOT.
+- Elige la variante comprimida según Accept-Encoding.
+- Los nombres con hash se sirven con Cache-Control immutable de un año. Una
+  visita repetida solo pide el HTML.
+- El índice de archivos se construye una vez al arrancar el proceso.
+  Tras un collectstatic hay que reiniciar.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Extensiones que vale la pena comprimir (JPEG, PNG, WebP o woff2 ya lo están)
+COMPRIMIBLES = {".css", ".js", ".mjs", ".map", ".svg", ".txt", ".json", ".html", ".xml", ".ico", ".ttf", ".eot"}
+
+# Por debajo de esto la cabecera de la compresión se come la ganancia
+MIN_BYTES = 256
+
+# Cache-Control de los archivos con hash (no cambian nunca) y de los demás
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+MAX_AGE = getattr(settings, "EVENTWALL_ESTATICOS_MAX_AGE", 60)
+
+# Variantes en orden de preferencia: (Content-Encoding, sufijo)
+CODIFICACIONES = [("br", ".br"), ("gzip", ".gz")]
+
+
+# ---------------- Compilación (collectstatic) ----------------
+
+_CADENAS = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""")
+
+
+def minificar_css(css):
+    """Quita comentarios y espacios sobrantes. No toca el texto entre comillas."""
+    partes = _CADENAS.split(re.sub(r"/\*.*?\*/", "", css, flags=re.S))
+    for i in range(0, len(partes), 2):
+        trozo = re.sub(r"\s+", " ", partes[i])
+        # El espacio antes de ':' no se quita: "a :hover" no es "a:hover"
+        trozo = re.sub(r"\s*([{};,>])\s*", r"\1", trozo)
+        trozo = re.sub(r":\s+", ":", trozo)
+        partes[i] = trozo.replace(";}", "}")
+    return "".join(partes).strip()
+
+
+def comprimir(contenido):
+    """{sufijo: bytes} con las variantes que salen más pequeñas que el original."""
+    variantes = {".gz": gzip.compress(contenido, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variantes[".br"] = brotli.compress(contenido)
+    return {sufijo: datos for sufijo, datos in variantes.items() if len(datos) < len(contenido) * 0.95}
+
+
+class _CssMinificado:
+    """Envuelve el storage de origen para que el hash se calcule sobre el CSS ya minificado."""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def open(self, ruta, mode="rb"):
+        with self.storage.open(ruta, mode) as original:
+            css = original.read().decode("utf-8")
+        return ContentFile(minificar_css(css).encode(), name=ruta)
+
+
+class EstaticosComprimidos(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage que además minifica el CSS y guarda las versiones .gz/.br."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        paths = {
+            nombre: (_CssMinificado(storage) if nombre.endswith(".css") else storage, ruta)
+            for nombre, (storage, ruta) in paths.items()
+        }
+        yield from super().post_process(paths, dry_run, **options)
+        if not dry_run:
+            for nombre in set(self.hashed_files.values()):
+                self.comprimir(nombre)
+
+    def comprimir(self, nombre):
+        if os.path.splitext(nombre)[1].lower() not in COMPRIMIBLES:
+            return
+        with self.open(nombre) as archivo:
+            contenido = archivo.read()
+        if len(contenido) < MIN_BYTES:
+            return
+        for sufijo, datos in comprimir(contenido).items():
+            if self.exists(nombre + sufijo):
+                self.delete(nombre + sufijo)
+            self._save(nombre + sufijo, ContentFile(datos))
+
+
+# ---------------- Servicio ----------------
+
+
+def _aceptadas(request):
+    """Codificaciones de Accept-Encoding con q > 0."""
+    aceptadas = set()
+    for parte in request.headers.get("Accept-Encoding", "").split(","):
+        codificacion, _, parametros = parte.strip().partition(";")
+        if parametros.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        aceptadas.add(codificacion.strip().lower())
+    return aceptadas
+
+
+def indexar(raiz, prefijo, inmutables):
+    """{url: datos del archivo} de todo lo que hay bajo 'raiz'."""
+    archivos = {}
+    for carpeta, _, nombres in os.walk(raiz):
+        presentes = set(nombres)
+        for nombre in nombres:
+            if nombre.endswith((".gz", ".br")) and nombre[:-3] in presentes:
+                continue
+            ruta = Path(carpeta) / nombre
+            relativa = ruta.relative_to(raiz).as_posix()
+            tipo, _ = mimetypes.guess_type(nombre)
+            if tipo is not None and (tipo.startswith("text/") or tipo in ("application/javascript", "image/svg+xml")):
+                tipo += "; charset=utf-8"
+            archivos[prefijo + relativa] = {
+                "ruta": ruta,
+                "tipo": tipo or "application/octet-stream",
+                "variantes": [
+                    (codificacion, ruta.with_name(nombre + sufijo))
+                    for codificacion, sufijo in CODIFICACIONES if nombre + sufijo in presentes
+                ],
+                "inmutable": relativa in inmutables,
+                "modificado": int(ruta.stat().st_mtime),
+            }
+    return archivos
+
+
+class EstaticosMiddleware:
+    """Sirve STATIC_ROOT con compresión y caché; el resto sigue a la vista."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        raiz, url = settings.STATIC_ROOT, urlsplit(settings.STATIC_URL)
+        if not raiz or not os.path.isdir(raiz) or url.netloc:
+            # Sin collectstatic (desarrollo: los sirve runserver) o con los
+            # estáticos en otro dominio
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.prefijo = url.path
+        inmutables = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+        self.archivos = indexar(raiz, self.prefijo, inmutables)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.servir(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        # Archivos pequeños y casi siempre en la caché del sistema operativo:
+        # leerlos aquí bloquea menos que saltar a un hilo
+        return self.servir(request) or await self.get_response(request)
+
+    def servir(self, request):
+        if request.method not in ("GET", "HEAD") or not request.path.startswith(self.prefijo):
+            return None
+        archivo = self.archivos.get(request.path)
+        if archivo is None:
+            return None
+        cabeceras = {
+            "Cache-Control": CACHE_INMUTABLE if archivo["inmutable"] else f"public, max-age={MAX_AGE}",
+            "Last-Modified": http_date(archivo["modificado"]),
+        }
+        if archivo["variantes"]:
+            cabeceras["Vary"] = "Accept-Encoding"
+        if not was_modified_since(request.headers.get("If-Modified-Since"), archivo["modificado"]):
+            return HttpResponseNotModified(headers=cabeceras)
+        ruta, aceptadas = archivo["ruta"], _aceptadas(request)
+        for codificacion, variante in archivo["variantes"]:
+            if codificacion in aceptadas:
+                ruta = variante
+                cabeceras["Content-Encoding"] = codificacion
+                break
+        contenido = ruta.read_bytes()
+        cabeceras["Content-Length"] = len(contenido)
+        return HttpResponse(contenido, content_type=archivo["tipo"], headers=cabeceras)
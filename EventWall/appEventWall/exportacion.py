@@ -0,0 +1,129 @@
+"""
+Exportación en streaming de los eventos de una comunidad (CSV e iCalendar).
+
+Se recorre comunidad.eventos con values_list().iterator(), así que no se
+crean instancias del modelo ni se carga la lista entera en memoria.
+"""
+import csv
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+
+from .paginacion import ORDEN_EVENTOS
+
+CHUNK_SIZE = getattr(settings, "EVENTWALL_EXPORT_CHUNK_SIZE", 2000)
+
+CAMPOS = ("id", "titulo", "descripcion", "fecha", "hora", "lugar", "tipo")
+
+
+def filas(comunidad, campos=CAMPOS):
+    eventos = comunidad.eventos.order_by(*ORDEN_EVENTOS).values_list(*campos)
+    return eventos.iterator(chunk_size=CHUNK_SIZE)
+
+
+def version(comunidad):
+    """Marca de la última modificación de eventos (o la creación de la comunidad)."""
+    return comunidad.eventos_modificados_en or comunidad.creada_en
+
+
+def etag(comunidad, formato, host=""):
+    """
+    Cubre todo lo que sale en el cuerpo: los eventos (version()) y también el
+    nombre de la comunidad (X-WR-CALNAME) y el host de los UID del iCalendar,
+    que cambian sin tocar eventos_modificados_en.
+    """
+    crudo = "\n".join((str(comunidad.pk), version(comunidad).isoformat(), formato, comunidad.nombre, host))
+    return hashlib.sha1(crudo.encode()).hexdigest()
+
+
+# ---------------- CSV ----------------
+
+class Eco:
+    """Pseudo-buffer: csv.writer 'escribe' y nosotros devolvemos la línea."""
+
+    def write(self, valor):
+        return valor
+
+
+def csv_en_streaming(comunidad):
+    escritor = csv.writer(Eco())
+    yield escritor.writerow(CAMPOS)
+    for pk, titulo, descripcion, fecha, hora, lugar, tipo in filas(comunidad):
+        yield escritor.writerow((
+            pk, titulo, descripcion, fecha.isoformat(),
+            hora.strftime("%H:%M") if hora else "", lugar, tipo,
+        ))
+
+
+# ---------------- iCalendar (RFC 5545) ----------------
+
+def escapar_ics(texto):
+    return (
+        (texto or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def plegar_ics(linea):
+    """Corta líneas de más de 75 octetos (continuación con un espacio)."""
+    datos = linea.encode("utf-8")
+    if len(datos) <= 75:
+        return linea + "\r\n"
+    partes, inicio, limite = [], 0, 75
+    while inicio < len(datos):
+        fin = min(inicio + limite, len(datos))
+        # No partir un carácter UTF-8 por la mitad
+        while fin < len(datos) and (datos[fin] & 0xC0) == 0x80:
+            fin -= 1
+        partes.append(datos[inicio:fin].decode("utf-8"))
+        inicio, limite = fin, 74
+    return "\r\n ".join(partes) + "\r\n"
+
+
+def rrule_ics(regla, hora):
+    """
+    La regla tal cual, salvo UNTIL: con DTSTART fecha-hora tiene que ser
+    también fecha-hora (RFC 5545), así que se alarga hasta el final del día.
+    """
+    if not hora:
+        return regla
+    return ";".join(
+        f"{parte}T235959" if parte.startswith("UNTIL=") and len(parte) == len("UNTIL=AAAAMMDD") else parte
+        for parte in regla.split(";")
+    )
+
+
+def ics_en_streaming(comunidad, host="eventwall"):
+    sello = datetime.now(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield plegar_ics("BEGIN:VCALENDAR")
+    yield plegar_ics("VERSION:2.0")
+    yield plegar_ics("PRODID:-//EventWall//Eventos//ES")
+    yield plegar_ics(f"X-WR-CALNAME:{escapar_ics(comunidad.nombre)}")
+    for pk, titulo, descripcion, fecha, hora, lugar, tipo, regla, hora_fin in filas(
+        comunidad, CAMPOS + ("recurrencia", "hora_fin")
+    ):
+        lineas = [
+            "BEGIN:VEVENT",
+            f"UID:evento-{pk}@{host}",
+            f"DTSTAMP:{sello}",
+            # Sin hora -> evento de día completo; con hora -> hora local "flotante"
+            f"DTSTART:{fecha:%Y%m%d}T{hora:%H%M%S}" if hora else f"DTSTART;VALUE=DATE:{fecha:%Y%m%d}",
+            f"SUMMARY:{escapar_ics(titulo)}",
+        ]
+        if hora and hora_fin and hora_fin > hora:
+            lineas.append(f"DTEND:{fecha:%Y%m%d}T{hora_fin:%H%M%S}")
+        if regla:
+            lineas.append(f"RRULE:{rrule_ics(regla, hora)}")
+        if descripcion:
+            lineas.append(f"DESCRIPTION:{escapar_ics(descripcion)}")
+        if lugar:
+            lineas.append(f"LOCATION:{escapar_ics(lugar)}")
+        lineas.append(f"CATEGORIES:{escapar_ics(tipo)}")
+        lineas.append("END:VEVENT")
+        yield "".join(plegar_ics(linea) for linea in lineas)
+    yield plegar_ics("END:VCALENDAR")
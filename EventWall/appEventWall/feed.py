@@ -0,0 +1,278 @@
+"""
+Feed personal ("mi muro"): próximos eventos de todas las comunidades del
+usuario (propias o de las que es miembro).
+
+Fan-out al escribir: al crear un evento se copia una EntradaFeed por cada
+miembro y el propietario, así leer el feed es un rango del índice
+(user, fecha, hora, evento) y cuesta O(tamaño de página) aunque el usuario
+esté en cientos de comunidades.
+
+Fan-out al leer: las comunidades con más de UMBRAL_FANOUT miembros no se
+reparten (serían miles de filas por evento). Se marcan con
+Comunidad.feed_en_lectura y sus eventos se leen directamente de Evento al
+pedir el feed, con el mismo cursor, y se mezclan con las entradas.
+
+Los eventos recurrentes tampoco se reparten: sus ocurrencias se leen de la
+tabla Ocurrencia (o se generan, fuera de la ventana materializada) al pedir
+el feed (ver recurrencia.py) y se mezclan igual.
+"""
+import heapq
+from datetime import date
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Comunidad, EntradaFeed, Evento
+from .paginacion import (
+    ORDEN_EVENTOS, codificar_cursor, decodificar_cursor, filtro_despues_de, obtener_tamano_pagina,
+    ocurrencias_de_pagina,
+)
+from . import membresias, recurrencia
+from .tareas import tarea
+
+# Miembros a partir de los cuales una comunidad pasa a fan-out al leer
+UMBRAL_FANOUT = getattr(settings, "EVENTWALL_FEED_UMBRAL_FANOUT", 500)
+
+# Filas por bulk_create al repartir
+BATCH_SIZE = getattr(settings, "EVENTWALL_FEED_BATCH_SIZE", 1000)
+
+CLAVE_EN_LECTURA = "eventwall:feed:en_lectura"
+
+ORDEN_ENTRADAS = (F("fecha").asc(), F("hora").asc(nulls_first=True), F("evento_id").asc())
+
+
+# ---------------- Comunidades grandes ----------------
+
+
+def en_lectura():
+    """frozenset de ids de comunidades con fan-out al leer (son pocas; se cachea)."""
+    ids = cache.get(CLAVE_EN_LECTURA)
+    if ids is None:
+        ids = frozenset(Comunidad.objects.filter(feed_en_lectura=True).values_list("pk", flat=True))
+        cache.set(CLAVE_EN_LECTURA, ids, None)
+    return ids
+
+
+def pasar_a_lectura(comunidad_id):
+    """Marca la comunidad y borra sus entradas: desde ahora se lee de Evento."""
+    Comunidad.objects.filter(pk=comunidad_id).update(feed_en_lectura=True)
+    EntradaFeed.objects.filter(comunidad_id=comunidad_id).delete()
+    cache.delete(CLAVE_EN_LECTURA)
+
+
+# ---------------- Escritura ----------------
+
+
+def audiencia(comunidad_id):
+    """Ids de propietario + miembros de la comunidad."""
+    propietario = Comunidad.objects.filter(pk=comunidad_id).order_by().values_list("propietario_id", flat=True)
+    miembros = Comunidad.miembros.through.objects.filter(comunidad_id=comunidad_id).values_list("user_id", flat=True)
+    return set(propietario.union(miembros))
+
+
+def _crear(entradas):
+    for i in range(0, len(entradas), BATCH_SIZE):
+        EntradaFeed.objects.bulk_create(entradas[i:i + BATCH_SIZE], ignore_conflicts=True)
+
+
+def repartir(evento):
+    """
+    Copia el evento al feed de su audiencia (o pasa la comunidad a fan-out
+    al leer si ha crecido demasiado). Los eventos pasados y los recurrentes
+    no se reparten.
+    """
+    EntradaFeed.objects.filter(evento_id=evento.pk).delete()
+    if evento.comunidad_id is None or evento.fecha < date.today() or evento.recurrencia:
+        return
+    comunidad = (
+        Comunidad.objects.filter(pk=evento.comunidad_id)
+        .values("num_miembros", "feed_en_lectura").first()
+    )
+    if comunidad is None or comunidad["feed_en_lectura"]:
+        return
+    if comunidad["num_miembros"] > UMBRAL_FANOUT:
+        pasar_a_lectura(evento.comunidad_id)
+        return
+    _crear([
+        EntradaFeed(
+            user_id=user_id, evento_id=evento.pk, comunidad_id=evento.comunidad_id,
+            fecha=evento.fecha, hora=evento.hora,
+        )
+        for user_id in audiencia(evento.comunidad_id)
+    ])
+
+
+@tarea
+def repartir_evento(evento_id):
+    """repartir() desde la cola de tareas (ver tareas.py)."""
+    evento = Evento.objects.filter(pk=evento_id).first()
+    if evento is not None:
+        repartir(evento)
+
+
+def actualizar(evento):
+    """Evento editado sin cambiar de comunidad: basta con copiar fecha/hora."""
+    if evento.recurrencia:
+        # Puede que antes fuera un evento simple ya repartido
+        repartir(evento)
+        return
+    cambiadas = EntradaFeed.objects.filter(evento_id=evento.pk).update(fecha=evento.fecha, hora=evento.hora)
+    if not cambiadas:
+        # Puede que antes fuera pasado o recurrente (no repartido) y ahora se reparta
+        repartir(evento)
+
+
+@tarea
+def rellenar(user_ids, comunidad_id):
+    """Nuevos miembros: copia a su feed los próximos eventos de la comunidad."""
+    if not user_ids or comunidad_id in en_lectura():
+        return
+    # Desde la cola puede llegar tarde: solo quienes sigan en la comunidad
+    user_ids = set(user_ids) & audiencia(comunidad_id)
+    eventos = list(
+        Evento.objects.filter(comunidad_id=comunidad_id, fecha__gte=date.today(), recurrencia_hasta__isnull=True)
+        .values_list("pk", "fecha", "hora")
+    )
+    _crear([
+        EntradaFeed(user_id=user_id, evento_id=pk, comunidad_id=comunidad_id, fecha=fecha, hora=hora)
+        for user_id in user_ids
+        for pk, fecha, hora in eventos
+    ])
+
+
+def quitar(comunidad_id, user_ids=None):
+    """
+    Quita del feed los eventos de la comunidad a los usuarios indicados (o a
+    todos) que ya no sean ni propietario ni miembro.
+    """
+    entradas = EntradaFeed.objects.filter(comunidad_id=comunidad_id).exclude(user_id__in=audiencia(comunidad_id))
+    if user_ids is not None:
+        entradas = entradas.filter(user_id__in=user_ids)
+    entradas.delete()
+
+
+def quitar_de_todas(user_id):
+    """El usuario dejó todas sus comunidades (miembro_de.clear()): quedan las propias."""
+    EntradaFeed.objects.filter(user_id=user_id).exclude(comunidad__propietario_id=user_id).delete()
+
+
+def _comunidades_por_lotes(comunidad_ids, batch_size):
+    # Keyset sobre pk: no dejamos un cursor abierto mientras escribimos
+    ultimo = 0
+    while True:
+        lote = Comunidad.objects.filter(pk__gt=ultimo).order_by("pk")
+        if comunidad_ids is not None:
+            lote = lote.filter(pk__in=comunidad_ids)
+        lote = list(lote.values_list("pk", "num_miembros")[:batch_size])
+        if not lote:
+            return
+        yield from lote
+        ultimo = lote[-1][0]
+
+
+def reconstruir(comunidad_ids=None, batch_size=BATCH_SIZE):
+    """
+    Rehace el feed de las comunidades indicadas (o de todas): decide de nuevo
+    qué comunidades van con fan-out al leer, borra sus entradas (también las
+    de eventos ya pasados) y reparte los próximos eventos. Devuelve
+    (comunidades, entradas creadas).
+    """
+    total_comunidades = total_entradas = 0
+    hoy = date.today()
+    for pk, num_miembros in _comunidades_por_lotes(comunidad_ids, batch_size):
+        grande = num_miembros > UMBRAL_FANOUT
+        Comunidad.objects.filter(pk=pk).update(feed_en_lectura=grande)
+        EntradaFeed.objects.filter(comunidad_id=pk).delete()
+        total_comunidades += 1
+        if grande:
+            continue
+        usuarios = audiencia(pk)
+        entradas = []
+        eventos = (
+            Evento.objects.filter(comunidad_id=pk, fecha__gte=hoy, recurrencia_hasta__isnull=True)
+            .values_list("pk", "fecha", "hora")
+        )
+        for evento_id, fecha, hora in eventos.iterator(chunk_size=batch_size):
+            entradas.extend(
+                EntradaFeed(user_id=u, evento_id=evento_id, comunidad_id=pk, fecha=fecha, hora=hora)
+                for u in usuarios
+            )
+            if len(entradas) >= batch_size:
+                _crear(entradas)
+                total_entradas += len(entradas)
+                entradas = []
+        _crear(entradas)
+        total_entradas += len(entradas)
+    cache.delete(CLAVE_EN_LECTURA)
+    return total_comunidades, total_entradas
+
+
+# ---------------- Lectura ----------------
+
+
+def pagina(user, after=None, page_size=None, hoy=None):
+    """
+    Página del feed del usuario desde hoy, con el cursor de paginacion.py.
+    Devuelve (filas, siguiente); cada fila es un dict con id, fecha, hora
+    y comunidad_id del evento (y recurrencia en las ocurrencias de una serie).
+    """
+    tamano = obtener_tamano_pagina(page_size)
+    hoy = hoy or date.today()
+    cursor = decodificar_cursor(after)
+
+    entradas = EntradaFeed.objects.filter(user_id=user.pk, fecha__gte=hoy)
+    if cursor is not None:
+        entradas = entradas.filter(filtro_despues_de(*cursor, campo_id="evento_id"))
+    filas = [
+        {"id": e["evento_id"], "fecha": e["fecha"], "hora": e["hora"], "comunidad_id": e["comunidad_id"]}
+        for e in entradas.order_by(*ORDEN_ENTRADAS)
+        .values("evento_id", "fecha", "hora", "comunidad_id")[: tamano + 1]
+    ]
+
+    # Comunidades grandes del usuario: se leen de Evento con el mismo cursor
+    comunidades = membresias.comunidades_de(user)
+    grandes = comunidades & en_lectura()
+    if grandes:
+        eventos = Evento.objects.filter(comunidad_id__in=grandes, fecha__gte=hoy, recurrencia_hasta__isnull=True)
+        if cursor is not None:
+            eventos = eventos.filter(filtro_despues_de(*cursor))
+        vistos = {f["id"] for f in filas}
+        filas += [
+            f for f in eventos.order_by(*ORDEN_EVENTOS).values("id", "fecha", "hora", "comunidad_id")[: tamano + 1]
+            if f["id"] not in vistos
+        ]
+        filas.sort(key=recurrencia.clave_orden)
+
+    # Series: sus ocurrencias se leen de Ocurrencia como un rango del índice
+    # (comunidad, fecha, hora, evento); solo las que quedan fuera de la
+    # ventana materializada se generan, hasta donde llegan los eventos de la página
+    hasta = filas[tamano]["fecha"] if len(filas) > tamano else None
+    desde = max(hoy, cursor[0]) if cursor is not None else hoy
+    leidas, resto, ocurrencias = [], None, []
+    if comunidades:
+        leidas, resto = ocurrencias_de_pagina(
+            {"comunidad_id__in": comunidades}, cursor, desde, hasta, tamano, recurrencia.ventana()
+        )
+        leidas = [
+            {"id": o["evento_id"], "fecha": o["fecha"], "hora": o["hora"], "comunidad_id": o["comunidad_id"],
+             "recurrencia": o["evento__recurrencia"]}
+            for o in (leidas.values("evento_id", "fecha", "hora", "comunidad_id", "evento__recurrencia") if leidas is not None else [])
+        ]
+    if resto is not None and len(leidas) <= tamano:
+        series = Evento.objects.filter(comunidad_id__in=comunidades, recurrencia_hasta__gte=resto)
+        if hasta is not None:
+            series = series.filter(fecha__lte=hasta)
+        ocurrencias = [
+            recurrencia.ocurrencias(serie, resto, hasta, cursor)
+            for serie in series.values("id", "fecha", "hora", "comunidad_id", "recurrencia")
+        ]
+    if leidas or ocurrencias:
+        filas = list(islice(heapq.merge(filas, leidas, *ocurrencias, key=recurrencia.clave_orden), tamano + 1))
+
+    siguiente = None
+    if len(filas) > tamano:
+        filas = filas[:tamano]
+        siguiente = codificar_cursor(filas[-1])
+    return filas, siguiente
@@ -1,9 +1,12 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.urls import reverse
+from django.utils.html import format_html
 from .models import Evento
 from .models import Evento, Profile, Comunidad
+from . import conflictos, membresias, miniaturas, recurrencia
 from datetime import datetime, date, time
 
 class CustomUserCreationForm(UserCreationForm):
@@ -21,6 +24,29 @@ class CustomUserCreationForm(UserCreationForm):
         return user
 
 
+# -------------- Formulario Foto de perfil ----------------
+class FotoPerfilForm(forms.ModelForm):
+    # Bytes máximos del archivo subido
+    MAX_BYTES = getattr(settings, "EVENTWALL_FOTO_MAX_BYTES", 5 * 1024 * 1024)
+
+    class Meta:
+        model = Profile
+        fields = ["foto"]
+
+    def clean_foto(self):
+        foto = self.cleaned_data.get("foto")
+        if foto and hasattr(foto, "content_type"):  # recién subida
+            if foto.size > self.MAX_BYTES:
+                raise forms.ValidationError(f"La foto no puede pasar de {self.MAX_BYTES // (1024 * 1024)} MB.")
+            try:
+                miniaturas.comprobar(foto)
+            except miniaturas.ImagenDemasiadoGrande as e:
+                raise forms.ValidationError(str(e))
+            finally:
+                foto.seek(0)
+        return foto
+
+
 # -------------- Formulario Comunidad ----------------
 class ComunidadForm(forms.ModelForm):
     class Meta:
@@ -33,16 +59,103 @@ class ComunidadForm(forms.ModelForm):
 
 
 # -------------- Formulario Evento ----------------
+
+# Formatos aceptados (también los usa manage.py import_eventos)
+FORMATOS_FECHA = ["%d/%m/%Y", "%Y-%m-%d"]
+FORMATOS_HORA = ["%I:%M %p", "%H:%M"]
+
+
+def validar_fecha_y_horas(fecha, h_inicio, h_fin, permitir_pasado=False):
+    """
+    Reglas de EventForm.clean, reutilizables fuera del formulario.
+    Devuelve un dict {campo: mensaje} (vacío si todo está bien).
+    """
+    errores = {}
+
+    # Validar fecha no en pasado (comparando solo fechas)
+    if fecha and not permitir_pasado:
+        if fecha < date.today():
+            errores["fecha"] = "La fecha no puede ser anterior a hoy."
+
+    # Validar horas
+    if h_inicio and h_fin:
+        # Simple comparación de objetos time
+        if h_fin <= h_inicio:
+            errores["hora_fin"] = "La hora de fin debe ser posterior a la hora de inicio."
+
+    return errores
+
+
+def validar_recurrencia(regla, fecha):
+    """
+    Regla de EventForm.clean para la recurrencia (una Regla ya parseada),
+    reutilizable fuera del formulario. Devuelve el mensaje de error o None.
+    """
+    if regla.hasta is not None and regla.hasta < fecha:
+        return "UNTIL no puede ser anterior a la fecha del evento."
+    if next(recurrencia.fechas(regla, fecha), None) is None:
+        return "La regla no tiene ninguna fecha a partir de la del evento."
+    return None
+
+
+class ComunidadAutocompletar(forms.HiddenInput):
+    """
+    Input oculto con el id de la comunidad y un cuadro de texto que pide
+    sugerencias a api_comunidades_autocompletar mientras se escribe (ver
+    static/js/autocompletar.js). No lista las comunidades en un <select>.
+    """
+
+    def render(self, name, value, attrs=None, renderer=None):
+        oculto = super().render(name, value, attrs, renderer)
+        pk = getattr(value, "pk", value)
+        nombre = ""
+        if pk not in (None, ""):
+            nombre = Comunidad.objects.filter(pk=pk).values_list("nombre", flat=True).first() or ""
+        id_oculto = (attrs or {}).get("id") or self.attrs.get("id") or f"id_{name}"
+        return format_html(
+            '{}<input type="text" id="{}_texto" value="{}" list="{}_opciones" autocomplete="off"'
+            ' placeholder="Escribe el nombre de la comunidad" data-autocompletar="{}" data-destino="{}">'
+            '<datalist id="{}_opciones"></datalist>',
+            oculto, id_oculto, nombre, id_oculto, reverse("api_comunidades_autocompletar"), id_oculto, id_oculto,
+        )
+
+
+class ComunidadDelUsuarioField(forms.ModelChoiceField):
+    """
+    Comunidad donde el usuario es propietario o miembro. Se valida con el
+    set cacheado de membresías y una consulta por pk, sin evaluar la lista
+    entera de comunidades del usuario.
+    """
+
+    widget = ComunidadAutocompletar
+
+    def __init__(self, **kwargs):
+        self.user = None
+        super().__init__(Comunidad.objects.all(), **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            pk = int(getattr(value, "pk", value))
+        except (TypeError, ValueError):
+            raise forms.ValidationError(self.error_messages["invalid_choice"], code="invalid_choice")
+        if self.user is None or not membresias.es_miembro(self.user, pk):
+            raise forms.ValidationError(self.error_messages["invalid_choice"], code="invalid_choice")
+        return super().to_python(pk)
+
+
 class EventForm(forms.ModelForm):
     """
     Form para crear/editar eventos.
     - Fecha con hint y soporta formatos DD/MM/YYYY y YYYY-MM-DD.
     - Hora de inicio/fin con soporte AM/PM y 24h.
-    - Filtra 'comunidad' a las comunidades donde el user es propietario o miembro.
+    - 'comunidad' se elige con autocompletado entre las comunidades donde el
+      user es propietario o miembro.
     """
 
     fecha = forms.DateField(
-        input_formats=["%d/%m/%Y", "%Y-%m-%d"],
+        input_formats=FORMATOS_FECHA,
         widget=forms.DateInput(
             attrs={
                 "placeholder": "DD/MM/YYYY",
@@ -62,7 +175,7 @@ class EventForm(forms.ModelForm):
                 "autocomplete": "off",
             }
         ),
-        input_formats=["%I:%M %p", "%H:%M"],
+        input_formats=FORMATOS_HORA,
     )
 
     hora_fin = forms.TimeField(
@@ -74,34 +187,32 @@ class EventForm(forms.ModelForm):
                 "autocomplete": "off",
             }
         ),
-        input_formats=["%I:%M %p", "%H:%M"],
+        input_formats=FORMATOS_HORA,
     )
 
+    comunidad = ComunidadDelUsuarioField(required=False)
+
     class Meta:
         model = Evento
-        # 'hora' en el modelo será llenado con hora_inicio en save()
-        fields = ["titulo", "descripcion", "fecha", "lugar", "tipo", "comunidad"]
+        # 'hora' y 'hora_fin' en el modelo se llenan con hora_inicio/hora_fin en save()
+        fields = ["titulo", "descripcion", "fecha", "lugar", "recurrencia", "tipo", "comunidad"]
         widgets = {
             "descripcion": forms.Textarea(attrs={"rows": 4, "placeholder": "Describe el evento..."}),
             "lugar": forms.TextInput(attrs={"placeholder": "Ej: Auditorio Principal"}),
+            "recurrencia": forms.TextInput(attrs={"placeholder": "FREQ=WEEKLY;BYDAY=TU,TH;UNTIL=20271231", "autocomplete": "off"}),
             # 'tipo' usa el widget por defecto (select) acorde a tus choices en el modelo
         }
 
     def __init__(self, *args, **kwargs):
         """
-        Espera kwargs.pop('user', None) para filtrar queryset de comunidades.
+        Espera kwargs.pop('user', None) para validar la comunidad elegida.
         """
         user = kwargs.pop("user", None)
         super().__init__(*args, **kwargs)
 
-        # Filtrar queryset de comunidades por propietario o miembro
+        # Solo se aceptan comunidades del usuario (sin usuario, ninguna)
         if "comunidad" in self.fields:
-            if user is not None:
-                self.fields["comunidad"].queryset = Comunidad.objects.filter(
-                    Q(propietario=user) | Q(miembros=user)
-                ).distinct()
-            else:
-                self.fields["comunidad"].queryset = Comunidad.objects.none()
+            self.fields["comunidad"].user = user
 
         # Si editando, rellenar hora_inicio desde instance.hora (si existe)
         if self.instance and getattr(self.instance, "hora", None):
@@ -110,38 +221,75 @@ class EventForm(forms.ModelForm):
             except Exception:
                 # si por alguna razón el valor no encaja, lo ignoramos
                 pass
+        if self.instance and getattr(self.instance, "hora_fin", None):
+            self.initial.setdefault("hora_fin", self.instance.hora_fin)
+
+    def clean_recurrencia(self):
+        """La regla normalizada (mayúsculas, partes en orden fijo), o "" si no se repite."""
+        texto = self.cleaned_data.get("recurrencia", "").strip()
+        if not texto:
+            return ""
+        try:
+            return str(recurrencia.parsear(texto))
+        except recurrencia.ReglaInvalida as e:
+            raise forms.ValidationError(str(e))
 
     def clean(self):
         cleaned = super().clean()
 
-        fecha = cleaned.get("fecha")
-        h_inicio = cleaned.get("hora_inicio")
-        h_fin = cleaned.get("hora_fin")
+        errores = validar_fecha_y_horas(
+            cleaned.get("fecha"), cleaned.get("hora_inicio"), cleaned.get("hora_fin")
+        )
+        for campo, mensaje in errores.items():
+            self.add_error(campo, mensaje)
 
-        # Validar fecha no en pasado (comparando solo fechas)
-        if fecha:
-            today = date.today()
-            if fecha < today:
-                self.add_error("fecha", "La fecha no puede ser anterior a hoy.")
+        if cleaned.get("recurrencia") and cleaned.get("fecha"):
+            self.comprobar_recurrencia(cleaned)
 
-        # Validar horas
-        if h_inicio and h_fin:
-            # Simple comparación de objetos time
-            if h_fin <= h_inicio:
-                self.add_error("hora_fin", "La hora de fin debe ser posterior a la hora de inicio.")
+        if not errores:
+            self.comprobar_lugar(cleaned)
 
         return cleaned
 
+    def comprobar_recurrencia(self, cleaned):
+        """Error en 'recurrencia' si la regla no da ninguna fecha a partir de 'fecha'."""
+        error = validar_recurrencia(recurrencia.parsear(cleaned["recurrencia"]), cleaned["fecha"])
+        if error:
+            self.add_error("recurrencia", error)
+
+    def comprobar_lugar(self, cleaned):
+        """
+        Error en 'lugar' si a esa hora ya hay otro evento de la misma
+        comunidad allí, en cualquier fecha de la serie (ver conflictos.py).
+        Los choques con otras comunidades no bloquean: los informa
+        manage.py check_conflicts.
+        """
+        comunidad = cleaned.get("comunidad")
+        if comunidad is None:
+            return
+        choques = conflictos.solapados(
+            cleaned.get("lugar"), cleaned.get("fecha"), cleaned.get("hora_inicio"), cleaned.get("hora_fin"),
+            excluir=self.instance.pk, comunidades=[comunidad.pk], regla=cleaned.get("recurrencia") or None,
+        )
+        if choques:
+            otro = choques[0]
+            dia = f" el {otro.fecha:%d/%m/%Y}" if cleaned.get("recurrencia") else ""
+            self.add_error("lugar", (
+                f"{otro.lugar} está ocupado{dia} de {otro.hora:%H:%M} a "
+                f"{conflictos.hora_fin_efectiva(otro):%H:%M} por «{otro.titulo}»."
+            ))
+
     def save(self, commit=True):
         """
-        Guardamos el Evento. Como el modelo tiene solo 'hora' (no hora_inicio/hora_fin),
-        tomamos hora_inicio como hora principal del evento.
+        Guardamos el Evento. 'hora' en el modelo es hora_inicio; hora_fin se
+        guarda tal cual (la usan los conflictos de lugar).
         """
         evento = super().save(commit=False)
 
         hora_inicio = self.cleaned_data.get("hora_inicio")
         if hora_inicio:
             evento.hora = hora_inicio
+        evento.hora_fin = self.cleaned_data.get("hora_fin")
 
         # NOTA: asignar evento.creado_por lo hacemos desde la vista (es más seguro).
         if commit:
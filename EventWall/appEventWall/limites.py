@@ -0,0 +1,82 @@
+"""
+Límite de intentos de login con cubetas de fichas (token bucket) en la caché.
+
+Hay una cubeta por IP y otra por nombre de usuario. Cada intento fallido
+gasta una ficha de las dos, y las fichas se recuperan a ritmo constante.
+Con alguna de las dos vacía, login_view rechaza el intento antes de
+autenticar, así que una ráfaga de credential stuffing no llega al hasher
+de contraseñas. Un login correcto no gasta fichas y vacía el historial de
+ese usuario. Así una oficina entera entrando a la vez desde la misma IP no
+se bloquea.
+
+Leer y guardar la cubeta no es atómico: con varios workers a la vez se
+puede colar algún intento de más, pero nunca una ráfaga.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# tipo -> (capacidad, segundos por ficha)
+CUBETAS = {
+    # 20 fallos seguidos y luego 1 cada 6 s (10 por minuto)
+    "ip": getattr(settings, "EVENTWALL_LOGIN_LIMITE_IP", (20, 6)),
+    # 5 fallos seguidos y luego 1 por minuto
+    "usuario": getattr(settings, "EVENTWALL_LOGIN_LIMITE_USUARIO", (5, 60)),
+}
+
+# Proxies de confianza delante de Django (X-Forwarded-For); 0 = REMOTE_ADDR
+PROXIES = getattr(settings, "EVENTWALL_PROXIES", 0)
+
+
+def ip_cliente(request):
+    """La IP que añadió el último proxy de confianza (no se puede falsear desde fuera)."""
+    if PROXIES:
+        saltos = [ip.strip() for ip in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if ip.strip()]
+        if len(saltos) >= PROXIES:
+            return saltos[-PROXIES]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def clave(tipo, valor):
+    # Hash: los nombres de usuario pueden tener caracteres que Memcached no acepta en claves
+    return f"eventwall:limite:{tipo}:{hashlib.sha1(valor.strip().lower().encode()).hexdigest()}"
+
+
+def _fichas(tipo, valor, ahora):
+    capacidad, recarga = CUBETAS[tipo]
+    guardada = cache.get(clave(tipo, valor))
+    if guardada is None:
+        return capacidad
+    fichas, desde = guardada
+    return min(capacidad, fichas + (ahora - desde) / recarga)
+
+
+def espera(pares):
+    """
+    Segundos hasta poder intentarlo con todas las cubetas de 'pares'
+    [(tipo, valor)]; 0 si se puede ya.
+    """
+    ahora = time.time()
+    segundos = 0
+    for tipo, valor in pares:
+        fichas = _fichas(tipo, valor, ahora)
+        if fichas < 1:
+            segundos = max(segundos, math.ceil((1 - fichas) * CUBETAS[tipo][1]))
+    return segundos
+
+
+def gastar(pares):
+    """Un intento fallido: una ficha menos en cada cubeta."""
+    ahora = time.time()
+    for tipo, valor in pares:
+        capacidad, recarga = CUBETAS[tipo]
+        fichas = max(0, _fichas(tipo, valor, ahora) - 1)
+        # Caduca cuando ya estaría llena otra vez
+        cache.set(clave(tipo, valor), (fichas, ahora), math.ceil((capacidad - fichas) * recarga))
+
+
+def reiniciar(tipo, valor):
+    cache.delete(clave(tipo, valor))
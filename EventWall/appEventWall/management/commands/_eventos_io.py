@@ -0,0 +1,32 @@
+"""Utilidades compartidas por import_eventos y export_eventos."""
+import sys
+from contextlib import contextmanager
+
+# Columnas del formato de intercambio (CSV con cabecera o JSON Lines)
+COLUMNAS = [
+    "titulo", "descripcion", "fecha", "hora_inicio", "hora_fin",
+    "lugar", "tipo", "comunidad_id", "creado_por_id", "recurrencia",
+]
+
+FORMATOS = ("csv", "jsonl")
+
+
+def detectar_formato(ruta, formato=None):
+    if formato:
+        return formato
+    if ruta.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+
+@contextmanager
+def abrir(ruta, modo):
+    """Abre la ruta en texto UTF-8; '-' es stdin/stdout (no se cierran)."""
+    if ruta == "-":
+        flujo = sys.stdin if "r" in modo else sys.stdout
+        yield flujo
+        if "w" in modo:
+            flujo.flush()
+    else:
+        with open(ruta, modo, encoding="utf-8", newline="") as archivo:
+            yield archivo
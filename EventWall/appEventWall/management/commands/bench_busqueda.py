@@ -0,0 +1,63 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from appEventWall.busqueda import BackendIcontains, LIMITE_RESULTADOS, obtener_backend
+from appEventWall.models import Comunidad
+
+PALABRAS = ["python", "ajedrez", "música", "fotografía", "robótica", "cine", "senderismo", "datos"]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la búsqueda de texto completo contra el filtro icontains. "
+        "Siembra datos dentro de una transacción que se revierte al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--n", type=int, default=50_000, help="Comunidades a sembrar")
+        parser.add_argument("--repeticiones", type=int, default=20)
+
+    def handle(self, *args, **options):
+        n, repeticiones = options["n"], options["repeticiones"]
+        try:
+            with transaction.atomic():
+                self.sembrar(n)
+                fts = obtener_backend()
+                for nombre, backend in (("icontains", BackendIcontains()), (fts.nombre, fts)):
+                    for q in ("python", "robo", "datos cine", "tema1234"):
+                        ms = self.medir(backend, q, repeticiones)
+                        self.stdout.write(f"{nombre:>10}  q={q!r:14} {ms:8.2f} ms/consulta")
+                raise Rollback
+        except Rollback:
+            pass
+
+    def sembrar(self, n):
+        dueno = User.objects.create_user("bench-busqueda")
+        Comunidad.objects.bulk_create(
+            (
+                Comunidad(
+                    nombre=f"Comunidad {PALABRAS[i % len(PALABRAS)]} {i}",
+                    # palabras comunes + un "tema" poco frecuente (~n/2000 filas)
+                    descripcion=" ".join(PALABRAS[(i + k) % len(PALABRAS)] for k in range(3))
+                    + f" tema{i % 2000}",
+                    propietario=dueno,
+                )
+                for i in range(n)
+            ),
+            batch_size=1000,
+        )
+        obtener_backend().reconstruir(Comunidad)
+        self.stdout.write(f"Sembradas {n} comunidades.")
+
+    def medir(self, backend, q, repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            list(backend.buscar(Comunidad, q)[:LIMITE_RESULTADOS])
+        return (time.perf_counter() - inicio) * 1000 / repeticiones
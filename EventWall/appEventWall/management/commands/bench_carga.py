@@ -0,0 +1,139 @@
+import http.client
+import re
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+RUTAS = ["/eventosLista/", "/comunidades/"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga: compara req/s y latencias (p50/p99) de varios servidores "
+        "ya arrancados, p.ej. WSGI y ASGI con la misma base de datos:\n"
+        "  gunicorn EventWall.wsgi -w 4 -b 127.0.0.1:8000\n"
+        "  uvicorn EventWall.asgi:application --workers 4 --port 8001\n"
+        "  manage.py bench_carga --url http://127.0.0.1:8000 --url http://127.0.0.1:8001 "
+        "--usuario ana --password ...\n"
+        "O los perfiles de ajustes (EventWall/settings/), misma base de datos:\n"
+        "  EVENTWALL_ENTORNO=dev gunicorn EventWall.wsgi -w 4 -b 127.0.0.1:8000\n"
+        "  EVENTWALL_ENTORNO=prod gunicorn EventWall.wsgi -w 4 -b 127.0.0.1:8001  (tras collectstatic)\n"
+        "Con --login mide POST /login/ (logins correctos por segundo); con -w 1 da logins/s por núcleo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", action="append", required=True, help="Servidor a medir (repetible)")
+        parser.add_argument("--ruta", action="append", help=f"Rutas a pedir (por defecto {', '.join(RUTAS)})")
+        parser.add_argument("--usuario", required=True)
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--peticiones", type=int, default=2000, help="Por servidor y ruta")
+        parser.add_argument("--concurrencia", type=int, default=50)
+        parser.add_argument("--calentamiento", type=int, default=50, help="Peticiones previas sin medir")
+        parser.add_argument("--login", action="store_true", help="Medir POST /login/ en lugar de las rutas")
+
+    def handle(self, *args, **options):
+        rutas = options["ruta"] or RUTAS
+        self.stdout.write(f"{'servidor':<28} {'ruta':<22} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errores':>8}")
+        for url in options["url"]:
+            if options["login"]:
+                # Cada petición es un login completo con el mismo token CSRF
+                csrf, token = self.csrf(url)
+                cookie, cuerpo, rutas = f"csrftoken={csrf}", self.formulario(options, token), ["/login/"]
+            else:
+                cookie, cuerpo = self.iniciar_sesion(url, options["usuario"], options["password"]), None
+            for ruta in rutas:
+                self.medir(url, ruta, cookie, options["calentamiento"], options["concurrencia"], cuerpo)
+                segundos, latencias, errores = self.medir(
+                    url, ruta, cookie, options["peticiones"], options["concurrencia"], cuerpo
+                )
+                latencias.sort()
+                p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] if latencias else 0
+                self.stdout.write(
+                    f"{url:<28} {ruta:<22} {options['peticiones'] / segundos:8.1f} "
+                    f"{(statistics.median(latencias) if latencias else 0) * 1000:8.1f} "
+                    f"{p99 * 1000:8.1f} {errores:8d}"
+                )
+
+    def conexion(self, url):
+        partes = urlsplit(url)
+        clase = http.client.HTTPSConnection if partes.scheme == "https" else http.client.HTTPConnection
+        return clase(partes.hostname, partes.port, timeout=30)
+
+    def csrf(self, url):
+        """(cookie csrftoken, token del formulario) de /login/."""
+        conn = self.conexion(url)
+        conn.request("GET", "/login/")
+        resp = conn.getresponse()
+        cookies = SimpleCookie(resp.getheader("Set-Cookie", ""))
+        token = re.search(rb'name="csrfmiddlewaretoken" value="([^"]+)"', resp.read())
+        conn.close()
+        if token is None or "csrftoken" not in cookies:
+            raise CommandError(f"{url}: no se encontró el token CSRF en /login/")
+        return cookies["csrftoken"].value, token.group(1).decode()
+
+    def formulario(self, options, token):
+        return urlencode({"username": options["usuario"], "password": options["password"], "csrfmiddlewaretoken": token})
+
+    def iniciar_sesion(self, url, usuario, password):
+        """Login por el formulario normal; devuelve la cabecera Cookie con la sesión."""
+        csrf, token = self.csrf(url)
+        conn = self.conexion(url)
+        cuerpo = self.formulario({"usuario": usuario, "password": password}, token)
+        conn.request("POST", "/login/", body=cuerpo, headers={
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Cookie": f"csrftoken={csrf}",
+            "Referer": f"{url}/login/",
+        })
+        resp = conn.getresponse()
+        resp.read()
+        cookies = SimpleCookie(resp.getheader("Set-Cookie", ""))
+        if resp.status != 302 or "sessionid" not in cookies:
+            raise CommandError(f"{url}: login fallido (HTTP {resp.status})")
+        conn.close()
+        return f"csrftoken={csrf}; sessionid={cookies['sessionid'].value}"
+
+    def medir(self, url, ruta, cookie, peticiones, concurrencia, cuerpo=None):
+        """
+        Reparte las peticiones entre 'concurrencia' hilos, cada uno con su
+        conexión keep-alive. Con 'cuerpo' son POST de formulario y se espera
+        una redirección.
+        """
+        por_hilo = [peticiones // concurrencia + (i < peticiones % concurrencia) for i in range(concurrencia)]
+        if cuerpo is None:
+            metodo, esperado, cabeceras = "GET", 200, {"Cookie": cookie}
+        else:
+            metodo, esperado, cabeceras = "POST", 302, {
+                "Cookie": cookie,
+                "Content-Type": "application/x-www-form-urlencoded",
+                "Referer": f"{url}{ruta}",
+            }
+
+        def trabajador(n):
+            conn, latencias, errores = self.conexion(url), [], 0
+            for _ in range(n):
+                inicio = time.perf_counter()
+                try:
+                    conn.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+                    resp = conn.getresponse()
+                    resp.read()
+                    if resp.status != esperado:
+                        errores += 1
+                except (OSError, http.client.HTTPException):
+                    errores += 1
+                    conn.close()
+                    conn = self.conexion(url)
+                    continue
+                latencias.append(time.perf_counter() - inicio)
+            conn.close()
+            return latencias, errores
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            resultados = list(pool.map(trabajador, [n for n in por_hilo if n]))
+        segundos = time.perf_counter() - inicio
+        latencias = [l for lat, _ in resultados for l in lat]
+        return segundos, latencias, sum(e for _, e in resultados)
@@ -0,0 +1,60 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from appEventWall.conflictos import CHUNK_SIZE, DIAS, conflictos, intervalo
+
+
+class Command(BaseCommand):
+    help = (
+        "Informe de conflictos de lugar: pares de eventos en el mismo lugar y día "
+        f"cuyos horarios se solapan, desde hoy (--desde) hasta {DIAS} días después "
+        "(--hasta). Con --comunidad, solo los que afectan a esas comunidades. "
+        "Con --check sale con código 1 si encuentra alguno (como makemigrations --check)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--comunidad", type=int, action="append", help="Solo estas comunidades (repetible)")
+        parser.add_argument("--desde", help="AAAA-MM-DD (por defecto hoy)")
+        parser.add_argument("--hasta", help="AAAA-MM-DD")
+        parser.add_argument("--limite", type=int, default=100, help="Pares que se listan (el total se cuenta igual)")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--check", action="store_true", help="Salir con código 1 si hay conflictos")
+
+    def handle(self, *args, **options):
+        desde, hasta = self.fecha(options, "desde"), self.fecha(options, "hasta")
+        inicio = time.perf_counter()
+        total = 0
+        for a, b in conflictos(options["comunidad"], desde, hasta, chunk_size=options["chunk_size"]):
+            total += 1
+            if total <= options["limite"]:
+                self.stdout.write(
+                    f"{a[1]} {a[6]}: «{a[7]}» (#{a[4]}, {self.horario(a)}) "
+                    f"choca con «{b[7]}» (#{b[4]}, {self.horario(b)})"
+                )
+        if total > options["limite"]:
+            self.stdout.write(f"... y {total - options['limite']} más")
+        segundos = time.perf_counter() - inicio
+        mensaje = f"Conflictos: {total} · {segundos:.2f} s"
+        if not total:
+            self.stdout.write(self.style.SUCCESS(mensaje))
+            return
+        self.stdout.write(self.style.WARNING(mensaje))
+        if options["check"]:
+            sys.exit(1)
+
+    @staticmethod
+    def fecha(options, nombre):
+        if not options[nombre]:
+            return None
+        valor = parse_date(options[nombre])
+        if valor is None:
+            raise CommandError(f"--{nombre} debe ser una fecha AAAA-MM-DD.")
+        return valor
+
+    @staticmethod
+    def horario(evento):
+        inicio, fin = intervalo(evento[2], evento[3])
+        return f"{inicio // 3600:02d}:{inicio % 3600 // 60:02d}-{fin // 3600:02d}:{fin % 3600 // 60:02d}"
@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from appEventWall.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Crea en lote el Profile de los usuarios que todavía no tienen uno."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total, ultimo = 0, 0
+        while True:
+            # Recorremos por pk (keyset) para no cargar todos los ids a la vez
+            lote = list(
+                User.objects.filter(profile__isnull=True, pk__gt=ultimo)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not lote:
+                break
+            with transaction.atomic():
+                Profile.objects.bulk_create(
+                    [Profile(user_id=pk) for pk in lote], ignore_conflicts=True
+                )
+            total += len(lote)
+            ultimo = lote[-1]
+        self.stdout.write(self.style.SUCCESS(f"Perfiles creados: {total}"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from appEventWall.notificaciones import USUARIOS_POR_LOTE, enviar_resumenes
+
+
+class Command(BaseCommand):
+    help = (
+        "Manda por correo un resumen a cada usuario con sus notificaciones "
+        "pendientes (appEventWall/notificaciones.py). Pensado para cron, "
+        "p.ej. cada 15 minutos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=USUARIOS_POR_LOTE, help="Usuarios por lote")
+
+    def handle(self, *args, **options):
+        correos, notificaciones = enviar_resumenes(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Correos enviados: {correos} · notificaciones incluidas: {notificaciones}"
+        ))
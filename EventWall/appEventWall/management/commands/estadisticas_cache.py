@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from appEventWall.cache_muro import estadisticas
+
+
+class Command(BaseCommand):
+    help = "Muestra aciertos/fallos de la caché del muro de eventos."
+
+    def handle(self, *args, **options):
+        for espacio, datos in estadisticas().items():
+            total = datos["aciertos"] + datos["fallos"]
+            ratio = datos["aciertos"] / total * 100 if total else 0
+            self.stdout.write(
+                f"{espacio:>11}: {datos['aciertos']} aciertos · {datos['fallos']} fallos · {ratio:.1f}% acierto"
+            )
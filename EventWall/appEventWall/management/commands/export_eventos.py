@@ -0,0 +1,67 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from appEventWall.models import Evento
+
+from ._eventos_io import COLUMNAS, FORMATOS, abrir, detectar_formato
+
+# Campos que se leen de la BD, en el orden de COLUMNAS
+CAMPOS = [
+    "titulo", "descripcion", "fecha", "hora", "hora_fin", "lugar", "tipo", "comunidad_id", "creado_por_id", "recurrencia",
+]
+
+
+def a_fila(valores):
+    # None sale vacío en CSV y como null en JSON Lines
+    titulo, descripcion, fecha, hora, hora_fin, lugar, tipo, comunidad_id, creado_por_id, regla = valores
+    return [
+        titulo, descripcion, fecha.isoformat(),
+        hora.strftime("%H:%M") if hora else None, hora_fin.strftime("%H:%M") if hora_fin else None,
+        lugar, tipo, comunidad_id, creado_por_id, regla or None,
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta eventos a CSV o JSON Lines en streaming, sin cargar instancias "
+        "del modelo (values_list + iterator)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("ruta", nargs="?", default="-", help="Archivo de salida ('-' para stdout)")
+        parser.add_argument("--formato", choices=FORMATOS)
+        parser.add_argument("--comunidad", type=int, help="Solo eventos de esta comunidad")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        formato = detectar_formato(options["ruta"], options["formato"])
+        eventos = Evento.objects.order_by("pk")
+        if options["comunidad"]:
+            eventos = eventos.filter(comunidad_id=options["comunidad"])
+        filas = (
+            a_fila(valores)
+            for valores in eventos.values_list(*CAMPOS).iterator(chunk_size=options["chunk_size"])
+        )
+
+        exportados = 0
+        inicio = time.perf_counter()
+        with abrir(options["ruta"], "w") as archivo:
+            if formato == "jsonl":
+                for fila in filas:
+                    archivo.write(json.dumps(dict(zip(COLUMNAS, fila)), ensure_ascii=False) + "\n")
+                    exportados += 1
+            else:
+                escritor = csv.writer(archivo)
+                escritor.writerow(COLUMNAS)
+                for fila in filas:
+                    escritor.writerow(fila)
+                    exportados += 1
+
+        segundos = time.perf_counter() - inicio
+        ritmo = exportados / segundos if segundos else 0
+        self.stderr.write(
+            f"Exportados {exportados} eventos en {segundos:.1f} s · {ritmo:,.0f} filas/s"
+        )
@@ -0,0 +1,228 @@
+import csv
+import json
+import time
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from appEventWall.busqueda import obtener_backend
+from appEventWall.conflictos import clave_lugar
+from appEventWall.contadores import recontar
+from appEventWall import cache_muro, feed, recurrencia
+from appEventWall.forms import FORMATOS_FECHA, FORMATOS_HORA, validar_fecha_y_horas, validar_recurrencia
+from appEventWall.models import Comunidad, Evento
+
+from ._eventos_io import COLUMNAS, FORMATOS, abrir, detectar_formato
+
+TIPOS = {clave for clave, _ in Evento.TIPO_CHOICES}
+MAX_TITULO = Evento._meta.get_field("titulo").max_length
+MAX_LUGAR = Evento._meta.get_field("lugar").max_length
+
+
+class FilaInvalida(Exception):
+    pass
+
+
+def parsear(valor, formatos, parse):
+    """Prueba los mismos formatos que EventForm; None si viene vacío."""
+    # En JSON Lines puede llegar un número (20240101, 930)
+    valor = str(valor).strip() if valor is not None else ""
+    if not valor:
+        return None
+    for formato in formatos:
+        try:
+            return parse(datetime.strptime(valor, formato))
+        except ValueError:
+            continue
+    raise FilaInvalida(f"formato no válido: {valor!r}")
+
+
+class ExistenciaMemorizada:
+    """Comprueba ids contra la BD una sola vez por id."""
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.conocidos = {}
+
+    def __call__(self, pk):
+        if pk not in self.conocidos:
+            self.conocidos[pk] = self.queryset.filter(pk=pk).exists()
+        return self.conocidos[pk]
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa eventos desde CSV o JSON Lines en streaming (memoria constante). "
+        "Valida con las mismas reglas que EventForm e inserta con bulk_create por lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("ruta", help="Archivo de entrada ('-' para stdin)")
+        parser.add_argument("--formato", choices=FORMATOS)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--usuario", help="username a usar como creado_por si la fila no trae uno")
+        parser.add_argument(
+            "--permitir-pasado", action="store_true",
+            help="Acepta fechas anteriores a hoy (p.ej. al reimportar un export)",
+        )
+        parser.add_argument("--max-errores", type=int, default=20, help="Errores a mostrar")
+
+    def handle(self, *args, **options):
+        self.permitir_pasado = options["permitir_pasado"]
+        self.comunidad_existe = ExistenciaMemorizada(Comunidad.objects.all())
+        self.usuario_existe = ExistenciaMemorizada(User.objects.all())
+        self.usuario_por_defecto = None
+        if options["usuario"]:
+            try:
+                self.usuario_por_defecto = User.objects.get(username=options["usuario"]).pk
+            except User.DoesNotExist:
+                raise CommandError(f"No existe el usuario {options['usuario']!r}")
+
+        formato = detectar_formato(options["ruta"], options["formato"])
+        batch_size = options["batch_size"]
+        importados = 0
+        self.errores = 0
+        self.comunidades_tocadas = set()
+        inicio = time.perf_counter()
+        # Los ids nuevos van después de este: solo esos se indexan al final
+        ultimo_pk = Evento.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+
+        with abrir(options["ruta"], "r") as archivo:
+            eventos = self.eventos(self.filas(archivo, formato), options["max_errores"])
+            while True:
+                lote = list(islice(eventos, batch_size))
+                if not lote:
+                    break
+                with transaction.atomic():
+                    Evento.objects.bulk_create(lote, batch_size=batch_size)
+                importados += len(lote)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"  {importados} filas...")
+
+        # bulk_create no dispara señales: indexamos las filas nuevas para la
+        # búsqueda (MySQL mantiene su FULLTEXT solo), invalidamos las listas
+        # cacheadas, materializamos las ocurrencias de las series nuevas y
+        # marcamos las comunidades afectadas (ETag de sus exportaciones,
+        # contadores num_eventos y feed de sus miembros)
+        if importados:
+            obtener_backend().indexar_desde(Evento, ultimo_pk)
+            cache_muro.invalidar_listas(self.comunidades_tocadas)
+            recurrencia.materializar(Evento.objects.filter(pk__gt=ultimo_pk))
+            Comunidad.objects.filter(pk__in=self.comunidades_tocadas).update(
+                eventos_modificados_en=timezone.now()
+            )
+            recontar(self.comunidades_tocadas)
+            feed.reconstruir(self.comunidades_tocadas)
+
+        segundos = time.perf_counter() - inicio
+        ritmo = importados / segundos if segundos else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Importados {importados} eventos ({self.errores} filas con errores) "
+            f"en {segundos:.1f} s · {ritmo:,.0f} filas/s"
+        ))
+
+    def filas(self, archivo, formato):
+        """Genera (número de línea, dict) sin leer el archivo entero."""
+        if formato == "jsonl":
+            for numero, linea in enumerate(archivo, start=1):
+                if linea.strip():
+                    try:
+                        fila = json.loads(linea)
+                    except json.JSONDecodeError as e:
+                        yield numero, FilaInvalida(f"JSON no válido: {e}")
+                        continue
+                    if not isinstance(fila, dict):
+                        fila = FilaInvalida("se esperaba un objeto JSON")
+                    yield numero, fila
+        else:
+            lector = csv.DictReader(archivo)
+            faltan = set(COLUMNAS[:3]) - set(lector.fieldnames or [])
+            if faltan:
+                raise CommandError(f"Faltan columnas en el CSV: {', '.join(sorted(faltan))}")
+            for numero, fila in enumerate(lector, start=2):
+                yield numero, fila
+
+    def eventos(self, filas, max_errores):
+        for numero, fila in filas:
+            try:
+                if isinstance(fila, FilaInvalida):
+                    raise fila
+                yield self.evento(fila)
+            except FilaInvalida as e:
+                self.errores += 1
+                if self.errores <= max_errores:
+                    self.stderr.write(f"Línea {numero}: {e}")
+
+    def evento(self, fila):
+        titulo = str(fila.get("titulo") or "").strip()
+        if not titulo:
+            raise FilaInvalida("el título es obligatorio")
+        if len(titulo) > MAX_TITULO:
+            raise FilaInvalida(f"el título supera {MAX_TITULO} caracteres")
+
+        fecha = parsear(fila.get("fecha"), FORMATOS_FECHA, datetime.date)
+        if fecha is None:
+            raise FilaInvalida("la fecha es obligatoria")
+        hora_inicio = parsear(fila.get("hora_inicio"), FORMATOS_HORA, datetime.time)
+        hora_fin = parsear(fila.get("hora_fin"), FORMATOS_HORA, datetime.time)
+
+        errores = validar_fecha_y_horas(fecha, hora_inicio, hora_fin, self.permitir_pasado)
+        if errores:
+            raise FilaInvalida(" ".join(errores.values()))
+
+        lugar = str(fila.get("lugar") or "").strip()
+        if len(lugar) > MAX_LUGAR:
+            raise FilaInvalida(f"el lugar supera {MAX_LUGAR} caracteres")
+
+        tipo = str(fila.get("tipo") or "otro").strip()
+        if tipo not in TIPOS:
+            raise FilaInvalida(f"tipo no válido: {tipo!r}")
+
+        regla = str(fila.get("recurrencia") or "").strip()
+        if regla:
+            try:
+                regla = recurrencia.parsear(regla)
+            except recurrencia.ReglaInvalida as e:
+                raise FilaInvalida(str(e))
+            error = validar_recurrencia(regla, fecha)
+            if error:
+                raise FilaInvalida(error)
+            # Normalizada, igual que la guarda EventForm
+            regla = str(regla)
+
+        comunidad_id = self.id_opcional(fila.get("comunidad_id"), self.comunidad_existe, "la comunidad")
+        creado_por_id = self.id_opcional(fila.get("creado_por_id"), self.usuario_existe, "el usuario")
+        if comunidad_id:
+            self.comunidades_tocadas.add(comunidad_id)
+
+        return Evento(
+            titulo=titulo,
+            descripcion=str(fila.get("descripcion") or ""),
+            fecha=fecha,
+            hora=hora_inicio,
+            hora_fin=hora_fin,
+            lugar=lugar,
+            recurrencia=regla,
+            # bulk_create no llama a save()
+            recurrencia_hasta=recurrencia.ultima_fecha(regla, fecha) if regla else None,
+            lugar_clave=clave_lugar(lugar),
+            tipo=tipo,
+            comunidad_id=comunidad_id,
+            creado_por_id=creado_por_id or self.usuario_por_defecto,
+        )
+
+    @staticmethod
+    def id_opcional(valor, existe, etiqueta):
+        if valor in (None, ""):
+            return None
+        try:
+            pk = int(valor)
+        except (TypeError, ValueError):
+            raise FilaInvalida(f"id no válido para {etiqueta}: {valor!r}")
+        if not existe(pk):
+            raise FilaInvalida(f"no existe {etiqueta} {pk}")
+        return pk
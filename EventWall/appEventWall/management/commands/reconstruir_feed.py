@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from appEventWall.feed import reconstruir
+
+
+class Command(BaseCommand):
+    help = (
+        "Rehace el feed personal (EntradaFeed) de las comunidades: reparte sus "
+        "próximos eventos y borra las entradas de eventos pasados. Ejecutar tras "
+        "migrar a 0014 y, por ejemplo, una vez al día para podar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--comunidad", type=int, action="append", help="Solo estas comunidades (repetible)")
+
+    def handle(self, *args, **options):
+        comunidades, entradas = reconstruir(options["comunidad"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Comunidades: {comunidades} · entradas creadas: {entradas}"
+        ))
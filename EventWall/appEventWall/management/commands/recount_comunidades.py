@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from appEventWall.contadores import recontar
+
+
+class Command(BaseCommand):
+    help = "Recalcula num_miembros y num_eventos de las comunidades por lotes y corrige los desvíos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--comunidad", type=int, action="append", help="Solo estas comunidades (repetible)")
+
+    def handle(self, *args, **options):
+        revisadas, corregidas = recontar(options["comunidad"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Comunidades revisadas: {revisadas} · corregidas: {corregidas}"
+        ))
@@ -0,0 +1,23 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from appEventWall.recurrencia import BATCH_SIZE, DIAS_MATERIALIZADOS, refrescar
+
+
+class Command(BaseCommand):
+    help = (
+        "Materializa en Ocurrencia las fechas de los eventos recurrentes desde su inicio "
+        "hasta --dias después de hoy, para que las listas y el calendario las lean por "
+        "índice. Ejecutar, por ejemplo, una vez al día: sin ventana materializada se "
+        "generan al vuelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=DIAS_MATERIALIZADOS)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        hasta = date.today() + timedelta(days=max(1, options["dias"]) - 1)
+        total = refrescar(hasta=hasta, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Ocurrencias hasta el {hasta:%d/%m/%Y}: {total}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from appEventWall.busqueda import obtener_backend
+from appEventWall.models import Comunidad, Evento
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda (necesario tras bulk_create o cargas masivas)."
+
+    def handle(self, *args, **options):
+        backend = obtener_backend()
+        for modelo in (Comunidad, Evento):
+            backend.reconstruir(modelo)
+        self.stdout.write(self.style.SUCCESS(f"Índice reconstruido (backend: {backend.nombre})."))
@@ -0,0 +1,97 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from appEventWall import tareas
+
+# Cada cuánto se borran las tareas hechas antiguas
+LIMPIEZA_CADA = 3600
+
+# Cada cuánto se buscan tareas de workers muertos (no en cada vuelta del bucle)
+RESCATE_CADA = 60
+
+# Cada cuánto se renueva el plazo de las tareas en curso: bastante menos que
+# tareas.PLAZO_LATIDO para que un latido perdido no las deje caducar
+LATIDO_CADA = tareas.PLAZO_LATIDO / 4
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta las tareas de la cola (appEventWall/tareas.py). Requiere "
+        "EVENTWALL_TAREAS_EN_LINEA=0 en las peticiones; se pueden arrancar "
+        "varios workers a la vez. SIGTERM/Ctrl+C terminan las tareas en curso y salen."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrencia", type=int, default=4, help="Tareas a la vez")
+        parser.add_argument("--pool", choices=["hilos", "procesos"], default="hilos",
+                            help="procesos para tareas que usan mucha CPU")
+        parser.add_argument("--espera", type=float, default=1.0, help="Segundos entre consultas con la cola vacía")
+        parser.add_argument("--una-vez", action="store_true", help="Vaciar la cola y salir (cron, tests)")
+        parser.add_argument("--conservar-dias", type=int, default=7, help="Días que se guardan las tareas hechas")
+
+    def handle(self, *args, **options):
+        self.parar = False
+        signal.signal(signal.SIGTERM, self.pedir_parada)
+        signal.signal(signal.SIGINT, self.pedir_parada)
+
+        concurrencia = max(1, options["concurrencia"])
+        nombre = f"{socket.gethostname()}:{os.getpid()}"
+        if options["pool"] == "procesos":
+            # Los hijos abren sus propias conexiones
+            connections.close_all()
+            pool = ProcessPoolExecutor(concurrencia, initializer=tareas.iniciar_proceso)
+        else:
+            pool = ThreadPoolExecutor(concurrencia, thread_name_prefix="worker")
+
+        self.hechas = self.fallidas = 0
+        # futuro -> pk de la tarea que ejecuta
+        en_vuelo = {}
+        ultima_limpieza = ultimo_rescate = 0
+        self.ultimo_latido = time.monotonic()
+        with pool:
+            while not self.parar:
+                if time.monotonic() - ultima_limpieza > LIMPIEZA_CADA:
+                    tareas.limpiar(options["conservar_dias"])
+                    ultima_limpieza = time.monotonic()
+                if time.monotonic() - ultimo_rescate > RESCATE_CADA:
+                    tareas.rescatar_colgadas()
+                    ultimo_rescate = time.monotonic()
+
+                libres = concurrencia - len(en_vuelo)
+                for pk in tareas.reclamar(nombre, libres) if libres else []:
+                    en_vuelo[pool.submit(tareas.ejecutar_en_worker, pk)] = pk
+
+                if not en_vuelo:
+                    if options["una_vez"]:
+                        break
+                    time.sleep(options["espera"])
+                    continue
+                self.esperar(nombre, en_vuelo, options["espera"])
+
+            # Al parar se terminan las que están en curso, sin dejar de latir
+            while en_vuelo:
+                self.esperar(nombre, en_vuelo, options["espera"])
+
+        self.stdout.write(self.style.SUCCESS(f"Tareas hechas: {self.hechas} · con error: {self.fallidas}"))
+
+    def esperar(self, nombre, en_vuelo, espera):
+        """Espera a que acabe alguna tarea (como mucho 'espera' s) y renueva el plazo de las demás."""
+        listas, _ = wait(en_vuelo, timeout=espera, return_when=FIRST_COMPLETED)
+        for futuro in listas:
+            del en_vuelo[futuro]
+            if futuro.result():
+                self.hechas += 1
+            else:
+                self.fallidas += 1
+        if en_vuelo and time.monotonic() - self.ultimo_latido > LATIDO_CADA:
+            tareas.latir(nombre, list(en_vuelo.values()))
+            self.ultimo_latido = time.monotonic()
+
+    def pedir_parada(self, *args):
+        self.parar = True
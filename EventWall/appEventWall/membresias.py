@@ -0,0 +1,130 @@
+"""
+Caché de membresías por usuario.
+
+Para cada usuario se guarda el conjunto de ids de comunidades donde es
+propietario o miembro. Se resuelve con una sola consulta, se guarda en el
+framework de caché de Django y además se memoriza en el objeto user durante
+la petición, así cada comprobación de permisos es un 'in' sobre un set.
+
+La invalidación es explícita (ver signals.py): m2m_changed de
+Comunidad.miembros y cambios de propietario. Con varios procesos hace falta
+una caché compartida (Redis/Memcached); LocMem solo invalida en el proceso
+actual. La consulta que rellena la caché va a la primaria (ver replicas.py).
+
+sugerencias() alimenta el autocompletado del campo comunidad de EventForm:
+las N primeras comunidades del usuario que empiezan por un prefijo, con
+un UNION de propias y de miembro (sin OR sobre el JOIN ni DISTINCT). Se
+guardan por usuario junto al resto de prefijos ya pedidos e invalidar()
+las borra con el set.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Comunidad
+from .replicas import en_primaria
+
+TTL = getattr(settings, "EVENTWALL_MEMBRESIAS_TTL", 60 * 60)
+
+# Sugerencias por prefijo: cuántas se devuelven, cuánto duran en la caché
+# (un cambio de nombre de comunidad no las invalida) y cuántos prefijos se
+# guardan por usuario
+SUGERENCIAS = getattr(settings, "EVENTWALL_SUGERENCIAS_LIMITE", 10)
+SUGERENCIAS_TTL = getattr(settings, "EVENTWALL_SUGERENCIAS_TTL", 5 * 60)
+MAX_PREFIJOS = 50
+
+# Atributo donde se memoriza el set en el objeto user de la petición
+ATRIBUTO = "_eventwall_comunidades"
+
+
+def clave(user_id):
+    return f"eventwall:membresias:{user_id}"
+
+
+def clave_sugerencias(user_id):
+    return f"eventwall:sugerencias:{user_id}"
+
+
+def comunidades_de(user):
+    """frozenset con los ids de comunidades del usuario (propias o de las que es miembro)."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    ids = getattr(user, ATRIBUTO, None)
+    if ids is None:
+        ids = cache.get(clave(user.pk))
+        if ids is None:
+            with en_primaria():
+                ids = frozenset(_consulta(user.pk))
+            cache.set(clave(user.pk), ids, TTL)
+        setattr(user, ATRIBUTO, ids)
+    return ids
+
+
+async def acomunidades_de(user):
+    """comunidades_de con la caché y el ORM async."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    ids = getattr(user, ATRIBUTO, None)
+    if ids is None:
+        ids = await cache.aget(clave(user.pk))
+        if ids is None:
+            with en_primaria():
+                ids = frozenset([pk async for pk in _consulta(user.pk)])
+            await cache.aset(clave(user.pk), ids, TTL)
+        setattr(user, ATRIBUTO, ids)
+    return ids
+
+
+def _consulta(user_id):
+    propias = Comunidad.objects.filter(propietario_id=user_id).order_by().values_list("id", flat=True)
+    miembro = Comunidad.miembros.through.objects.filter(user_id=user_id).values_list("comunidad_id", flat=True)
+    return propias.union(miembro)
+
+
+def es_miembro(user, comunidad_id):
+    return comunidad_id in comunidades_de(user)
+
+
+async def aes_miembro(user, comunidad_id):
+    return comunidad_id in await acomunidades_de(user)
+
+
+def marcar_membresia(comunidades, user):
+    """Pone c.is_miembro en cada comunidad (para las plantillas)."""
+    ids = comunidades_de(user)
+    for c in comunidades:
+        c.is_miembro = c.id in ids
+    return comunidades
+
+
+async def amarcar_membresia(comunidades, user):
+    ids = await acomunidades_de(user)
+    for c in comunidades:
+        c.is_miembro = c.id in ids
+    return comunidades
+
+
+def _sugerencias(user_id, prefijo):
+    propias = Comunidad.objects.filter(propietario_id=user_id, nombre__istartswith=prefijo)
+    miembro = Comunidad.objects.filter(miembros=user_id, nombre__istartswith=prefijo)
+    union = propias.order_by().values_list("id", "nombre").union(miembro.order_by().values_list("id", "nombre"))
+    return list(union.order_by("nombre", "id")[:SUGERENCIAS])
+
+
+def sugerencias(user, prefijo):
+    """[(id, nombre)] de las primeras comunidades del usuario cuyo nombre empieza por 'prefijo'."""
+    prefijo = prefijo.strip().lower()
+    guardadas = cache.get(clave_sugerencias(user.pk)) or {}
+    if prefijo not in guardadas:
+        if len(guardadas) >= MAX_PREFIJOS:
+            guardadas = {}
+        with en_primaria():
+            guardadas[prefijo] = _sugerencias(user.pk, prefijo)
+        cache.set(clave_sugerencias(user.pk), guardadas, SUGERENCIAS_TTL)
+    return guardadas[prefijo]
+
+
+def invalidar(*user_ids):
+    """Borra el set cacheado (y las sugerencias) de los usuarios indicados."""
+    user_ids = [pk for pk in user_ids if pk is not None]
+    if user_ids:
+        cache.delete_many([k for pk in user_ids for k in (clave(pk), clave_sugerencias(pk))])
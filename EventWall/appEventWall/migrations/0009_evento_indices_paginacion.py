@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appEventWall', '0008_alter_comunidad_miembros'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['fecha', 'hora', 'id'], name='evento_fecha_hora_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['comunidad', 'fecha', 'hora', 'id'], name='evento_com_fecha_hora_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+# Campos indexados, igual que busqueda.CAMPOS (copiados para que la
+# migración no dependa del código de la app).
+TABLAS = {
+    "appEventWall_comunidad": ("nombre", "descripcion"),
+    "appEventWall_evento": ("titulo", "descripcion", "lugar"),
+}
+
+
+def crear_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for tabla, campos in TABLAS.items():
+        columnas = ", ".join(campos)
+        if vendor == "mysql":
+            schema_editor.execute(
+                f"ALTER TABLE {tabla} ADD FULLTEXT INDEX {tabla}_ft ({columnas})"
+            )
+        elif vendor == "sqlite":
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute("PRAGMA compile_options")
+                if "ENABLE_FTS5" not in {fila[0] for fila in cursor.fetchall()}:
+                    # Sin FTS5 la app usa el backend icontains
+                    return
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {tabla}_fts USING fts5"
+                f"({columnas}, tokenize='unicode61 remove_diacritics 2')"
+            )
+            schema_editor.execute(
+                f"INSERT INTO {tabla}_fts (rowid, {columnas}) "
+                f"SELECT id, {columnas} FROM {tabla}"
+            )
+
+
+def borrar_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for tabla in TABLAS:
+        if vendor == "mysql":
+            schema_editor.execute(f"ALTER TABLE {tabla} DROP INDEX {tabla}_ft")
+        elif vendor == "sqlite":
+            schema_editor.execute(f"DROP TABLE IF EXISTS {tabla}_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appEventWall', '0009_evento_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
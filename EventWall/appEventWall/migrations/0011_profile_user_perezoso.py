@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:58
+
+import appEventWall.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appEventWall', '0010_indices_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='user',
+            field=appEventWall.models.PerfilOneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appEventWall', '0011_profile_user_perezoso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comunidad',
+            name='eventos_modificados_en',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:08
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def rellenar_contadores(apps, schema_editor):
+    Comunidad = apps.get_model('appEventWall', 'Comunidad')
+    Evento = apps.get_model('appEventWall', 'Evento')
+    Miembro = Comunidad.miembros.through
+    miembros = (
+        Miembro.objects.filter(comunidad_id=OuterRef('pk'))
+        .order_by().values('comunidad_id').annotate(n=Count('*')).values('n')
+    )
+    eventos = (
+        Evento.objects.filter(comunidad_id=OuterRef('pk'))
+        .order_by().values('comunidad_id').annotate(n=Count('*')).values('n')
+    )
+    Comunidad.objects.update(
+        num_miembros=Coalesce(Subquery(miembros), 0),
+        num_eventos=Coalesce(Subquery(eventos), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appEventWall', '0012_comunidad_eventos_modificados_en'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comunidad',
+            name='num_eventos',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comunidad',
+            name='num_miembros',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(rellenar_contadores, migrations.RunPython.noop),
+    ]
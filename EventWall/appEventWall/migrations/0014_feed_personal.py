@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appEventWall', '0013_comunidad_contadores'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comunidad',
+            name='feed_en_lectura',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='EntradaFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora', models.TimeField(blank=True, null=True)),
+                ('comunidad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appEventWall.comunidad')),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appEventWall.evento')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'fecha', 'hora', 'evento'], name='entradafeed_user_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'evento'), name='entradafeed_user_evento_uniq')],
+            },
+        ),
+    ]
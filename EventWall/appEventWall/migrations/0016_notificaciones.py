@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appEventWall', '0015_cola_tareas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creada_en', models.DateTimeField(auto_now_add=True)),
+                ('leida', models.BooleanField(default=False)),
+                ('enviada_en', models.DateTimeField(blank=True, null=True)),
+                ('comunidad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appEventWall.comunidad')),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appEventWall.evento')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'leida', 'creada_en'], name='notificacion_user_leida_idx'), models.Index(fields=['enviada_en', 'user'], name='notificacion_pendiente_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'evento'), name='notificacion_user_evento_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copiar_usernames(apps, schema_editor):
+    Miembro = apps.get_model("appEventWall", "Miembro")
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    Miembro.objects.update(
+        username=Subquery(User.objects.filter(pk=OuterRef("user_id")).values("username")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appEventWall', '0016_notificaciones'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # La tabla intermedia ya existe: solo cambia el estado de las migraciones
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Miembro',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('comunidad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appEventWall.comunidad')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'appEventWall_comunidad_miembros',
+                        'unique_together': {('comunidad', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='comunidad',
+                    name='miembros',
+                    field=models.ManyToManyField(blank=True, related_name='miembro_de', through='appEventWall.Miembro', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='miembro',
+            name='username',
+            field=models.CharField(default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(copiar_usernames, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='miembro',
+            index=models.Index(fields=['comunidad', 'username'], name='miembro_comunidad_username_idx'),
+        ),
+    ]
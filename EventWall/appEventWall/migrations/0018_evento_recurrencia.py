@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appEventWall', '0017_miembro_directorio'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ocurrencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora', models.TimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='recurrencia',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='recurrencia_hasta',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['recurrencia_hasta'], name='evento_rec_hasta_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['comunidad', 'recurrencia_hasta'], name='evento_com_rec_hasta_idx'),
+        ),
+        migrations.AddField(
+            model_name='ocurrencia',
+            name='comunidad',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appEventWall.comunidad'),
+        ),
+        migrations.AddField(
+            model_name='ocurrencia',
+            name='evento',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocurrencias', to='appEventWall.evento'),
+        ),
+        migrations.AddIndex(
+            model_name='ocurrencia',
+            index=models.Index(fields=['comunidad', 'fecha', 'hora', 'evento'], name='ocurrencia_com_fecha_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ocurrencia',
+            constraint=models.UniqueConstraint(fields=('evento', 'fecha'), name='ocurrencia_evento_fecha_uniq'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:37
+
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def clave_lugar(lugar):
+    # Copia de conflictos.clave_lugar en el momento de esta migración
+    sin_acentos = "".join(c for c in unicodedata.normalize("NFKD", lugar or "") if unicodedata.category(c) != "Mn")
+    return " ".join(sin_acentos.casefold().split())
+
+
+def copiar_claves(apps, schema_editor):
+    Evento = apps.get_model("appEventWall", "Evento")
+    # Un UPDATE por lugar distinto, no por evento
+    for lugar in Evento.objects.exclude(lugar="").values_list("lugar", flat=True).distinct():
+        Evento.objects.filter(lugar=lugar).update(lugar_clave=clave_lugar(lugar))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appEventWall', '0018_evento_recurrencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='hora_fin',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='lugar_clave',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(copiar_claves, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['lugar_clave', 'fecha', 'hora'], name='evento_lugar_fecha_hora_idx'),
+        ),
+    ]
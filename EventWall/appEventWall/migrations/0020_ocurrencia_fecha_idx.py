@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appEventWall', '0019_evento_hora_fin_lugar'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ocurrencia',
+            index=models.Index(fields=['fecha', 'hora', 'evento'], name='ocurrencia_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appEventWall', '0020_ocurrencia_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarea',
+            name='latido_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,125 @@
+"""
+Miniaturas de Profile.foto.
+
+Cada foto tiene derivados cuadrados en TAMANOS, en WebP y en JPEG, guardados
+en el mismo storage bajo miniaturas/<tamano>/<clave>.<ext>. La clave sale del
+nombre del original, así que una foto nueva tiene rutas nuevas y los
+derivados se pueden cachear sin caducidad.
+
+Se generan al subir la foto, en un pool de hilos (programar(), ver
+signals.py) para no retrasar la respuesta, o al pedirlos por primera vez
+(vista miniatura_perfil) si aún no existen. Las páginas siempre enlazan esa
+vista con ?v=<clave> y no miran el storage al renderizar; su redirección al
+archivo se cachea en el navegador mientras la foto sea la misma. Antes de decodificar se mira el
+tamaño en la cabecera: más de MAX_PIXELES no se abre, y los JPEG se
+decodifican ya reducidos (draft) para no cargar la foto completa en memoria.
+"""
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Lado en píxeles de cada miniatura (se muestran a la mitad, para pantallas 2x)
+TAMANOS = {"chica": 96, "media": 160}
+
+# extensión -> (formato de Pillow, opciones de guardado)
+FORMATOS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+CARPETA = "miniaturas"
+
+# Ancho x alto máximo que se acepta decodificar (24 Mpx ~ 6000x4000)
+MAX_PIXELES = getattr(settings, "EVENTWALL_FOTO_MAX_PIXELES", 24_000_000)
+
+HILOS = getattr(settings, "EVENTWALL_MINIATURAS_HILOS", 2)
+
+
+class ImagenDemasiadoGrande(ValueError):
+    pass
+
+
+def clave(nombre):
+    """Identifica la foto original: cambia con cada foto nueva."""
+    return hashlib.sha1(nombre.encode()).hexdigest()[:20]
+
+
+def ruta(nombre, tamano, formato):
+    return f"{CARPETA}/{tamano}/{clave(nombre)}.{formato}"
+
+
+def comprobar(archivo):
+    """Lee solo la cabecera y lanza ImagenDemasiadoGrande si pasa de MAX_PIXELES."""
+    img = Image.open(archivo)
+    ancho, alto = img.size
+    if ancho * alto > MAX_PIXELES:
+        raise ImagenDemasiadoGrande(f"La imagen mide {ancho}x{alto} píxeles (máximo {MAX_PIXELES}).")
+    return img
+
+
+def _reducir(archivo, lado):
+    img = comprobar(archivo)
+    # JPEG: el decodificador escala 1/2, 1/4 o 1/8 sin cargar el original
+    img.draft("RGB", (lado, lado))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "L"):
+        # Transparencias (PNG, GIF) sobre fondo blanco; JPEG no tiene alfa
+        fondo = Image.new("RGB", img.size, "white")
+        fondo.paste(img.convert("RGBA"), mask=img.convert("RGBA"))
+        img = fondo
+    return ImageOps.fit(img.convert("RGB"), (lado, lado), Image.LANCZOS)
+
+
+def generar(nombre, tamano, formato, storage=None):
+    """Devuelve la ruta del derivado, creándolo si no existe."""
+    storage = storage or default_storage
+    destino = ruta(nombre, tamano, formato)
+    if storage.exists(destino):
+        return destino
+    with storage.open(nombre, "rb") as archivo:
+        img = _reducir(archivo, TAMANOS[tamano])
+    formato_pil, opciones = FORMATOS[formato]
+    buffer = BytesIO()
+    img.save(buffer, formato_pil, **opciones)
+    guardado = storage.save(destino, ContentFile(buffer.getvalue()))
+    if guardado != destino:
+        # Otro hilo lo generó a la vez; el storage renombró el nuestro
+        storage.delete(guardado)
+    return destino
+
+
+def generar_todas(nombre, storage=None):
+    for tamano in TAMANOS:
+        for formato in FORMATOS:
+            try:
+                generar(nombre, tamano, formato, storage)
+            except (OSError, ImagenDemasiadoGrande):
+                # Se reintentará al pedirla (miniatura_perfil)
+                logger.exception("No se pudo generar la miniatura %s/%s de %s", tamano, formato, nombre)
+                return
+
+
+def borrar_todas(nombre, storage=None):
+    storage = storage or default_storage
+    for tamano in TAMANOS:
+        for formato in FORMATOS:
+            storage.delete(ruta(nombre, tamano, formato))
+
+
+_pool = None
+
+
+def programar(funcion, nombre):
+    """Ejecuta funcion(nombre) en el pool de miniaturas (no bloquea la petición)."""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=HILOS, thread_name_prefix="miniaturas")
+    return _pool.submit(funcion, nombre)
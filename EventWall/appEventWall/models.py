@@ -1,9 +1,32 @@
 from django.db import models
+from django.utils import timezone
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db.models.fields.related_descriptors import ReverseOneToOneDescriptor
+
+
+class PerfilPerezosoDescriptor(ReverseOneToOneDescriptor):
+    """user.profile crea el Profile la primera vez que se accede si no existe."""
+
+    def __get__(self, instance, cls=None):
+        if instance is None or instance.pk is None:
+            return super().__get__(instance, cls)
+        try:
+            return super().__get__(instance, cls)
+        except self.RelatedObjectDoesNotExist:
+            perfil, _ = self.related.related_model.objects.get_or_create(
+                **{self.related.field.name: instance}
+            )
+            self.related.set_cached_value(instance, perfil)
+            return perfil
+
+
+class PerfilOneToOneField(models.OneToOneField):
+    related_accessor_class = PerfilPerezosoDescriptor
+
 
 class Profile(models.Model):
-    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    user = PerfilOneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField(blank=True, null=True)
     telefono = models.CharField(max_length=20, blank=True, null=True)
     foto = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
@@ -25,7 +48,12 @@ class Evento(models.Model):
     descripcion = models.TextField(blank=True)
     fecha = models.DateField()
     hora = models.TimeField(blank=True, null=True)
+    # Fin del evento (mismo día); sin él se supone que dura conflictos.DURACION
+    hora_fin = models.TimeField(blank=True, null=True)
     lugar = models.CharField(max_length=100, blank=True)
+    # 'lugar' sin mayúsculas, acentos ni espacios de más; la calcula save()
+    # y con ella se comparan los lugares (ver conflictos.py)
+    lugar_clave = models.CharField(max_length=100, blank=True, default="", editable=False)
 
     # Tipo con choices (del modelo nuevo)
     tipo = models.CharField(
@@ -52,9 +80,55 @@ class Evento(models.Model):
         blank=True
     )
 
+    # Regla de repetición (subconjunto de RRULE, ver recurrencia.py); vacía
+    # en los eventos simples. 'fecha' es entonces la de inicio de la serie.
+    recurrencia = models.CharField(max_length=200, blank=True, default="")
+    # Última fecha posible de la serie (NULL si no es recurrente); la calcula save()
+    recurrencia_hasta = models.DateField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Coinciden con el orden de paginación por cursor (fecha, hora, id)
+            models.Index(fields=["fecha", "hora", "id"], name="evento_fecha_hora_id_idx"),
+            models.Index(fields=["comunidad", "fecha", "hora", "id"], name="evento_com_fecha_hora_idx"),
+            # Series que siguen vivas a partir de una fecha
+            models.Index(fields=["recurrencia_hasta"], name="evento_rec_hasta_idx"),
+            models.Index(fields=["comunidad", "recurrencia_hasta"], name="evento_com_rec_hasta_idx"),
+            # Conflictos de lugar: los eventos de un lugar y un día, por hora
+            models.Index(fields=["lugar_clave", "fecha", "hora"], name="evento_lugar_fecha_hora_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Recordamos la comunidad cargada para detectar reasignaciones al guardar
+        instance._comunidad_id_original = dict(zip(field_names, values)).get("comunidad_id")
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .conflictos import clave_lugar
+        from .recurrencia import ultima_fecha
+        self.recurrencia_hasta = ultima_fecha(self.recurrencia, self.fecha) if self.recurrencia else None
+        self.lugar_clave = clave_lugar(self.lugar)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "recurrencia_hasta", "lugar_clave"}
+        super().save(*args, **kwargs)
+
+    @property
+    def recurrencia_legible(self):
+        from .recurrencia import describir
+        return describir(self.recurrencia) if self.recurrencia else ""
+
+    def comunidades_afectadas(self):
+        """Ids de comunidad actual y anterior (si el evento se movió de comunidad)."""
+        ids = {self.comunidad_id, getattr(self, "_comunidad_id_original", None)}
+        ids.discard(None)
+        return ids
+
     def __str__(self):
         return self.titulo
-    
+
+
 class Comunidad(models.Model):
     nombre = models.CharField(max_length=150)
     descripcion = models.TextField(blank=True)
@@ -65,21 +139,185 @@ class Comunidad(models.Model):
     )
     miembros = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
+        through='Miembro',
         related_name='miembro_de',
         blank=True
     )
     creada_en = models.DateTimeField(auto_now_add=True)
+    # Última vez que se creó/editó/borró un evento de la comunidad (ETag de exportaciones)
+    eventos_modificados_en = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Contadores desnormalizados (ver contadores.py); se actualizan con F()
+    num_miembros = models.PositiveIntegerField(default=0, editable=False)
+    num_eventos = models.PositiveIntegerField(default=0, editable=False)
+    # Comunidad demasiado grande para repartir sus eventos en el feed de
+    # cada miembro: se leen al pedir el feed (ver feed.py)
+    feed_en_lectura = models.BooleanField(default=False, editable=False)
 
     class Meta:
         ordering = ['-creada_en']
 
+    # Campos que solo se actualizan con UPDATE/F() desde señales
+    CAMPOS_DESNORMALIZADOS = ("num_miembros", "num_eventos", "eventos_modificados_en", "feed_en_lectura")
+
     def __str__(self):
         return self.nombre
 
+    def save(self, *args, **kwargs):
+        # Un save() normal no debe pisar los contadores con valores viejos
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CAMPOS_DESNORMALIZADOS
+            ]
+        super().save(*args, **kwargs)
+
     def es_miembro(self, user):
         """Devuelve True si user es propietario o está en miembros"""
         if user is None or not user.is_authenticated:
             return False
         if self.propietario_id == getattr(user, "id", None):
             return True
-        return self.miembros.filter(pk=user.pk).exists()
\ No newline at end of file
+        # Lookup en el set cacheado del usuario, sin ir a la BD
+        from .membresias import es_miembro
+        return es_miembro(user, self.pk)
+
+
+class Miembro(models.Model):
+    """
+    Tabla intermedia de Comunidad.miembros (la misma tabla que creaba Django).
+    Lleva una copia del username para paginar y buscar el directorio de
+    miembros por el índice (comunidad, username) sin JOIN (ver directorio.py).
+    """
+    comunidad = models.ForeignKey(Comunidad, on_delete=models.CASCADE, related_name="+")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    # La rellenan las señales al añadir miembros y al renombrar usuarios
+    username = models.CharField(max_length=150, default="", editable=False)
+
+    class Meta:
+        db_table = "appEventWall_comunidad_miembros"
+        unique_together = [("comunidad", "user")]
+        indexes = [
+            models.Index(fields=["comunidad", "username"], name="miembro_comunidad_username_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} en {self.comunidad_id}"
+
+
+class Ocurrencia(models.Model):
+    """
+    Ocurrencia de un evento recurrente dentro de la ventana materializada
+    (la rellena recurrencia.refrescar). Es opcional: sin ella las
+    ocurrencias se generan al vuelo, y las listas tienen que mirar todas las
+    series vivas en cada página.
+    """
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name="ocurrencias")
+    comunidad = models.ForeignKey(Comunidad, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    fecha = models.DateField()
+    hora = models.TimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["evento", "fecha"], name="ocurrencia_evento_fecha_uniq"),
+        ]
+        indexes = [
+            # Mismo orden que el calendario y las listas, por comunidad
+            models.Index(fields=["comunidad", "fecha", "hora", "evento"], name="ocurrencia_com_fecha_idx"),
+            # Y sin comunidad (lista de todos los eventos)
+            models.Index(fields=["fecha", "hora", "evento"], name="ocurrencia_fecha_idx"),
+        ]
+
+
+class EntradaFeed(models.Model):
+    """
+    Evento de una comunidad del usuario, copiado a su feed al crearse el
+    evento (fan-out al escribir). Ver feed.py.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="feed")
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name="+")
+    comunidad = models.ForeignKey(Comunidad, on_delete=models.CASCADE, related_name="+")
+    # Copia de fecha/hora del evento para paginar el feed sin JOIN
+    fecha = models.DateField()
+    hora = models.TimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "evento"], name="entradafeed_user_evento_uniq"),
+        ]
+        indexes = [
+            # Mismo orden que la paginación por cursor, por usuario
+            models.Index(fields=["user", "fecha", "hora", "evento"], name="entradafeed_user_fecha_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.evento_id}"
+
+
+class Tarea(models.Model):
+    """
+    Trabajo pendiente de la cola de tareas (ver tareas.py). Lo ejecuta
+    manage.py run_worker fuera de la petición.
+    """
+    PENDIENTE = "pendiente"
+    EN_CURSO = "en_curso"
+    HECHA = "hecha"
+    FALLIDA = "fallida"
+    ESTADOS = [
+        (PENDIENTE, "Pendiente"),
+        (EN_CURSO, "En curso"),
+        (HECHA, "Hecha"),
+        (FALLIDA, "Fallida"),
+    ]
+
+    # Ruta de la función (p.ej. "appEventWall.feed.repartir_evento")
+    nombre = models.CharField(max_length=200)
+    argumentos = models.JSONField(default=dict)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=5)
+    # No se ejecuta antes de esta hora (reintentos con espera)
+    disponible_en = models.DateTimeField(default=timezone.now)
+    creada_en = models.DateTimeField(auto_now_add=True)
+    reclamada_en = models.DateTimeField(null=True, blank=True)
+    trabajador = models.CharField(max_length=100, blank=True)
+    # Lo renueva el worker mientras la ejecuta; si caduca, se da por muerto
+    latido_en = models.DateTimeField(null=True, blank=True)
+    ultimo_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # El worker busca "pendientes ya disponibles" por orden de llegada
+            models.Index(fields=["estado", "disponible_en"], name="tarea_estado_disponible_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} ({self.estado})"
+
+
+class Notificacion(models.Model):
+    """
+    Aviso a un usuario de un evento nuevo en una de sus comunidades. Se
+    crean en bloque y se mandan por correo en resúmenes (ver notificaciones.py).
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="notificaciones")
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name="+")
+    comunidad = models.ForeignKey(Comunidad, on_delete=models.CASCADE, related_name="+")
+    creada_en = models.DateTimeField(auto_now_add=True)
+    leida = models.BooleanField(default=False)
+    # Cuándo entró en un correo resumen (None: pendiente de enviar)
+    enviada_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Reintentar el reparto no duplica avisos
+            models.UniqueConstraint(fields=["user", "evento"], name="notificacion_user_evento_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "leida", "creada_en"], name="notificacion_user_leida_idx"),
+            # Resúmenes: pendientes de enviar, recorridas por usuario
+            models.Index(fields=["enviada_en", "user"], name="notificacion_pendiente_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} <- {self.evento_id}"
@@ -0,0 +1,226 @@
+import base64
+import heapq
+from datetime import date, time, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F, Q
+
+from .models import Ocurrencia
+from . import recurrencia
+
+# Tamaño de página por defecto y máximo permitido vía ?page_size=
+PAGE_SIZE = getattr(settings, "EVENTWALL_PAGE_SIZE", 50)
+MAX_PAGE_SIZE = getattr(settings, "EVENTWALL_MAX_PAGE_SIZE", 200)
+
+# Orden estable de eventos: (fecha, hora, id). Los eventos sin hora van
+# primero dentro de su día (igual que hacen MySQL y SQLite por defecto).
+ORDEN_EVENTOS = (F("fecha").asc(), F("hora").asc(nulls_first=True), F("id").asc())
+
+
+def codificar_cursor(evento):
+    """Token opaco ?after= a partir del último evento de la página (instancia o fila de .values())."""
+    if isinstance(evento, dict):
+        fecha, hora, pk = evento["fecha"], evento["hora"], evento["id"]
+    else:
+        fecha, hora, pk = evento.fecha, evento.hora, evento.pk
+    hora = hora.strftime("%H:%M:%S") if hora else ""
+    crudo = f"{fecha.isoformat()}|{hora}|{pk}"
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(token):
+    """Devuelve (fecha, hora, id) o None si el token no es válido."""
+    if not token:
+        return None
+    try:
+        relleno = "=" * (-len(token) % 4)
+        crudo = base64.urlsafe_b64decode(token + relleno).decode()
+        fecha, hora, pk = crudo.split("|")
+        return (
+            date.fromisoformat(fecha),
+            time.fromisoformat(hora) if hora else None,
+            int(pk),
+        )
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def filtro_despues_de(fecha, hora, pk, campo_id="id"):
+    """
+    Condición "fila > cursor" para el orden (fecha, hora NULLS FIRST, id).
+    Se expresa con ORs de igualdades + rangos para que el índice
+    (fecha, hora, id) se recorra como un rango acotado. 'campo_id' permite
+    usarla en tablas donde el desempate es otra columna (p.ej. evento_id).
+    """
+    mismo_dia = Q(fecha=fecha)
+    if hora is None:
+        siguientes = (
+            Q(hora__isnull=True, **{f"{campo_id}__gt": pk}) | Q(hora__isnull=False)
+        )
+    else:
+        siguientes = Q(hora__gt=hora) | Q(hora=hora, **{f"{campo_id}__gt": pk})
+    return Q(fecha__gt=fecha) | (mismo_dia & siguientes)
+
+
+def obtener_tamano_pagina(valor):
+    """Convierte ?page_size= en un entero dentro de [1, MAX_PAGE_SIZE]."""
+    try:
+        tamano = int(valor)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(tamano, MAX_PAGE_SIZE))
+
+
+def _pagina_de_eventos(queryset, after, page_size):
+    """(queryset de la página + 1 fila, tamaño) para paginar_eventos / apaginar_eventos."""
+    tamano = obtener_tamano_pagina(page_size)
+    queryset = queryset.order_by(*ORDEN_EVENTOS)
+
+    cursor = decodificar_cursor(after)
+    if cursor is not None:
+        queryset = queryset.filter(filtro_despues_de(*cursor))
+
+    # Pedimos uno de más para saber si existe una página siguiente
+    return queryset[: tamano + 1], tamano
+
+
+def _cortar(eventos, tamano):
+    siguiente = None
+    if len(eventos) > tamano:
+        eventos = eventos[:tamano]
+        siguiente = codificar_cursor(eventos[-1])
+    return eventos, siguiente
+
+
+def paginar_eventos(queryset, after=None, page_size=None):
+    """
+    Paginación por cursor (keyset) sobre (fecha, hora, id).
+
+    Devuelve (eventos, siguiente) donde 'siguiente' es el token para
+    ?after= de la próxima página, o None si no hay más eventos.
+    """
+    queryset, tamano = _pagina_de_eventos(queryset, after, page_size)
+    return _cortar(list(queryset), tamano)
+
+
+async def apaginar_eventos(queryset, after=None, page_size=None):
+    """paginar_eventos con el ORM async (vistas de views_async)."""
+    queryset, tamano = _pagina_de_eventos(queryset, after, page_size)
+    return _cortar([e async for e in queryset], tamano)
+
+
+def paginar_por_id(queryset, after=None, page_size=None):
+    """
+    Igual que paginar_eventos pero con orden por id (p.ej. comunidades).
+    El cursor es el id del último elemento, en el mismo formato base64.
+    """
+    tamano = obtener_tamano_pagina(page_size)
+    queryset = queryset.order_by("id")
+    try:
+        relleno = "=" * (-len(after) % 4)
+        queryset = queryset.filter(id__gt=int(base64.urlsafe_b64decode(after + relleno)))
+    except (TypeError, ValueError):
+        pass
+
+    filas = list(queryset[: tamano + 1])
+    siguiente = None
+    if len(filas) > tamano:
+        filas = filas[:tamano]
+        ultimo = filas[-1]["id"] if isinstance(filas[-1], dict) else filas[-1].pk
+        siguiente = base64.urlsafe_b64encode(str(ultimo).encode()).decode().rstrip("=")
+    return filas, siguiente
+
+
+# ---------------- Listas con eventos recurrentes ----------------
+
+# Mismo orden que ORDEN_EVENTOS en la tabla Ocurrencia
+ORDEN_OCURRENCIAS = (F("fecha").asc(), F("hora").asc(nulls_first=True), F("evento_id").asc())
+
+
+def ocurrencias_de_pagina(filtro, cursor, desde, hasta, tamano, materializada):
+    """
+    Ocurrencias de una página leídas de la tabla Ocurrencia (las de
+    'filtro' entre desde y hasta, después del cursor) como un rango del
+    índice de tamano + 1 filas como mucho. Devuelve (queryset o None,
+    resto): 'resto' es la fecha desde la que hay que generarlas al vuelo
+    (None si ninguna). Es 'desde' si la ventana materializada no cubre la
+    página, y el día siguiente a su final si la página puede pasar de ella.
+    'materializada' es recurrencia.ventana() (o aventana() desde async): la
+    lee quien llama para no tocar la caché síncrona en el bucle de eventos.
+    """
+    if materializada is None or desde < materializada[0]:
+        return None, desde
+    fin = materializada[1] if hasta is None else min(hasta, materializada[1])
+    ocurrencias = Ocurrencia.objects.filter(**filtro, fecha__gte=desde, fecha__lte=fin)
+    if cursor is not None:
+        ocurrencias = ocurrencias.filter(filtro_despues_de(*cursor, campo_id="evento_id"))
+    resto = max(fin + timedelta(days=1), desde) if fin < (hasta or recurrencia.SIN_FIN) else None
+    return ocurrencias.order_by(*ORDEN_OCURRENCIAS)[: tamano + 1], resto
+
+
+def _leidas(simples, after, tamano, comunidad_id, materializada):
+    """(ocurrencias de Ocurrencia, resto, hasta) de la página (ver ocurrencias_de_pagina)."""
+    # Si la página ya tiene tamano + 1 eventos simples, ninguna ocurrencia
+    # posterior al último entra en ella
+    hasta = simples[-1].fecha if len(simples) > tamano else None
+    cursor = decodificar_cursor(after)
+    filtro = {} if comunidad_id is None else {"comunidad_id": comunidad_id}
+    leidas, resto = ocurrencias_de_pagina(
+        filtro, cursor, cursor[0] if cursor else date.min, hasta, tamano, materializada
+    )
+    if leidas is not None:
+        leidas = leidas.select_related("evento__comunidad")
+    return leidas, resto, hasta
+
+
+def _series(queryset, leidas, resto, hasta, tamano):
+    """Series que hay que expandir al vuelo desde 'resto', o None."""
+    if resto is None or len(leidas) > tamano:
+        return None
+    series = queryset.filter(recurrencia_hasta__gte=resto)
+    if hasta is not None:
+        series = series.filter(fecha__lte=hasta)
+    return series.order_by()
+
+
+def _evento(ocurrencia):
+    evento = ocurrencia.evento
+    evento.fecha = ocurrencia.fecha
+    return evento
+
+
+def _mezclar(simples, leidas, series, after, resto, hasta, tamano):
+    cursor = decodificar_cursor(after)
+    ocurrencias = [recurrencia.ocurrencias(s, resto, hasta, cursor) for s in series]
+    filas = heapq.merge(simples, map(_evento, leidas), *ocurrencias, key=recurrencia.clave_orden)
+    return _cortar(list(islice(filas, tamano + 1)), tamano)
+
+
+def paginar_con_series(queryset, after=None, page_size=None, comunidad_id=None):
+    """
+    paginar_eventos para listas de instancias con eventos recurrentes: cada
+    serie aparece una vez por ocurrencia (copias del evento con la fecha de
+    la ocurrencia). Las ocurrencias se leen de la tabla Ocurrencia por
+    índice, como mucho una página, y solo las que quedan fuera de la
+    ventana materializada se generan al vuelo. 'queryset' son los eventos
+    de la comunidad 'comunidad_id', o todos si es None.
+    """
+    simples, tamano = _pagina_de_eventos(queryset.filter(recurrencia_hasta__isnull=True), after, page_size)
+    simples = list(simples)
+    leidas, resto, hasta = _leidas(simples, after, tamano, comunidad_id, recurrencia.ventana())
+    leidas = list(leidas) if leidas is not None else []
+    series = _series(queryset, leidas, resto, hasta, tamano)
+    series = list(series) if series is not None else []
+    return _mezclar(simples, leidas, series, after, resto, hasta, tamano)
+
+
+async def apaginar_con_series(queryset, after=None, page_size=None, comunidad_id=None):
+    """paginar_con_series con el ORM async (vistas de views_async)."""
+    simples, tamano = _pagina_de_eventos(queryset.filter(recurrencia_hasta__isnull=True), after, page_size)
+    simples = [e async for e in simples]
+    leidas, resto, hasta = _leidas(simples, after, tamano, comunidad_id, await recurrencia.aventana())
+    leidas = [o async for o in leidas] if leidas is not None else []
+    series = _series(queryset, leidas, resto, hasta, tamano)
+    series = [s async for s in series] if series is not None else []
+    return _mezclar(simples, leidas, series, after, resto, hasta, tamano)
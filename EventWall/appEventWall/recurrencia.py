@@ -0,0 +1,369 @@
+"""
+Eventos recurrentes: un subconjunto de RRULE (RFC 5545) en Evento.recurrencia.
+
+Una serie es una sola fila de Evento. Su fecha/hora es la de inicio
+(DTSTART) y recurrencia_hasta la última fecha posible (SIN_FIN si no acaba;
+NULL en los eventos simples). Las ocurrencias no se guardan: fechas() las
+genera solo para la ventana pedida, saltando directamente a su inicio.
+
+Soportado: FREQ=DAILY|WEEKLY|MONTHLY, INTERVAL, BYDAY (solo WEEKLY), COUNT
+y UNTIL (fecha). Ejemplo: FREQ=WEEKLY;BYDAY=TU,TH;UNTIL=20271231. Como en
+RFC 5545, un mes sin ese día (31 de abril) no tiene ocurrencia.
+
+Dónde se expanden:
+- Listas con cursor (eventos_list, comunidad_detalle y mi muro): se mezclan
+  los eventos simples de la página con las ocurrencias de las series, con
+  el mismo orden (fecha, hora, id) y el mismo cursor (ver
+  paginacion.paginar_con_series). Dentro de la ventana materializada se
+  leen de la tabla Ocurrencia como un rango del índice, como mucho una
+  página; fuera de ella (o si no hay ventana) se generan las de las series
+  vivas.
+- Calendario (calendario.por_dia). Si la ventana cae dentro de la
+  materializada, las ocurrencias se leen de la tabla Ocurrencia por el
+  índice (comunidad, fecha). Si no, se generan igual que en las listas.
+
+La ventana materializada va del inicio de cada serie a DIAS_MATERIALIZADOS
+después de hoy. La rellena refrescar() en bloque (manage.py
+refrescar_ocurrencias, p.ej. cada noche desde cron). Al guardar una serie
+se rehacen solo sus filas (refrescar_evento).
+"""
+import calendar
+import copy
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import Evento, Ocurrencia
+
+# recurrencia_hasta de las series sin COUNT ni UNTIL
+SIN_FIN = date.max
+
+# Más ocurrencias no tiene sentido en una serie con COUNT
+MAX_COUNT = 1000
+
+FRECUENCIAS = ("DAILY", "WEEKLY", "MONTHLY")
+DIAS_SEMANA = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+NOMBRES_DIAS = ("lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo")
+
+# Días después de hoy que materializa manage.py refrescar_ocurrencias
+DIAS_MATERIALIZADOS = getattr(settings, "EVENTWALL_OCURRENCIAS_DIAS", 90)
+
+# Filas por bulk_create al materializar
+BATCH_SIZE = getattr(settings, "EVENTWALL_OCURRENCIAS_BATCH_SIZE", 5000)
+
+CLAVE_VENTANA = "eventwall:ocurrencias:ventana"
+
+
+class ReglaInvalida(ValueError):
+    pass
+
+
+class Regla:
+    """Una RRULE ya validada."""
+
+    def __init__(self, frecuencia, intervalo=1, dias=(), cuenta=None, hasta=None):
+        self.frecuencia = frecuencia
+        self.intervalo = intervalo
+        self.dias = dias
+        self.cuenta = cuenta
+        self.hasta = hasta
+
+    def __str__(self):
+        partes = [f"FREQ={self.frecuencia}"]
+        if self.intervalo != 1:
+            partes.append(f"INTERVAL={self.intervalo}")
+        if self.dias:
+            partes.append("BYDAY=" + ",".join(DIAS_SEMANA[d] for d in self.dias))
+        if self.cuenta is not None:
+            partes.append(f"COUNT={self.cuenta}")
+        if self.hasta is not None:
+            partes.append(f"UNTIL={self.hasta:%Y%m%d}")
+        return ";".join(partes)
+
+
+def _entero(clave, valor, maximo):
+    # isdigit() también acepta "²" o "٣", que int() no entiende o lee distinto
+    if not (valor.isascii() and valor.isdigit()) or not 1 <= int(valor) <= maximo:
+        raise ReglaInvalida(f"{clave} debe ser un número entre 1 y {maximo}.")
+    return int(valor)
+
+
+def parsear(texto):
+    """Regla a partir del texto (con o sin el prefijo 'RRULE:'); lanza ReglaInvalida."""
+    partes = {}
+    for trozo in texto.strip().upper().removeprefix("RRULE:").split(";"):
+        if not trozo:
+            continue
+        clave, igual, valor = trozo.partition("=")
+        if not igual or clave in partes:
+            raise ReglaInvalida(f"Parte no válida: {trozo}.")
+        partes[clave] = valor
+    desconocidas = set(partes) - {"FREQ", "INTERVAL", "BYDAY", "COUNT", "UNTIL"}
+    if desconocidas:
+        raise ReglaInvalida(f"No se admite {', '.join(sorted(desconocidas))}.")
+    frecuencia = partes.get("FREQ")
+    if frecuencia not in FRECUENCIAS:
+        raise ReglaInvalida(f"FREQ debe ser uno de: {', '.join(FRECUENCIAS)}.")
+    regla = Regla(frecuencia, _entero("INTERVAL", partes.get("INTERVAL", "1"), 999))
+    if "BYDAY" in partes:
+        if frecuencia != "WEEKLY":
+            raise ReglaInvalida("BYDAY solo se admite con FREQ=WEEKLY.")
+        dias = partes["BYDAY"].split(",")
+        if not set(dias) <= set(DIAS_SEMANA):
+            raise ReglaInvalida(f"BYDAY debe ser una lista de: {','.join(DIAS_SEMANA)}.")
+        regla.dias = tuple(sorted({DIAS_SEMANA.index(d) for d in dias}))
+    if "COUNT" in partes and "UNTIL" in partes:
+        raise ReglaInvalida("COUNT y UNTIL no pueden ir juntos.")
+    if "COUNT" in partes:
+        regla.cuenta = _entero("COUNT", partes["COUNT"], MAX_COUNT)
+    if "UNTIL" in partes:
+        try:
+            # AAAAMMDD o AAAAMMDDTHHMMSS[Z]: las ocurrencias son días, la hora no cuenta
+            regla.hasta = date(int(partes["UNTIL"][:4]), int(partes["UNTIL"][4:6]), int(partes["UNTIL"][6:8]))
+        except ValueError:
+            raise ReglaInvalida("UNTIL debe ser una fecha AAAAMMDD.")
+    return regla
+
+
+# ---------------- Expansión ----------------
+
+
+def _diarias(regla, inicio, desde):
+    paso = regla.intervalo
+    n = max(0, -(-(desde - inicio).days // paso))
+    while True:
+        dias = n * paso
+        if dias > (SIN_FIN - inicio).days:
+            return
+        yield n, inicio + timedelta(days=dias)
+        n += 1
+
+
+def _semanales(regla, inicio, desde):
+    dias = regla.dias or (inicio.weekday(),)
+    lunes0 = inicio - timedelta(days=inicio.weekday())
+    # La primera semana solo tiene los días desde el inicio
+    primera = [d for d in dias if d >= inicio.weekday()]
+    p = max(0, (desde - lunes0).days // 7 // regla.intervalo)
+    n = 0 if p == 0 else len(primera) + (p - 1) * len(dias)
+    while True:
+        desplazamiento = 7 * regla.intervalo * p
+        if desplazamiento + 6 > (SIN_FIN - lunes0).days:
+            return
+        lunes = lunes0 + timedelta(days=desplazamiento)
+        for d in primera if p == 0 else dias:
+            yield n, lunes + timedelta(days=d)
+            n += 1
+        p += 1
+
+
+def _mensuales(regla, inicio, desde):
+    mes0 = inicio.year * 12 + inicio.month - 1
+    m = 0
+    if regla.cuenta is None and desde > inicio:
+        # Sin COUNT no hace falta contar los meses saltados (los que no tienen ese día)
+        m = max(0, (desde.year * 12 + desde.month - 1 - mes0) // regla.intervalo)
+    n = 0
+    while True:
+        anio, mes = divmod(mes0 + m * regla.intervalo, 12)
+        if anio > SIN_FIN.year:
+            return
+        if inicio.day <= calendar.monthrange(anio, mes + 1)[1]:
+            yield n, date(anio, mes + 1, inicio.day)
+            n += 1
+        m += 1
+
+
+_GENERADORES = {"DAILY": _diarias, "WEEKLY": _semanales, "MONTHLY": _mensuales}
+
+
+def fechas(regla, inicio, desde=None, hasta=None):
+    """Fechas de las ocurrencias entre desde y hasta (incluidos), en orden, generadas al vuelo."""
+    if isinstance(regla, str):
+        regla = parsear(regla)
+    desde = max(desde or inicio, inicio)
+    limite = min(hasta or SIN_FIN, regla.hasta or SIN_FIN)
+    for n, fecha in _GENERADORES[regla.frecuencia](regla, inicio, desde):
+        if regla.cuenta is not None and n >= regla.cuenta:
+            return
+        if fecha > limite:
+            return
+        if fecha >= desde:
+            yield fecha
+
+
+def ultima_fecha(texto, inicio):
+    """Valor de recurrencia_hasta: la última fecha posible de la serie."""
+    regla = parsear(texto)
+    if regla.hasta is not None:
+        return max(regla.hasta, inicio)
+    if regla.cuenta is not None:
+        ultima = inicio
+        for ultima in fechas(regla, inicio):
+            pass
+        return ultima
+    return SIN_FIN
+
+
+def describir(texto):
+    """La regla en castellano para las plantillas ("Cada 2 semanas (lunes, jueves) hasta 31/12/2027")."""
+    try:
+        regla = parsear(texto)
+    except ReglaInvalida:
+        return ""
+    unidad = {"DAILY": ("día", "días"), "WEEKLY": ("semana", "semanas"), "MONTHLY": ("mes", "meses")}
+    singular, plural = unidad[regla.frecuencia]
+    frase = f"Cada {singular}" if regla.intervalo == 1 else f"Cada {regla.intervalo} {plural}"
+    if regla.dias:
+        frase += f" ({', '.join(NOMBRES_DIAS[d] for d in regla.dias)})"
+    if regla.cuenta is not None:
+        frase += f", {regla.cuenta} veces"
+    if regla.hasta is not None:
+        frase += f" hasta {regla.hasta:%d/%m/%Y}"
+    return frase
+
+
+# ---------------- Mezcla con los eventos simples ----------------
+
+
+def clave_orden(fila):
+    """(fecha, hora NULLS FIRST, id), igual que ORDEN_EVENTOS, de una instancia o un dict."""
+    if isinstance(fila, dict):
+        fecha, hora, pk = fila["fecha"], fila["hora"], fila["id"]
+    else:
+        fecha, hora, pk = fila.fecha, fila.hora, fila.pk
+    return fecha, hora is not None, hora or time.min, pk
+
+
+def ocurrencias(serie, desde=None, hasta=None, cursor=None):
+    """
+    Copias de la serie (instancia o dict con 'recurrencia') con la fecha de
+    cada ocurrencia entre desde y hasta. Con 'cursor' (fecha, hora, id),
+    solo las que van después de él en el orden de las listas.
+    """
+    despues_de = None
+    if cursor is not None:
+        despues_de = clave_orden({"fecha": cursor[0], "hora": cursor[1], "id": cursor[2]})
+        desde = max(desde or cursor[0], cursor[0])
+    es_dict = isinstance(serie, dict)
+    regla = parsear(serie["recurrencia"] if es_dict else serie.recurrencia)
+    inicio = serie["fecha"] if es_dict else serie.fecha
+    for fecha in fechas(regla, inicio, desde, hasta):
+        if es_dict:
+            ocurrencia = {**serie, "fecha": fecha}
+        else:
+            ocurrencia = copy.copy(serie)
+            ocurrencia.fecha = fecha
+        if despues_de is None or clave_orden(ocurrencia) > despues_de:
+            yield ocurrencia
+
+
+# ---------------- Ocurrencias materializadas ----------------
+
+
+def ventana():
+    """(desde, hasta) materializados en Ocurrencia, o None."""
+    return cache.get(CLAVE_VENTANA)
+
+
+async def aventana():
+    """ventana() para las vistas async: no bloquea el bucle de eventos."""
+    return await cache.aget(CLAVE_VENTANA)
+
+
+def cubre(desde, hasta):
+    materializada = ventana()
+    return materializada is not None and materializada[0] <= desde and hasta <= materializada[1]
+
+
+def _filas(series, desde, hasta):
+    for pk, comunidad_id, inicio, hora, texto in series:
+        for fecha in fechas(texto, inicio, desde, hasta):
+            yield Ocurrencia(evento_id=pk, comunidad_id=comunidad_id, fecha=fecha, hora=hora)
+
+
+def _series_en(desde, hasta):
+    return Evento.objects.filter(recurrencia_hasta__gte=desde, fecha__lte=hasta)
+
+
+def refrescar(desde=None, hasta=None, batch_size=BATCH_SIZE):
+    """
+    Materializa las ocurrencias de todas las series entre desde (el inicio
+    de cada una) y hasta (DIAS_MATERIALIZADOS después de hoy). Borra las
+    anteriores y las crea con bulk_create por bloques. Devuelve las filas
+    creadas.
+    """
+    desde = desde or date.min
+    hasta = hasta or date.today() + timedelta(days=DIAS_MATERIALIZADOS - 1)
+    # Mientras se rehace, las consultas expanden al vuelo
+    cache.delete(CLAVE_VENTANA)
+    with transaction.atomic():
+        Ocurrencia.objects.all().delete()
+        total = _crear(_series_en(desde, hasta), desde, hasta, batch_size)
+    transaction.on_commit(lambda: cache.set(CLAVE_VENTANA, (desde, hasta), None))
+    return total
+
+
+def _crear(series, desde, hasta, batch_size):
+    columnas = series.values_list("pk", "comunidad_id", "fecha", "hora", "recurrencia")
+    total, lote = 0, []
+    for ocurrencia in _filas(columnas.iterator(chunk_size=batch_size), desde, hasta):
+        lote.append(ocurrencia)
+        if len(lote) >= batch_size:
+            Ocurrencia.objects.bulk_create(lote)
+            total += len(lote)
+            lote = []
+    Ocurrencia.objects.bulk_create(lote)
+    return total + len(lote)
+
+
+def materializar(series, batch_size=BATCH_SIZE):
+    """
+    Crea las filas de Ocurrencia de series nuevas dentro de la ventana
+    materializada (p.ej. las de un bulk_create, que no llama a save() ni
+    a refrescar_evento). Devuelve las filas creadas.
+    """
+    materializada = ventana()
+    if materializada is None:
+        return 0
+    # Las que ya tienen filas (guardadas con save() mientras tanto) se saltan
+    series = series.filter(recurrencia_hasta__isnull=False, ocurrencias__isnull=True)
+    return _crear(series, *materializada, batch_size)
+
+
+def refrescar_evento(evento):
+    """Rehace las filas de Ocurrencia de una serie (o las quita si ya no es serie)."""
+    materializada = ventana()
+    if materializada is None:
+        return
+    Ocurrencia.objects.filter(evento_id=evento.pk).delete()
+    if evento.recurrencia:
+        serie = [(evento.pk, evento.comunidad_id, evento.fecha, evento.hora, evento.recurrencia)]
+        Ocurrencia.objects.bulk_create(_filas(serie, *materializada))
+
+
+def en_ventana(comunidad_ids, desde, hasta, campos):
+    """
+    Ocurrencias de las series de las comunidades entre desde y hasta, como
+    dicts con 'campos' (columnas de Evento), en orden. De Ocurrencia si la
+    ventana está materializada; si no, generadas al vuelo.
+    """
+    if cubre(desde, hasta):
+        propios = {"id": "evento_id", "fecha": "fecha", "hora": "hora", "comunidad_id": "comunidad_id"}
+        columnas = {c: propios.get(c, f"evento__{c}") for c in campos}
+        filas = (
+            Ocurrencia.objects.filter(comunidad_id__in=comunidad_ids, fecha__gte=desde, fecha__lte=hasta)
+            .order_by(F("fecha").asc(), F("hora").asc(nulls_first=True), F("evento_id").asc())
+            .values(*columnas.values())
+        )
+        return [{c: fila[columna] for c, columna in columnas.items()} for fila in filas]
+    series = _series_en(desde, hasta).filter(comunidad_id__in=comunidad_ids).values(*campos, "recurrencia")
+    resultado = []
+    for serie in series:
+        for ocurrencia in ocurrencias(serie, desde, hasta):
+            del ocurrencia["recurrencia"]
+            resultado.append(ocurrencia)
+    return sorted(resultado, key=clave_orden)
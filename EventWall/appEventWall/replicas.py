@@ -0,0 +1,139 @@
+"""
+Lecturas en réplicas de MySQL y escrituras en la primaria.
+
+settings.EVENTWALL_DB_REPLICAS es la lista de alias de DATABASES que son
+réplicas (ver settings/base.py, se rellena con EVENTWALL_DB_HOSTS_REPLICAS).
+Si está vacía el router no hace nada y todo va a la primaria.
+
+- RouterReplicas reparte cada lectura al azar entre las réplicas y manda
+  las escrituras a la primaria. Las lecturas van también a la primaria
+  dentro de una transacción, y dentro de en_primaria().
+- ReplicasMiddleware se encarga de que cada usuario lea lo que acaba de
+  escribir, aunque la réplica vaya con retraso:
+  - Una petición POST, PUT, PATCH o DELETE lee entera de la primaria.
+  - Una petición que escribe deja la cookie COOKIE durante PEGAJOSO segundos.
+    Mientras exista, ese navegador lee de la primaria (p.ej. comunidad_detalle
+    justo después de que evento_crear redirija).
+- Las cachés compartidas (cache_muro, calendario, membresías) se rellenan
+  con en_primaria(). Si no, una réplica atrasada podría dejar en la caché,
+  con la versión nueva, la lista sin el evento recién creado.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARIA = getattr(settings, "EVENTWALL_DB_PRIMARIA", DEFAULT_DB_ALIAS)
+REPLICAS = list(getattr(settings, "EVENTWALL_DB_REPLICAS", []))
+
+# Segundos que un navegador sigue leyendo de la primaria después de escribir;
+# debe cubrir el retraso normal de las réplicas
+PEGAJOSO = getattr(settings, "EVENTWALL_DB_PEGAJOSO", 5)
+
+COOKIE = "ew_primaria"
+
+METODOS_SEGUROS = ("GET", "HEAD", "OPTIONS")
+
+
+class _Estado:
+    """Lo que sabe el router de la petición en curso (lo crea el middleware)."""
+
+    def __init__(self, primaria):
+        self.primaria = primaria
+        self.escribio = False
+
+
+# Un objeto mutable y no un bool: las vistas async usan el ORM en otro hilo,
+# con una copia del contexto, y lo que marquen ahí tiene que verlo el middleware
+_peticion = ContextVar("eventwall_replicas_peticion", default=None)
+_forzar_primaria = ContextVar("eventwall_replicas_forzar", default=False)
+
+
+@contextmanager
+def en_primaria():
+    """Las lecturas dentro del bloque van a la primaria."""
+    token = _forzar_primaria.set(True)
+    try:
+        yield
+    finally:
+        _forzar_primaria.reset(token)
+
+
+class RouterReplicas:
+    def db_for_read(self, model, **hints):
+        if not REPLICAS:
+            return None
+        estado = _peticion.get()
+        if _forzar_primaria.get() or (estado is not None and estado.primaria):
+            return PRIMARIA
+        if connections[PRIMARIA].in_atomic_block:
+            # Leer en la réplica lo que la transacción acaba de escribir no lo encontraría
+            return PRIMARIA
+        return random.choice(REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        if not REPLICAS:
+            return None
+        estado = _peticion.get()
+        if estado is not None:
+            estado.primaria = estado.escribio = True
+        return PRIMARIA
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bases = {PRIMARIA, *REPLICAS}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación
+        return False if db in REPLICAS else None
+
+
+class ReplicasMiddleware:
+    """Lecturas de la primaria en peticiones que escriben y durante PEGAJOSO segundos después."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        estado, token = self.empezar(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _peticion.reset(token)
+        return self.terminar(estado, response)
+
+    async def __acall__(self, request):
+        estado, token = self.empezar(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _peticion.reset(token)
+        return self.terminar(estado, response)
+
+    def empezar(self, request):
+        estado = _Estado(primaria=request.method not in METODOS_SEGUROS or COOKIE in request.COOKIES)
+        return estado, _peticion.set(estado)
+
+    def terminar(self, estado, response):
+        if estado.escribio:
+            response.set_cookie(
+                COOKIE, "1", max_age=PEGAJOSO, httponly=True, samesite="Lax",
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
@@ -1,13 +1,260 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import Profile
+from django.utils import timezone
+from .models import Profile, Evento, Comunidad
+from . import busqueda, cache_muro, contadores, en_vivo, feed, membresias, miniaturas, recurrencia, tareas
 
 @receiver(post_save, sender=User)
 def create_or_update_profile(sender, instance, created, **kwargs):
-    
+    # Solo al crear el usuario. Los demás saves (p.ej. last_login en cada
+    # login) no tocan Profile; a los usuarios antiguos sin perfil se les crea
+    # al acceder a user.profile (o con manage.py crear_perfiles).
     if created:
         Profile.objects.create(user=instance)
+
+
+# ---------------- Miniaturas de la foto de perfil ----------------
+
+@receiver(pre_save, sender=Profile)
+def recordar_foto_anterior(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    instance._foto_anterior = Profile.objects.filter(pk=instance.pk).values_list("foto", flat=True).first() or ""
+
+
+@receiver(post_save, sender=Profile)
+def programar_miniaturas(sender, instance, **kwargs):
+    anterior = instance.__dict__.pop("_foto_anterior", "")
+    nueva = instance.foto.name or ""
+    if anterior == nueva:
+        return
+
+    def programar():
+        # En el pool de miniaturas.py: la subida no espera a Pillow
+        if nueva:
+            miniaturas.programar(miniaturas.generar_todas, nueva)
+        if anterior:
+            miniaturas.programar(miniaturas.borrar_todas, anterior)
+
+    transaction.on_commit(programar)
+
+
+# ---------------- Índice de búsqueda ----------------
+
+@receiver(post_save, sender=Comunidad)
+@receiver(post_save, sender=Evento)
+def indexar_busqueda(sender, instance, **kwargs):
+    busqueda.obtener_backend().indexar(instance)
+
+
+@receiver(post_delete, sender=Comunidad)
+@receiver(post_delete, sender=Evento)
+def desindexar_busqueda(sender, instance, **kwargs):
+    busqueda.obtener_backend().desindexar(instance)
+
+
+# ---------------- Caché de membresías ----------------
+
+@receiver(m2m_changed, sender=Comunidad.miembros.through)
+def invalidar_membresias_miembros(sender, instance, action, reverse, pk_set, **kwargs):
+    # reverse=True: user.miembro_de.add(...) -> solo cambia ese usuario
+    if reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            membresias.invalidar(instance.pk)
+        return
+
+    if action == "pre_clear":
+        # Después del clear ya no sabemos quiénes eran miembros
+        instance._miembros_antes_de_clear = list(instance.miembros.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove"):
+        membresias.invalidar(*pk_set)
+    elif action == "post_clear":
+        membresias.invalidar(*getattr(instance, "_miembros_antes_de_clear", []))
+
+
+@receiver(pre_save, sender=Comunidad)
+def invalidar_membresias_propietario(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    anterior = Comunidad.objects.filter(pk=instance.pk).values_list("propietario_id", flat=True).first()
+    if anterior != instance.propietario_id:
+        membresias.invalidar(anterior, instance.propietario_id)
+        # Para feed_propietario (post_save)
+        instance._propietario_anterior = anterior
+
+
+@receiver(post_save, sender=Comunidad)
+def invalidar_membresias_nueva(sender, instance, created, **kwargs):
+    if created:
+        membresias.invalidar(instance.propietario_id)
+
+
+@receiver(post_delete, sender=Comunidad)
+def invalidar_membresias_borrada(sender, instance, **kwargs):
+    # Solo el propietario: a los miembros les queda un id que ya no existe,
+    # lo cual no da permisos sobre nada (las vistas hacen get_object_or_404).
+    membresias.invalidar(instance.propietario_id)
+
+
+
+# ---------------- Versiones de eventos / caché del muro ----------------
+
+def evento_modificado(instance, ids):
+    if ids:
+        Comunidad.objects.filter(pk__in=ids).update(eventos_modificados_en=timezone.now())
+    cache_muro.invalidar_evento(instance, ids)
+    instance._comunidad_id_original = instance.comunidad_id
+
+
+def publicar_en_vivo(instance, cambios):
+    # El mensaje se arma ya (la instancia puede cambiar) pero se publica tras
+    # el commit, para que nadie reciba un evento que luego se deshace.
+    # robust: si Redis falla, el guardado no se entera.
+    mensajes = [(cid, en_vivo.mensaje(accion, instance)) for cid, accion in cambios if cid is not None]
+    if mensajes:
+        transaction.on_commit(lambda: en_vivo.publicar(mensajes), robust=True)
+
+
+@receiver(post_save, sender=Evento)
+def evento_guardado(sender, instance, created, **kwargs):
+    anterior = getattr(instance, "_comunidad_id_original", instance.comunidad_id)
+    if created:
+        publicar_en_vivo(instance, [(instance.comunidad_id, "creado")])
+        contadores.sumar_eventos([instance.comunidad_id], 1)
+        tareas.encolar_al_confirmar(feed.repartir_evento, instance.pk)
+    elif anterior != instance.comunidad_id:
+        # Reasignado a otra comunidad (p.ej. desde evento_editar)
+        contadores.sumar_eventos([anterior], -1)
+        contadores.sumar_eventos([instance.comunidad_id], 1)
+        tareas.encolar_al_confirmar(feed.repartir_evento, instance.pk)
+        publicar_en_vivo(instance, [(anterior, "borrado"), (instance.comunidad_id, "creado")])
     else:
-       
-        Profile.objects.get_or_create(user=instance)
\ No newline at end of file
+        feed.actualizar(instance)
+        publicar_en_vivo(instance, [(instance.comunidad_id, "editado")])
+    evento_modificado(instance, instance.comunidades_afectadas())
+    # Filas de Ocurrencia de la serie, si hay ventana materializada
+    if instance.recurrencia or not created:
+        recurrencia.refrescar_evento(instance)
+
+
+@receiver(post_delete, sender=Evento)
+def evento_borrado(sender, instance, origin=None, **kwargs):
+    ids = instance.comunidades_afectadas()
+    comunidad_id = getattr(instance, "_comunidad_id_original", instance.comunidad_id)
+    # Si el borrado viene en cascada desde la propia comunidad, no hay nada que marcar
+    if isinstance(origin, Comunidad):
+        ids.discard(origin.pk)
+        if comunidad_id == origin.pk:
+            comunidad_id = None
+    contadores.sumar_eventos([comunidad_id], -1)
+    publicar_en_vivo(instance, [(comunidad_id, "borrado")])
+    evento_modificado(instance, ids)
+
+
+@receiver(post_save, sender=Comunidad)
+@receiver(post_delete, sender=Comunidad)
+def comunidad_modificada(sender, instance, **kwargs):
+    cache_muro.invalidar_comunidad(instance)
+
+
+# ---------------- Contadores desnormalizados ----------------
+
+@receiver(m2m_changed, sender=Comunidad.miembros.through)
+def contar_miembros(sender, instance, action, reverse, pk_set, **kwargs):
+    Miembro = sender
+    if action in ("pre_remove", "pre_clear"):
+        # remove() avisa con todos los ids pedidos aunque no fueran miembros,
+        # así que miramos antes cuáles existen de verdad.
+        if reverse:
+            quitados = Miembro.objects.filter(user_id=instance.pk)
+            if action == "pre_remove":
+                quitados = quitados.filter(comunidad_id__in=pk_set)
+            instance._contador_quitados = list(quitados.values_list("comunidad_id", flat=True))
+        else:
+            quitados = Miembro.objects.filter(comunidad_id=instance.pk)
+            if action == "pre_remove":
+                quitados = quitados.filter(user_id__in=pk_set)
+            instance._contador_quitados = quitados.count()
+    elif action == "post_add":
+        # En post_add pk_set ya trae solo los que se añadieron de verdad
+        if reverse:
+            contadores.sumar_miembros(pk_set, 1)
+        else:
+            contadores.sumar_miembros([instance.pk], len(pk_set))
+    elif action in ("post_remove", "post_clear"):
+        quitados = instance.__dict__.pop("_contador_quitados", None)
+        if reverse:
+            contadores.sumar_miembros(quitados or [], -1)
+        else:
+            contadores.sumar_miembros([instance.pk], -(quitados or 0))
+
+
+@receiver(pre_delete, sender=User)
+def descontar_miembro_borrado(sender, instance, **kwargs):
+    # El borrado en cascada de la tabla intermedia no envía m2m_changed
+    ids = Comunidad.miembros.through.objects.filter(user_id=instance.pk).values_list("comunidad_id", flat=True)
+    contadores.sumar_miembros(list(ids), -1)
+
+
+# ---------------- Directorio de miembros ----------------
+# add() crea las filas de Miembro con bulk_create (sin username): se copia
+# justo después con un UPDATE.
+
+@receiver(m2m_changed, sender=Comunidad.miembros.through)
+def copiar_username_miembro(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != "post_add" or not pk_set:
+        return
+    if reverse:
+        sender.objects.filter(user_id=instance.pk, comunidad_id__in=pk_set).update(username=instance.username)
+    else:
+        sender.objects.filter(comunidad_id=instance.pk, user_id__in=pk_set).update(
+            username=Subquery(User.objects.filter(pk=OuterRef("user_id")).values("username")[:1])
+        )
+
+
+@receiver(post_save, sender=User)
+def renombrar_miembro(sender, instance, created, update_fields, **kwargs):
+    # El login guarda solo last_login: no hace falta mirar
+    if created or (update_fields is not None and "username" not in update_fields):
+        return
+    Comunidad.miembros.through.objects.filter(user_id=instance.pk).exclude(
+        username=instance.username
+    ).update(username=instance.username)
+
+
+# ---------------- Feed personal (fan-out) ----------------
+# Repartir y rellenar pueden ser miles de filas: van por la cola (tareas.py).
+# Quitar es un DELETE y se hace ya, para que nadie vea lo que ya no le toca.
+
+@receiver(m2m_changed, sender=Comunidad.miembros.through)
+def feed_miembros(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "post_add":
+        if reverse:
+            for comunidad_id in pk_set:
+                tareas.encolar_al_confirmar(feed.rellenar, [instance.pk], comunidad_id)
+        else:
+            tareas.encolar_al_confirmar(feed.rellenar, sorted(pk_set), instance.pk)
+    elif action == "post_remove":
+        if reverse:
+            for comunidad_id in pk_set:
+                feed.quitar(comunidad_id, [instance.pk])
+        else:
+            feed.quitar(instance.pk, pk_set)
+    elif action == "post_clear":
+        if reverse:
+            feed.quitar_de_todas(instance.pk)
+        else:
+            feed.quitar(instance.pk)
+
+
+@receiver(post_save, sender=Comunidad)
+def feed_propietario(sender, instance, created, **kwargs):
+    if created:
+        return
+    anterior = instance.__dict__.pop("_propietario_anterior", None)
+    if anterior is not None:
+        feed.quitar(instance.pk, [anterior])
+        tareas.encolar_al_confirmar(feed.rellenar, [instance.propietario_id], instance.pk)
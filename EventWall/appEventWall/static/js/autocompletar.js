@@ -0,0 +1,49 @@
+// Autocompletado de comunidad en evento_form (ver forms.ComunidadAutocompletar).
+// Pide sugerencias a data-autocompletar mientras se escribe y guarda el id
+// elegido en el input oculto data-destino.
+(function () {
+  var ESPERA_MS = 200;
+
+  function iniciar(texto) {
+    var oculto = document.getElementById(texto.dataset.destino);
+    var opciones = document.getElementById(texto.getAttribute("list"));
+    var ids = {};  // texto mostrado -> id
+    var temporizador = null;
+    var ultima = null;
+
+    function pintar(resultados) {
+      var vistos = {};
+      ids = {};
+      opciones.innerHTML = "";
+      resultados.forEach(function (c) {
+        // Dos comunidades con el mismo nombre se distinguen por el id
+        var etiqueta = vistos[c.nombre] ? c.nombre + " (#" + c.id + ")" : c.nombre;
+        vistos[c.nombre] = true;
+        ids[etiqueta] = c.id;
+        var opcion = document.createElement("option");
+        opcion.value = etiqueta;
+        opciones.appendChild(opcion);
+      });
+    }
+
+    function pedir() {
+      var q = texto.value.trim();
+      if (q === ultima) return;
+      ultima = q;
+      fetch(texto.dataset.autocompletar + "?q=" + encodeURIComponent(q), {credentials: "same-origin"})
+        .then(function (r) { return r.ok ? r.json() : {resultados: []}; })
+        .then(function (datos) { if (q === ultima) pintar(datos.resultados); })
+        .catch(function () {});
+    }
+
+    texto.addEventListener("input", function () {
+      // Texto vacío: sin comunidad; texto que no es una sugerencia: nada elegido
+      oculto.value = ids.hasOwnProperty(texto.value) ? ids[texto.value] : "";
+      clearTimeout(temporizador);
+      temporizador = setTimeout(pedir, ESPERA_MS);
+    });
+    texto.addEventListener("focus", pedir);
+  }
+
+  document.querySelectorAll("input[data-autocompletar]").forEach(iniciar);
+})();
@@ -0,0 +1,195 @@
+"""
+Cola de tareas en la base de datos (modelo Tarea) para efectos secundarios
+lentos: se encolan desde la petición o una señal y los ejecuta
+manage.py run_worker en otro proceso.
+
+    @tarea
+    def repartir_evento(evento_id): ...
+
+    encolar_al_confirmar(repartir_evento, evento.pk)
+
+Los argumentos se guardan en JSON, así que deben ser ids y valores simples,
+no instancias. Solo se ejecutan funciones marcadas con @tarea.
+
+Con settings.EVENTWALL_TAREAS_EN_LINEA (por defecto, para desarrollo y tests)
+no se encola nada: la función se ejecuta en el momento, como antes de existir
+la cola. En producción se pone a False y se arranca run_worker.
+
+Reclamar una tarea es un UPDATE condicional (estado=pendiente): vale en
+MySQL y en SQLite sin SELECT ... FOR UPDATE SKIP LOCKED, y dos workers
+nunca ejecutan la misma. Si la función falla se reintenta con espera
+exponencial hasta max_intentos. Mientras una tarea está en curso su worker
+renueva latido_en (latir()); si el worker muere, deja de hacerlo y
+rescatar_colgadas() la devuelve a la cola pasado PLAZO_LATIDO. Una tarea
+larga con su worker vivo nunca se rescata, así que no se ejecuta dos veces.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Tarea
+
+logger = logging.getLogger(__name__)
+
+EN_LINEA = getattr(settings, "EVENTWALL_TAREAS_EN_LINEA", True)
+
+# Espera antes del reintento n: ESPERA_BASE * 2**(n-1) segundos, como mucho ESPERA_MAX
+ESPERA_BASE = getattr(settings, "EVENTWALL_TAREAS_ESPERA_BASE", 10)
+ESPERA_MAX = getattr(settings, "EVENTWALL_TAREAS_ESPERA_MAX", 3600)
+
+# Segundos sin latido a partir de los cuales se da por muerto al worker;
+# run_worker late varias veces dentro de este plazo
+PLAZO_LATIDO = getattr(settings, "EVENTWALL_TAREAS_PLAZO_LATIDO", 60)
+
+MAX_INTENTOS = 5
+
+
+class TareaDesconocida(Exception):
+    pass
+
+
+def tarea(funcion):
+    """Marca una función de módulo como ejecutable por el worker."""
+    funcion.es_tarea = True
+    return funcion
+
+
+def _nombre(funcion):
+    if not getattr(funcion, "es_tarea", False):
+        raise TareaDesconocida(f"{funcion!r} no está marcada con @tarea")
+    return f"{funcion.__module__}.{funcion.__qualname__}"
+
+
+def _resolver(nombre):
+    try:
+        funcion = import_string(nombre)
+    except ImportError:
+        funcion = None
+    if not getattr(funcion, "es_tarea", False):
+        raise TareaDesconocida(nombre)
+    return funcion
+
+
+# ---------------- Encolar ----------------
+
+
+def encolar(funcion, *args, max_intentos=MAX_INTENTOS, **kwargs):
+    """Guarda la tarea (o la ejecuta ya con EN_LINEA). Devuelve la Tarea o None."""
+    nombre = _nombre(funcion)
+    if EN_LINEA:
+        funcion(*args, **kwargs)
+        return None
+    return Tarea.objects.create(
+        nombre=nombre, argumentos={"args": list(args), "kwargs": kwargs}, max_intentos=max_intentos,
+    )
+
+
+def encolar_al_confirmar(funcion, *args, **kwargs):
+    """
+    encolar() cuando la transacción actual se confirme: si se deshace, la
+    tarea no existe, y el worker nunca ve datos aún sin confirmar.
+    """
+    if EN_LINEA:
+        encolar(funcion, *args, **kwargs)
+    else:
+        _nombre(funcion)  # falla ya, no en el on_commit
+        transaction.on_commit(lambda: encolar(funcion, *args, **kwargs))
+
+
+# ---------------- Worker ----------------
+
+
+def espera(intentos):
+    segundos = min(ESPERA_MAX, ESPERA_BASE * 2 ** max(intentos - 1, 0))
+    # Algo de azar para que los reintentos de una misma caída no lleguen juntos
+    return timedelta(seconds=segundos * random.uniform(0.8, 1.2))
+
+
+def reclamar(trabajador, limite):
+    """Pasa a en curso hasta 'limite' tareas disponibles; devuelve sus ids."""
+    ahora = timezone.now()
+    candidatas = list(
+        Tarea.objects.filter(estado=Tarea.PENDIENTE, disponible_en__lte=ahora)
+        .order_by("disponible_en", "id").values_list("pk", flat=True)[:limite]
+    )
+    reclamadas = []
+    for pk in candidatas:
+        # Si otro worker la cogió antes, el UPDATE no toca ninguna fila
+        if Tarea.objects.filter(pk=pk, estado=Tarea.PENDIENTE).update(
+            estado=Tarea.EN_CURSO, reclamada_en=ahora, latido_en=ahora, trabajador=trabajador,
+            intentos=F("intentos") + 1,
+        ):
+            reclamadas.append(pk)
+    return reclamadas
+
+
+def ejecutar(pk):
+    """Ejecuta una tarea ya reclamada. Devuelve True si terminó bien."""
+    tarea = Tarea.objects.get(pk=pk)
+    try:
+        funcion = _resolver(tarea.nombre)
+        with transaction.atomic():
+            funcion(*tarea.argumentos.get("args", []), **tarea.argumentos.get("kwargs", {}))
+    except Exception:
+        error = traceback.format_exc()
+        if tarea.intentos >= tarea.max_intentos:
+            logger.error("Tarea %s (%s) fallida tras %s intentos", pk, tarea.nombre, tarea.intentos)
+            cambios = {"estado": Tarea.FALLIDA}
+        else:
+            logger.warning("Tarea %s (%s) falló; se reintentará", pk, tarea.nombre)
+            cambios = {"estado": Tarea.PENDIENTE, "disponible_en": timezone.now() + espera(tarea.intentos)}
+        Tarea.objects.filter(pk=pk).update(ultimo_error=error, **cambios)
+        return False
+    Tarea.objects.filter(pk=pk).update(estado=Tarea.HECHA, ultimo_error="")
+    return True
+
+
+def ejecutar_en_worker(pk):
+    """ejecutar() para el pool de run_worker: como una petición, cierra conexiones caducadas o rotas."""
+    close_old_connections()
+    try:
+        return ejecutar(pk)
+    finally:
+        close_old_connections()
+
+
+def latir(trabajador, pks):
+    """Renueva el plazo de las tareas en curso 'pks' de este worker."""
+    if not pks:
+        return 0
+    return Tarea.objects.filter(pk__in=pks, estado=Tarea.EN_CURSO, trabajador=trabajador).update(
+        latido_en=timezone.now()
+    )
+
+
+def rescatar_colgadas():
+    """Tareas en curso sin latido desde hace más de PLAZO_LATIDO: su worker murió."""
+    limite = timezone.now() - timedelta(seconds=PLAZO_LATIDO)
+    colgadas = Tarea.objects.filter(
+        Q(latido_en__lt=limite) | Q(latido_en__isnull=True, reclamada_en__lt=limite),  # reclamadas antes del latido
+        estado=Tarea.EN_CURSO,
+    )
+    agotadas = colgadas.filter(intentos__gte=F("max_intentos")).update(estado=Tarea.FALLIDA)
+    return agotadas + colgadas.update(estado=Tarea.PENDIENTE, disponible_en=timezone.now())
+
+
+def limpiar(dias):
+    """Borra las tareas hechas hace más de 'dias' días."""
+    borradas, _ = Tarea.objects.filter(
+        estado=Tarea.HECHA, creada_en__lt=timezone.now() - timedelta(days=dias)
+    ).delete()
+    return borradas
+
+
+def iniciar_proceso():
+    """initializer del pool de procesos de run_worker (con spawn el hijo empieza sin Django)."""
+    import django
+
+    django.setup()
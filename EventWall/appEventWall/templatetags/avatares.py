@@ -0,0 +1,23 @@
+from django import template
+from django.urls import reverse
+
+from .. import miniaturas
+
+register = template.Library()
+
+
+@register.inclusion_tag("fragmentos/avatar.html")
+def avatar(usuario, foto, tamano="chica"):
+    """
+    {% avatar user foto "chica" %}: miniatura WebP/JPEG de la foto de perfil
+    (FieldFile o nombre) o la inicial del usuario si no tiene foto. Apunta
+    siempre a la vista que la genera si hace falta y redirige al archivo:
+    renderizar no consulta el storage (un stat por avatar y formato).
+    """
+    nombre = getattr(foto, "name", foto)
+    contexto = {"usuario": usuario, "lado": miniaturas.TAMANOS[tamano] // 2}
+    if nombre:
+        version = miniaturas.clave(nombre)
+        for formato in miniaturas.FORMATOS:
+            contexto[formato] = f"{reverse('miniatura_perfil', args=[usuario.pk, tamano, formato])}?v={version}"
+    return contexto
@@ -1,3 +1,2202 @@
-from django.test import TestCase
+import copy
+import gzip
+import json
+import os
+import random
+import runpy
+import shutil
+import sqlite3
+import tempfile
+import time as time_module
+import warnings
+from contextlib import closing
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+from datetime import date, time, timedelta
+from inspect import iscoroutinefunction
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, router, transaction
+from django.db.models.signals import post_save
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from .forms import EventForm
+from .models import EntradaFeed, Evento, Comunidad, Miembro, Notificacion, Profile, Tarea
+from .paginacion import apaginar_con_series, paginar_eventos, decodificar_cursor
+from .busqueda import LIMITE_RESULTADOS, buscar_comunidades, buscar_eventos, obtener_backend
+from . import (
+    cache_muro, calendario, conflictos, contadores, directorio, en_vivo, estaticos, feed, limites, membresias, miniaturas, notificaciones, paginacion,
+    recurrencia, replicas, tareas,
+)
+from EventWall import urls as urls_proyecto
+from EventWall.urls import con_vistas_async
+
+
+class EventWallTestCase(TestCase):
+    """TestCase que empieza cada test con la caché vacía."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class PaginacionEventosTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("ana", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Python SV", propietario=cls.user)
+        hoy = date.today()
+        horas = [None, time(8, 0), time(8, 0), time(17, 30)]
+        for d in range(3):
+            for h in horas:
+                Evento.objects.create(
+                    titulo=f"Evento {d}-{h}",
+                    fecha=hoy + timedelta(days=d),
+                    hora=h,
+                    comunidad=cls.comunidad if d % 2 == 0 else None,
+                )
+
+    def recorrer(self, queryset, page_size):
+        vistos, after = [], None
+        while True:
+            eventos, after = paginar_eventos(queryset, after=after, page_size=page_size)
+            vistos.extend(e.pk for e in eventos)
+            if after is None:
+                return vistos
+
+    def test_recorre_todas_las_paginas_en_orden(self):
+        esperado = [
+            e.pk for e in sorted(
+                Evento.objects.all(),
+                key=lambda e: (e.fecha, e.hora is not None, e.hora or time(0), e.pk),
+            )
+        ]
+        for page_size in (1, 2, 3, 5, 50):
+            self.assertEqual(self.recorrer(Evento.objects.all(), page_size), esperado)
+
+    def test_cursor_invalido_empieza_desde_el_principio(self):
+        eventos, _ = paginar_eventos(Evento.objects.all(), after="no-es-un-cursor", page_size=2)
+        primeros, _ = paginar_eventos(Evento.objects.all(), page_size=2)
+        self.assertEqual(eventos, primeros)
+        self.assertIsNone(decodificar_cursor("###"))
+
+    def test_vistas_paginan(self):
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("eventos_list"), {"page_size": 5})
+        self.assertEqual(len(resp.context["eventos"]), 5)
+        self.assertIsNotNone(resp.context["siguiente"])
+
+        url = reverse("comunidad_detalle", args=[self.comunidad.pk])
+        resp = self.client.get(url, {"page_size": 5})
+        self.assertEqual(len(resp.context["eventos"]), 5)
+        resp = self.client.get(url, {"page_size": 5, "after": resp.context["siguiente"]})
+        self.assertEqual(len(resp.context["eventos"]), 3)
+        self.assertIsNone(resp.context["siguiente"])
+
+
+class BusquedaTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("beto", password="clave-segura-123")
+
+    def test_backend_fts5_en_sqlite(self):
+        self.assertEqual(obtener_backend().nombre, "fts5")
+
+    def test_sincroniza_con_senales_y_rankea(self):
+        poca = Comunidad.objects.create(nombre="Ajedrez", descripcion="también algo de python", propietario=self.user)
+        mucha = Comunidad.objects.create(nombre="Python Python", descripcion="python", propietario=self.user)
+        self.assertEqual(list(buscar_comunidades("python")), [mucha, poca])
+        # Sin acentos y por prefijo
+        self.assertEqual(list(buscar_comunidades("tambien")), [poca])
+        self.assertEqual(list(buscar_comunidades("ajed")), [poca])
+
+        poca.descripcion = "solo ajedrez"
+        poca.save()
+        self.assertEqual(list(buscar_comunidades("python")), [mucha])
+
+        mucha.delete()
+        self.assertEqual(list(buscar_comunidades("python")), [])
+        self.assertEqual(list(buscar_comunidades("tambien")), [])
+
+    def test_busca_eventos_en_titulo_descripcion_y_lugar(self):
+        en_lugar = Evento.objects.create(titulo="Charla", lugar="Auditorio Central", fecha=date.today())
+        Evento.objects.create(titulo="Taller", descripcion="en el lab", fecha=date.today())
+        self.assertEqual(list(buscar_eventos("auditorio")), [en_lugar])
+        self.assertEqual(list(buscar_eventos("")), [])
+
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("eventos_list"), {"q": "auditorio"})
+        self.assertEqual([e["id"] for e in resp.context["eventos"]], [en_lugar.pk])
+
+
+class MembresiasTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dueno = User.objects.create_user("dueno", password="clave-segura-123")
+        cls.socio = User.objects.create_user("socio", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Club", propietario=cls.dueno)
+
+    def refrescar(self, user):
+        return User.objects.get(pk=user.pk)
+
+    def test_set_cacheado_sin_consultas(self):
+        socio, dueno = self.refrescar(self.socio), self.refrescar(self.dueno)
+        self.assertFalse(self.comunidad.es_miembro(socio))
+        with self.assertNumQueries(0):
+            self.assertFalse(self.comunidad.es_miembro(socio))
+            self.assertTrue(self.comunidad.es_miembro(dueno))
+        # Otro objeto user (otra petición) reutiliza la caché de Django
+        socio = self.refrescar(self.socio)
+        with self.assertNumQueries(0):
+            self.assertFalse(self.comunidad.es_miembro(socio))
+
+    def test_invalida_con_m2m_changed(self):
+        membresias.comunidades_de(self.refrescar(self.socio))
+        self.comunidad.miembros.add(self.socio)
+        self.assertTrue(self.comunidad.es_miembro(self.refrescar(self.socio)))
+
+        self.comunidad.miembros.clear()
+        self.assertFalse(self.comunidad.es_miembro(self.refrescar(self.socio)))
+
+        self.socio.miembro_de.add(self.comunidad)
+        self.assertTrue(self.comunidad.es_miembro(self.refrescar(self.socio)))
+        self.socio.miembro_de.remove(self.comunidad)
+        self.assertFalse(self.comunidad.es_miembro(self.refrescar(self.socio)))
+
+    def test_invalida_al_cambiar_propietario(self):
+        self.assertEqual(membresias.comunidades_de(self.refrescar(self.dueno)), {self.comunidad.pk})
+        self.assertEqual(membresias.comunidades_de(self.refrescar(self.socio)), set())
+        self.comunidad.propietario = self.socio
+        self.comunidad.save()
+        self.assertEqual(membresias.comunidades_de(self.refrescar(self.dueno)), set())
+        self.assertEqual(membresias.comunidades_de(self.refrescar(self.socio)), {self.comunidad.pk})
+
+    def test_unirse_y_crear_evento(self):
+        self.client.force_login(self.socio)
+        url = reverse("evento_crear_en_comunidad", args=[self.comunidad.pk])
+        datos = {
+            "titulo": "Meetup", "fecha": date.today().isoformat(),
+            "hora_inicio": "10:00", "hora_fin": "11:00", "tipo": "reunion",
+        }
+        self.client.post(url, datos)
+        self.assertFalse(Evento.objects.exists())
+
+        self.client.post(reverse("unirse_comunidad", args=[self.comunidad.pk]))
+        self.client.post(url, datos)
+        self.assertEqual(Evento.objects.get().comunidad, self.comunidad)
+
+
+class PerfilPerezosoTests(EventWallTestCase):
+    def test_perfil_al_registrarse_y_perezoso_para_antiguos(self):
+        user = User.objects.create_user("nuevo", password="clave-segura-123")
+        self.assertTrue(Profile.objects.filter(user=user).exists())
+
+        Profile.objects.filter(user=user).delete()
+        user = User.objects.get(pk=user.pk)
+        self.assertEqual(user.profile.user_id, user.pk)
+        self.assertTrue(Profile.objects.filter(user=user).exists())
+
+    def test_login_no_consulta_profile(self):
+        User.objects.create_user("ana", password="clave-segura-123")
+        datos = {"username": "ana", "password": "clave-segura-123"}
+
+        def antiguo(sender, instance, created, **kwargs):
+            if not created:
+                Profile.objects.get_or_create(user=instance)
+
+        def consultas_login():
+            self.client.logout()
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(reverse("login"), datos)
+            return ctx.captured_queries
+
+        actuales = consultas_login()
+        self.assertFalse(any("appEventWall_profile" in q["sql"] for q in actuales))
+
+        post_save.connect(antiguo, sender=User)
+        try:
+            con_get_or_create = consultas_login()
+        finally:
+            post_save.disconnect(antiguo, sender=User)
+        self.assertEqual(len(con_get_or_create) - len(actuales), 1)
+
+    def test_crear_perfiles_backfill(self):
+        for i in range(5):
+            User.objects.create_user(f"u{i}")
+        Profile.objects.all().delete()
+        call_command("crear_perfiles", batch_size=2, stdout=StringIO())
+        self.assertEqual(Profile.objects.count(), 5)
+
+
+class ImportExportEventosTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("carla", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Cine", propietario=cls.user)
+
+    def archivo(self, nombre, contenido=""):
+        directorio = tempfile.mkdtemp()
+        ruta = os.path.join(directorio, nombre)
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.write(contenido)
+        return ruta
+
+    def importar(self, ruta, **opciones):
+        salida, errores = StringIO(), StringIO()
+        call_command("import_eventos", ruta, stdout=salida, stderr=errores, **opciones)
+        return salida.getvalue(), errores.getvalue()
+
+    def test_importa_csv_validando_como_eventform(self):
+        manana = (date.today() + timedelta(days=1)).strftime("%d/%m/%Y")
+        ayer = (date.today() - timedelta(days=1)).isoformat()
+        ruta = self.archivo("eventos.csv", (
+            "titulo,descripcion,fecha,hora_inicio,hora_fin,lugar,tipo,comunidad_id,creado_por_id\n"
+            f"Ok,,{manana},08:30 AM,10:00,Sala 1,taller,{self.comunidad.pk},\n"
+            f"Pasado,,{ayer},,,,otro,,\n"
+            f"Horas,,{manana},11:00,10:00,,otro,,\n"
+            f"Sin comunidad,,{manana},,,,otro,999,\n"
+            f"Tipo,,{manana},,,,fiesta,,\n"
+        ))
+        salida, errores = self.importar(ruta, batch_size=2, usuario="carla")
+        evento = Evento.objects.get()
+        self.assertEqual((evento.titulo, evento.hora, evento.comunidad), ("Ok", time(8, 30), self.comunidad))
+        self.assertEqual(evento.creado_por, self.user)
+        self.assertEqual((evento.hora_fin, evento.lugar_clave), (time(10), "sala 1"))
+        self.assertIn("Importados 1 eventos (4 filas con errores)", salida)
+        self.assertIn("filas/s", salida)
+        self.assertIn("Línea 3: La fecha no puede ser anterior a hoy.", errores)
+        self.assertIn("Línea 4: La hora de fin debe ser posterior", errores)
+        # Al terminar se indexan para la búsqueda
+        self.assertEqual(list(buscar_eventos("sala")), [evento])
+
+    def test_importar_invalida_listas_y_solo_indexa_lo_nuevo(self):
+        manana = (date.today() + timedelta(days=1)).strftime("%d/%m/%Y")
+        previo = Evento.objects.create(titulo="Previo", fecha=date.today(), lugar="Sala 2", comunidad=self.comunidad)
+        self.client.force_login(self.user)
+        etag = self.client.get(reverse("api_eventos"))["ETag"]
+        self.assertNotContains(self.client.get(reverse("eventos_list")), "Importado")
+        self.assertNotContains(self.client.get(reverse("comunidad_detalle", args=[self.comunidad.pk])), "Importado")
+
+        ruta = self.archivo("eventos.csv", (
+            "titulo,descripcion,fecha,hora_inicio,hora_fin,lugar,tipo,comunidad_id,creado_por_id\n"
+            f"Importado,,{manana},,,Sala 2,otro,{self.comunidad.pk},\n"
+        ))
+        backend = obtener_backend()
+        with mock.patch.object(type(backend), "reconstruir") as reconstruir:
+            self.importar(ruta)
+        reconstruir.assert_not_called()
+        self.assertNotEqual(self.client.get(reverse("api_eventos"))["ETag"], etag)
+        self.assertContains(self.client.get(reverse("eventos_list")), "Importado")
+        self.assertContains(self.client.get(reverse("comunidad_detalle", args=[self.comunidad.pk])), "Importado")
+        self.assertEqual({e.titulo for e in buscar_eventos("sala")}, {previo.titulo, "Importado"})
+
+    def test_ida_y_vuelta_jsonl(self):
+        for i in range(7):
+            Evento.objects.create(
+                titulo=f"Función {i}", fecha=date.today() - timedelta(days=i),
+                hora=time(20, 0) if i % 2 else None, hora_fin=time(22, 0) if i % 2 else None,
+                comunidad=self.comunidad, creado_por=self.user,
+            )
+        Evento.objects.create(
+            titulo="Cinefórum", fecha=date.today(), hora=time(18), recurrencia="FREQ=WEEKLY;COUNT=3",
+            comunidad=self.comunidad, creado_por=self.user,
+        )
+        Evento.objects.create(titulo="Otra comunidad", fecha=date.today())
+        campos = ("titulo", "fecha", "hora", "hora_fin", "comunidad_id", "creado_por_id", "recurrencia", "recurrencia_hasta")
+        antes = list(Evento.objects.filter(comunidad=self.comunidad).order_by("pk").values_list(*campos))
+        for formato in ("jsonl", "csv"):
+            ruta = self.archivo(f"eventos.{formato}")
+            call_command("export_eventos", ruta, comunidad=self.comunidad.pk, chunk_size=3, stderr=StringIO())
+            Evento.objects.all().delete()
+            with self.captureOnCommitCallbacks(execute=True):
+                recurrencia.refrescar()
+            salida, _ = self.importar(ruta, permitir_pasado=True)
+            self.assertEqual(list(Evento.objects.order_by("pk").values_list(*campos)), antes)
+            self.assertIn("Importados 8 eventos (0 filas con errores)", salida)
+            # bulk_create no llama a save(): las ocurrencias se materializan al importar
+            serie = Evento.objects.get(titulo="Cinefórum")
+            self.assertEqual(serie.ocurrencias.count(), 3)
+
+    def test_jsonl_con_lineas_raras_no_para_la_importacion(self):
+        manana = date.today() + timedelta(days=1)
+        lineas = [
+            "[]", '"x"', "3",
+            json.dumps({"titulo": "Numérica", "fecha": int(f"{manana:%Y%m%d}"), "hora_inicio": 930}),
+            json.dumps({"titulo": "Bien", "fecha": manana.isoformat(), "hora_inicio": "09:30"}),
+        ]
+        salida, errores = self.importar(self.archivo("eventos.jsonl", "\n".join(lineas) + "\n"))
+        self.assertIn("Importados 1 eventos (4 filas con errores)", salida)
+        for numero in (1, 2, 3):
+            self.assertIn(f"Línea {numero}: se esperaba un objeto JSON", errores)
+        # Los números se leen como texto: 20240101 no es un formato de fecha válido
+        self.assertIn("Línea 4: formato no válido: '", errores)
+        self.assertEqual(Evento.objects.get().titulo, "Bien")
+
+    def test_importa_recurrencia_validando_como_eventform(self):
+        manana = date.today() + timedelta(days=1)
+        ruta = self.archivo("eventos.csv", (
+            "titulo,descripcion,fecha,recurrencia\n"
+            f"Ok,,{manana:%d/%m/%Y},freq=daily;count=2\n"
+            f"Mala,,{manana:%d/%m/%Y},FREQ=HOURLY\n"
+            f"Hasta antes,,{manana:%d/%m/%Y},FREQ=DAILY;UNTIL={date.today():%Y%m%d}\n"
+        ))
+        salida, errores = self.importar(ruta)
+        self.assertIn("Importados 1 eventos (2 filas con errores)", salida)
+        self.assertIn("Línea 3: FREQ debe ser uno de", errores)
+        self.assertIn("Línea 4: UNTIL no puede ser anterior", errores)
+        evento = Evento.objects.get()
+        self.assertEqual((evento.recurrencia, evento.recurrencia_hasta), ("FREQ=DAILY;COUNT=2", manana + timedelta(days=1)))
+
+
+class ExportacionComunidadTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("dani", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Teatro, danza; y más", propietario=cls.user)
+        cls.otra = Comunidad.objects.create(nombre="Otra", propietario=cls.user)
+        cls.evento = Evento.objects.create(
+            titulo="Obra", descripcion="Línea 1\nLínea 2, con coma " + "x" * 80,
+            fecha=date(2030, 5, 17), hora=time(19, 30), lugar="Sala; Norte", comunidad=cls.comunidad,
+        )
+        Evento.objects.create(titulo="Todo el día", fecha=date(2030, 5, 18), comunidad=cls.comunidad)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def url(self, formato):
+        return reverse(f"comunidad_eventos_{formato}", args=[self.comunidad.pk])
+
+    def test_csv(self):
+        resp = self.client.get(self.url("csv"))
+        self.assertTrue(resp.streaming)
+        lineas = b"".join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(lineas[0], "id,titulo,descripcion,fecha,hora,lugar,tipo")
+        self.assertTrue(lineas[1].startswith(f"{self.evento.pk},Obra,"))
+        self.assertIn("Todo el día,,2030-05-18,,,otro", lineas[-1])
+
+    def test_ics(self):
+        resp = self.client.get(self.url("ics"))
+        cuerpo = b"".join(resp.streaming_content).decode()
+        self.assertTrue(cuerpo.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertIn("X-WR-CALNAME:Teatro\\, danza\\; y más\r\n", cuerpo)
+        self.assertIn("DTSTART:20300517T193000\r\n", cuerpo)
+        self.assertIn("DTSTART;VALUE=DATE:20300518\r\n", cuerpo)
+        self.assertIn("LOCATION:Sala\\; Norte\r\n", cuerpo)
+        # Líneas largas plegadas a 75 octetos
+        self.assertTrue(all(len(l.encode()) <= 75 for l in cuerpo.split("\r\n")))
+        self.assertIn("DESCRIPTION:Línea 1\\nLínea 2\\, con coma", cuerpo.replace("\r\n ", ""))
+
+    def test_get_condicional_y_etag(self):
+        resp = self.client.get(self.url("ics"))
+        etag = resp["ETag"]
+        with self.assertNumQueries(3):  # sesión, usuario y comunidad
+            resp = self.client.get(self.url("ics"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertNotEqual(self.client.get(self.url("csv"))["ETag"], etag)
+
+        # Reasignar un evento cambia la versión de ambas comunidades
+        etag_otra = self.client.get(reverse("comunidad_eventos_ics", args=[self.otra.pk]))["ETag"]
+        evento = Evento.objects.get(pk=self.evento.pk)
+        evento.comunidad = self.otra
+        evento.save()
+        self.assertEqual(self.client.get(self.url("ics"), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        resp = self.client.get(reverse("comunidad_eventos_ics", args=[self.otra.pk]), HTTP_IF_NONE_MATCH=etag_otra)
+        self.assertEqual(resp.status_code, 200)
+
+        etag = self.client.get(self.url("ics"))["ETag"]
+        Evento.objects.filter(comunidad=self.comunidad).get().delete()
+        self.assertEqual(self.client.get(self.url("ics"), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # Renombrar la comunidad cambia X-WR-CALNAME sin tocar los eventos
+        etag = self.client.get(self.url("ics"))["ETag"]
+        Comunidad.objects.filter(pk=self.comunidad.pk).update(nombre="Otro nombre")
+        resp = self.client.get(self.url("ics"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("X-WR-CALNAME:Otro nombre", b"".join(resp.streaming_content).decode())
+
+
+class CacheMuroTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("eva", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Astronomía", propietario=cls.user)
+        cls.evento = Evento.objects.create(
+            titulo="Observación", fecha=date.today(), tipo="taller", comunidad=cls.comunidad, creado_por=cls.user,
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_segunda_visita_sale_de_la_cache(self):
+        url_comunidad = reverse("comunidad_detalle", args=[self.comunidad.pk])
+        for url in (reverse("eventos_list"), url_comunidad):
+            self.client.get(url)
+        with self.assertNumQueries(2):  # sesión y usuario
+            resp = self.client.get(reverse("eventos_list"))
+        self.assertContains(resp, "Observación")
+        with self.assertNumQueries(3):  # + la comunidad (contadores incluidos)
+            self.assertContains(self.client.get(url_comunidad), "Observación")
+
+        stats = cache_muro.estadisticas()
+        self.assertEqual(stats["listas"], {"aciertos": 2, "fallos": 2})
+        self.assertEqual(stats["fragmentos"], {"aciertos": 2, "fallos": 2})
+        salida = StringIO()
+        call_command("estadisticas_cache", stdout=salida)
+        self.assertIn("fragmentos: 2 aciertos · 2 fallos · 50.0% acierto", salida.getvalue())
+
+    def test_senales_invalidan(self):
+        url_comunidad = reverse("comunidad_detalle", args=[self.comunidad.pk])
+        self.client.get(reverse("eventos_list"))
+        self.client.get(url_comunidad)
+
+        self.evento.titulo = "Observación lunar"
+        self.evento.save()
+        self.assertContains(self.client.get(url_comunidad), "Observación lunar")
+
+        self.comunidad.nombre = "Astronomía SV"
+        self.comunidad.save()
+        self.assertContains(self.client.get(reverse("eventos_list")), "Comunidad: Astronomía SV")
+
+        Evento.objects.create(titulo="Nuevo", fecha=date.today(), comunidad=self.comunidad)
+        self.assertContains(self.client.get(url_comunidad), "Nuevo")
+
+    def test_detalle_cacheado(self):
+        url = reverse("evento_detalle", args=[self.evento.pk])
+        self.assertContains(self.client.get(url), "Observación")
+        with self.assertNumQueries(2):
+            self.assertContains(self.client.get(url), "Observación")
+        self.evento.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ContadoresComunidadTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dueno = User.objects.create_user("dueno", password="clave-segura-123")
+        cls.socios = [User.objects.create_user(f"socio{i}", password="clave-segura-123") for i in range(3)]
+        cls.comunidad = Comunidad.objects.create(nombre="Ajedrez", propietario=cls.dueno)
+        cls.otra = Comunidad.objects.create(nombre="Go", propietario=cls.dueno)
+
+    def contadores(self, comunidad=None):
+        c = Comunidad.objects.get(pk=(comunidad or self.comunidad).pk)
+        return c.num_miembros, c.num_eventos
+
+    def test_miembros_desde_las_vistas(self):
+        socio = self.socios[0]
+        self.client.force_login(socio)
+        self.client.post(reverse("unirse_comunidad", args=[self.comunidad.pk]))
+        self.client.post(reverse("unirse_comunidad", args=[self.comunidad.pk]))
+        self.assertEqual(self.contadores(), (1, 0))
+        self.client.post(reverse("salir_comunidad", args=[self.comunidad.pk]))
+        self.client.post(reverse("salir_comunidad", args=[self.comunidad.pk]))
+        self.assertEqual(self.contadores(), (0, 0))
+
+    def test_miembros_add_remove_clear_en_ambos_sentidos(self):
+        self.comunidad.miembros.add(*self.socios)
+        self.socios[0].miembro_de.add(self.otra)
+        self.assertEqual(self.contadores()[0], 3)
+        self.assertEqual(self.contadores(self.otra)[0], 1)
+
+        self.socios[0].miembro_de.clear()
+        self.assertEqual((self.contadores()[0], self.contadores(self.otra)[0]), (2, 0))
+        self.comunidad.miembros.remove(self.socios[1], self.socios[0])
+        self.assertEqual(self.contadores()[0], 1)
+        self.comunidad.miembros.clear()
+        self.assertEqual(self.contadores()[0], 0)
+
+        self.comunidad.miembros.add(*self.socios)
+        self.socios[2].delete()
+        self.assertEqual(self.contadores()[0], 2)
+
+    def test_eventos_crear_reasignar_y_borrar(self):
+        self.client.force_login(self.dueno)
+        datos = {
+            "titulo": "Torneo", "fecha": date.today().isoformat(),
+            "hora_inicio": "10:00", "hora_fin": "11:00", "tipo": "reunion",
+        }
+        self.client.post(reverse("evento_crear_en_comunidad", args=[self.comunidad.pk]), datos)
+        evento = Evento.objects.get()
+        self.assertEqual(self.contadores(), (0, 1))
+
+        self.client.post(reverse("evento_editar", args=[evento.pk]), {**datos, "comunidad": self.otra.pk})
+        self.assertEqual(Evento.objects.get().comunidad, self.otra)
+        self.assertEqual((self.contadores(), self.contadores(self.otra)), ((0, 0), (0, 1)))
+
+        self.client.post(reverse("evento_eliminar", args=[evento.pk]))
+        self.assertEqual(self.contadores(self.otra), (0, 0))
+
+    def test_borrar_comunidad_en_cascada(self):
+        Evento.objects.create(titulo="A", fecha=date.today(), comunidad=self.comunidad)
+        self.comunidad.miembros.add(self.socios[0])
+        self.comunidad.delete()
+        self.assertFalse(Evento.objects.exists())
+        self.assertEqual(self.contadores(self.otra), (0, 0))
+
+    def test_save_no_pisa_contadores(self):
+        vieja = Comunidad.objects.get(pk=self.comunidad.pk)
+        self.comunidad.miembros.add(self.socios[0])
+        vieja.nombre = "Ajedrez SV"
+        vieja.save()
+        self.assertEqual(self.contadores(), (1, 0))
+
+    def test_restar_con_desvio_se_queda_en_cero(self):
+        Comunidad.objects.filter(pk=self.comunidad.pk).update(num_miembros=3)
+        with CaptureQueriesContext(connection) as ctx:
+            contadores.sumar_miembros([self.comunidad.pk, self.otra.pk], -2)
+        self.assertEqual((self.contadores()[0], self.contadores(self.otra)[0]), (1, 0))
+        # Sin calcular 0 - 2 en la columna sin signo (error 1690 en MySQL)
+        self.assertIn("CASE WHEN", ctx.captured_queries[0]["sql"])
+        contadores.sumar_miembros([self.comunidad.pk], 2)
+        self.assertEqual(self.contadores()[0], 3)
+
+    def test_recount_repara_desvios(self):
+        self.comunidad.miembros.add(*self.socios)
+        Evento.objects.bulk_create(
+            [Evento(titulo=f"E{i}", fecha=date.today(), comunidad=self.otra) for i in range(4)]
+        )
+        Comunidad.objects.filter(pk=self.comunidad.pk).update(num_miembros=99)
+        salida = StringIO()
+        call_command("recount_comunidades", batch_size=1, stdout=salida)
+        self.assertIn("revisadas: 2 · corregidas: 2", salida.getvalue())
+        self.assertEqual((self.contadores(), self.contadores(self.otra)), ((3, 0), (0, 4)))
+
+
+class ApiTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lu", password="clave-segura-123")
+        cls.otro = User.objects.create_user("max", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Ciclismo", propietario=cls.user)
+        cls.ajena = Comunidad.objects.create(nombre="Running", propietario=cls.otro)
+        hoy = date.today()
+        Evento.objects.bulk_create([
+            Evento(
+                titulo=f"Ruta {i}", fecha=hoy + timedelta(days=i), hora=time(8) if i % 2 else None,
+                tipo="taller" if i % 3 == 0 else "otro", comunidad=cls.comunidad if i < 5 else cls.ajena,
+            )
+            for i in range(8)
+        ])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def get(self, nombre, *args, **params):
+        return self.client.get(reverse(nombre, args=args), params)
+
+    def test_requiere_sesion(self):
+        self.client.logout()
+        resp = self.get("api_eventos")
+        self.assertEqual(resp.status_code, 401)
+        self.assertIn("error", resp.json())
+
+    def test_eventos_paginados_y_sparse_fields(self):
+        vistos, after = [], None
+        while True:
+            params = {"fields": "titulo", "page_size": 3}
+            if after:
+                params["after"] = after
+            datos = self.get("api_eventos", **params).json()
+            self.assertTrue(all(list(e) == ["titulo"] for e in datos["resultados"]))
+            vistos += [e["titulo"] for e in datos["resultados"]]
+            after = datos["siguiente"]
+            if not after:
+                break
+        self.assertEqual(vistos, [f"Ruta {i}" for i in range(8)])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.get("api_eventos", fields="id,fecha")
+        sql = ctx.captured_queries[-1]["sql"]
+        self.assertNotIn('"titulo"', sql)
+        self.assertNotIn('"descripcion"', sql)
+
+        resp = self.get("api_eventos", fields="titulo,clave")
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("clave", resp.json()["error"])
+
+    def test_filtros(self):
+        hoy = date.today()
+        datos = self.get(
+            "api_eventos", desde=(hoy + timedelta(days=1)).isoformat(), hasta=(hoy + timedelta(days=6)).isoformat(),
+            tipo="taller", comunidad=self.comunidad.pk, fields="titulo,tipo,comunidad",
+        ).json()
+        self.assertEqual(datos["resultados"], [{"titulo": "Ruta 3", "tipo": "taller", "comunidad": self.comunidad.pk}])
+        self.assertEqual(self.get("api_eventos", desde="ayer").status_code, 400)
+        self.assertEqual(self.get("api_eventos", tipo="fiesta").status_code, 400)
+
+    def test_etag_y_cache_control_en_eventos(self):
+        resp = self.get("api_eventos", fields="titulo")
+        etag = resp["ETag"]
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn("private", resp["Cache-Control"])
+        self.assertIn("max-age=", resp["Cache-Control"])
+
+        url = reverse("api_eventos") + "?fields=titulo"
+        with self.assertNumQueries(2):  # sesión y usuario; los eventos ni se consultan
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        Evento.objects.create(titulo="Nueva ruta", fecha=date.today())
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+
+        evento = Evento.objects.get(titulo="Nueva ruta")
+        self.assertEqual(self.get("api_evento", evento.pk, fields="titulo").json(), {"titulo": "Nueva ruta"})
+        self.assertEqual(self.get("api_evento", 0).status_code, 404)
+
+    def test_comunidades_con_es_miembro(self):
+        datos = self.get("api_comunidades", fields="nombre,num_miembros,es_miembro").json()
+        self.assertEqual(datos["resultados"], [
+            {"nombre": "Ciclismo", "num_miembros": 0, "es_miembro": True},
+            {"nombre": "Running", "num_miembros": 0, "es_miembro": False},
+        ])
+        datos = self.get("api_comunidades", miembro=1, fields="id").json()
+        self.assertEqual(datos["resultados"], [{"id": self.comunidad.pk}])
+
+        resp = self.get("api_comunidad", self.ajena.pk)
+        self.assertEqual(resp.json()["num_miembros"], 0)
+        resp = self.client.get(reverse("api_comunidad", args=[self.ajena.pk]), HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp.status_code, 304)
+        self.ajena.miembros.add(self.user)
+        resp = self.client.get(reverse("api_comunidad", args=[self.ajena.pk]), HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.json()["num_miembros"], resp.json()["es_miembro"]), (1, True))
+
+
+class CalendarioTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("sol", password="clave-segura-123")
+        cls.otro = User.objects.create_user("luna", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Senderismo", propietario=cls.user)
+        cls.ajena = Comunidad.objects.create(nombre="Escalada", propietario=cls.otro)
+        for titulo, fecha, hora in (
+            ("Fin de mes", date(2026, 3, 31), time(9)),
+            ("Abril temprano", date(2026, 4, 1), time(7)),
+            ("Abril sin hora", date(2026, 4, 1), None),
+            ("Mediados", date(2026, 4, 15), time(18)),
+        ):
+            Evento.objects.create(titulo=titulo, fecha=fecha, hora=hora, comunidad=cls.comunidad)
+        Evento.objects.create(titulo="Ajeno", fecha=date(2026, 4, 1), comunidad=cls.ajena)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def consultas_eventos(self, ctx):
+        return [q for q in ctx.captured_queries if "appEventWall_evento" in q["sql"]]
+
+    def test_mes_agrupado_por_dia_y_cacheado(self):
+        dias = calendario.mes_de_comunidad(self.comunidad.pk, 2026, 4)
+        self.assertEqual(list(dias), [date(2026, 4, 1), date(2026, 4, 15)])
+        self.assertEqual([e["titulo"] for e in dias[date(2026, 4, 1)]], ["Abril sin hora", "Abril temprano"])
+
+        url = reverse("comunidad_calendario_mes", args=[self.comunidad.pk, 2026, 4])
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertContains(resp, "Abril 2026")
+        self.assertContains(resp, "Mediados")
+        self.assertNotContains(resp, "Ajeno")
+        self.assertEqual(self.consultas_eventos(ctx), [])
+
+        Evento.objects.create(titulo="Nuevo", fecha=date(2026, 4, 20), comunidad=self.comunidad)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertContains(self.client.get(url), "Nuevo")
+        # Eventos simples + series
+        self.assertEqual(len(self.consultas_eventos(ctx)), 2)
+        self.assertEqual(self.client.get(reverse("comunidad_calendario_mes", args=[self.comunidad.pk, 2026, 13])).status_code, 404)
+
+    def test_rango_acotado_por_indice(self):
+        qs = (
+            Evento.objects.filter(comunidad_id=self.comunidad.pk, fecha__gte=date(2026, 4, 1), fecha__lte=date(2026, 4, 30))
+            .order_by(*calendario.ORDEN_EVENTOS).values(*calendario.CAMPOS)
+        )
+        self.assertIn("evento_com_fecha_hora_idx", qs.explain())
+
+    def test_semana_entre_dos_meses(self):
+        dias = calendario.semana_de_comunidad(self.comunidad.pk, date(2026, 4, 2))
+        self.assertEqual(list(dias), [date(2026, 3, 31), date(2026, 4, 1)])
+        resp = self.client.get(reverse("comunidad_semana", args=[self.comunidad.pk]), {"dia": "2026-04-02"})
+        self.assertContains(resp, "Semana del 30/03/2026 al 05/04/2026")
+        self.assertContains(resp, "Fin de mes")
+        self.assertNotContains(resp, "Mediados")
+        # Semanas en los límites de date: 404 en vez de un error al calcular los enlaces
+        for dia in ("9999-12-31", "0001-01-01"):
+            resp = self.client.get(reverse("comunidad_semana", args=[self.comunidad.pk]), {"dia": dia})
+            self.assertEqual(resp.status_code, 404)
+
+    def test_proximos_en_mis_comunidades(self):
+        dias = calendario.proximos(self.user, dias=2, hoy=date(2026, 3, 31))
+        self.assertEqual(
+            {f: [e["titulo"] for e in eventos] for f, eventos in dias.items()},
+            {date(2026, 3, 31): ["Fin de mes"], date(2026, 4, 1): ["Abril sin hora", "Abril temprano"]},
+        )
+        self.ajena.miembros.add(self.user)
+        dias = calendario.proximos(User.objects.get(pk=self.user.pk), dias=1, hoy=date(2026, 4, 1))
+        self.assertEqual(len(dias[date(2026, 4, 1)]), 3)
+        self.assertEqual(calendario.proximos(User.objects.create_user("nadie")), {})
+        self.assertEqual(self.client.get(reverse("eventos_proximos"), {"dias": 500}).context["num_dias"], calendario.MAX_DIAS_PROXIMOS)
+
+
+class FeedTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dueno = User.objects.create_user("ines", password="clave-segura-123")
+        cls.socio = User.objects.create_user("jon", password="clave-segura-123")
+        cls.extrano = User.objects.create_user("kai", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Teatro", propietario=cls.dueno)
+        cls.comunidad.miembros.add(cls.socio)
+        cls.manana = date.today() + timedelta(days=1)
+
+    def titulos(self, user, **kwargs):
+        filas, _ = feed.pagina(User.objects.get(pk=user.pk), **kwargs)
+        return [Evento.objects.get(pk=f["id"]).titulo for f in filas]
+
+    def test_fan_out_al_crear_y_al_cambiar_membresias(self):
+        Evento.objects.create(titulo="Ensayo", fecha=self.manana, comunidad=self.comunidad)
+        Evento.objects.create(titulo="Pasado", fecha=date.today() - timedelta(days=1), comunidad=self.comunidad)
+        self.assertEqual(EntradaFeed.objects.count(), 2)
+        self.assertEqual(self.titulos(self.dueno), ["Ensayo"])
+        self.assertEqual(self.titulos(self.socio), ["Ensayo"])
+        self.assertEqual(self.titulos(self.extrano), [])
+
+        self.extrano.miembro_de.add(self.comunidad)
+        self.assertEqual(self.titulos(self.extrano), ["Ensayo"])
+        self.comunidad.miembros.remove(self.extrano, self.socio)
+        self.assertEqual((self.titulos(self.extrano), self.titulos(self.socio)), ([], []))
+
+        self.comunidad.miembros.add(self.socio, self.dueno)
+        self.comunidad.miembros.clear()
+        self.assertEqual((self.titulos(self.socio), self.titulos(self.dueno)), ([], ["Ensayo"]))
+
+        self.comunidad.propietario = self.extrano
+        self.comunidad.save()
+        self.assertEqual((self.titulos(self.dueno), self.titulos(self.extrano)), ([], ["Ensayo"]))
+
+    def test_editar_reasignar_y_borrar(self):
+        otra = Comunidad.objects.create(nombre="Danza", propietario=self.extrano)
+        evento = Evento.objects.create(titulo="Función", fecha=self.manana, comunidad=self.comunidad)
+        evento = Evento.objects.get(pk=evento.pk)
+        evento.fecha = self.manana + timedelta(days=2)
+        evento.save()
+        self.assertEqual(set(EntradaFeed.objects.values_list("fecha", flat=True)), {evento.fecha})
+
+        evento.comunidad = otra
+        evento.save()
+        self.assertEqual((self.titulos(self.socio), self.titulos(self.extrano)), ([], ["Función"]))
+        evento.delete()
+        self.assertFalse(EntradaFeed.objects.exists())
+
+    def test_comunidad_grande_fan_out_al_leer(self):
+        Evento.objects.create(titulo="Antes", fecha=self.manana, comunidad=self.comunidad)
+        otra = Comunidad.objects.create(nombre="Pequeña", propietario=self.socio)
+        Evento.objects.create(titulo="Medio", fecha=self.manana, hora=time(12), comunidad=otra)
+        with mock.patch.object(feed, "UMBRAL_FANOUT", 0):
+            Evento.objects.create(titulo="Después", fecha=self.manana + timedelta(days=1), comunidad=self.comunidad)
+        self.assertTrue(Comunidad.objects.get(pk=self.comunidad.pk).feed_en_lectura)
+        self.assertFalse(EntradaFeed.objects.filter(comunidad=self.comunidad).exists())
+
+        self.assertEqual(self.titulos(self.socio), ["Antes", "Medio", "Después"])
+        self.assertEqual(self.titulos(self.socio, page_size=2), ["Antes", "Medio"])
+        _, siguiente = feed.pagina(self.socio, page_size=2)
+        self.assertEqual(self.titulos(self.socio, page_size=2, after=siguiente), ["Después"])
+
+        # reconstruir decide de nuevo según el número de miembros
+        salida = StringIO()
+        call_command("reconstruir_feed", stdout=salida)
+        self.assertIn("Comunidades: 2 · entradas creadas: 5", salida.getvalue())
+        self.assertFalse(Comunidad.objects.get(pk=self.comunidad.pk).feed_en_lectura)
+        self.assertEqual(self.titulos(self.socio), ["Antes", "Medio", "Después"])
+
+    def test_lectura_o_de_pagina_con_200_comunidades(self):
+        comunidades = Comunidad.objects.bulk_create(
+            [Comunidad(nombre=f"C{i}", propietario=self.dueno) for i in range(200)]
+        )
+        Comunidad.miembros.through.objects.bulk_create(
+            [Comunidad.miembros.through(comunidad_id=c.pk, user_id=self.socio.pk) for c in comunidades]
+        )
+        Evento.objects.bulk_create([
+            Evento(titulo=f"E{i}", fecha=self.manana + timedelta(days=i % 30), comunidad=c)
+            for i, c in enumerate(comunidades)
+        ])
+        feed.reconstruir()
+        socio = User.objects.get(pk=self.socio.pk)
+        feed.pagina(socio)  # calienta membresías y comunidades grandes
+
+        vistos, after = [], None
+        while True:
+            with CaptureQueriesContext(connection) as ctx:
+                filas, after = feed.pagina(socio, after=after, page_size=25)
+            # La página del feed y las series vivas de esas comunidades
+            self.assertEqual(len(ctx.captured_queries), 2)
+            self.assertIn("LIMIT 26", ctx.captured_queries[0]["sql"])
+            self.assertIn("recurrencia_hasta", ctx.captured_queries[1]["sql"])
+            vistos += filas
+            if not after:
+                break
+        self.assertEqual(len(vistos), 200)
+        self.assertEqual(vistos, sorted(vistos, key=lambda f: (f["fecha"], f["id"])))
+
+    def test_home_muestra_el_muro(self):
+        Evento.objects.create(titulo="Estreno", fecha=self.manana, comunidad=self.comunidad)
+        self.client.force_login(self.socio)
+        resp = self.client.get(reverse("home"))
+        self.assertContains(resp, "Mi muro")
+        self.assertContains(resp, "Estreno")
+
+
+@override_settings(ROOT_URLCONF="appEventWall.tests")
+class VistasAsyncTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("olga", password="clave-segura-123")
+        cls.otro = User.objects.create_user("pau", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Jardinería", propietario=cls.otro)
+        cls.comunidad.miembros.add(cls.user)
+        cls.evento = Evento.objects.create(
+            titulo="Poda de otoño", fecha=date.today(), lugar="Huerto", comunidad=cls.comunidad, creado_por=cls.otro,
+        )
+        obtener_backend().reconstruir(Comunidad)
+        obtener_backend().reconstruir(Evento)
+
+    def test_rutas_de_lectura_usan_vistas_async(self):
+        for nombre, args in (("eventos_list", []), ("evento_detalle", [1]), ("comunidad_detalle", [1]),
+                             ("Comunidades", []), ("comunidad_miembros", [1])):
+            self.assertTrue(iscoroutinefunction(resolve(reverse(nombre, args=args)).func), nombre)
+        self.assertFalse(iscoroutinefunction(resolve(reverse("evento_crear")).func))
+
+    async def test_login_required(self):
+        resp = await self.async_client.get(reverse("eventos_list"))
+        self.assertEqual(resp.status_code, 302)
+        self.assertTrue(resp.url.startswith("/login/"))
+
+    async def test_mismo_contenido_que_las_sincronas(self):
+        await self.async_client.aforce_login(self.user)
+        resp = await self.async_client.get(reverse("eventos_list"))
+        self.assertContains(resp, "Poda de otoño")
+        self.assertContains(resp, "Comunidad: Jardinería")
+        self.assertContains(await self.async_client.get(reverse("eventos_list"), {"q": "huerto"}), "Poda de otoño")
+        self.assertContains(await self.async_client.get(reverse("evento_detalle", args=[self.evento.pk])), "Poda de otoño")
+        self.assertEqual((await self.async_client.get(reverse("evento_detalle", args=[0]))).status_code, 404)
+
+        resp = await self.async_client.get(reverse("comunidad_detalle", args=[self.comunidad.pk]))
+        self.assertContains(resp, "Poda de otoño")
+        self.assertTrue(resp.context["es_miembro"])
+        self.assertContains(resp, "Salir de la comunidad")
+
+        resp = await self.async_client.get(reverse("Comunidades"), {"q": "jardin"})
+        self.assertEqual([(c.nombre, c.is_miembro) for c in resp.context["resultados"]], [("Jardinería", True)])
+        resp = await self.async_client.get(reverse("comunidad_miembros", args=[self.comunidad.pk]))
+        self.assertContains(resp, "olga")
+
+    def test_series_leen_la_ventana_sin_cache_sincrona(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Evento.objects.create(
+                titulo="Riego", fecha=date.today(), hora=time(9), recurrencia="FREQ=DAILY;COUNT=3",
+                comunidad=self.comunidad, creado_por=self.otro,
+            )
+            recurrencia.refrescar()
+        # En el bucle de eventos la ventana se lee con cache.aget, no con ventana()
+        with mock.patch.object(recurrencia, "ventana", side_effect=AssertionError("cache.get en async")):
+            eventos, _ = async_to_sync(apaginar_con_series)(
+                self.comunidad.eventos.all(), comunidad_id=self.comunidad.pk
+            )
+        self.assertEqual([e.titulo for e in eventos].count("Riego"), 3)
+
+    def test_segunda_visita_sale_de_la_cache(self):
+        # El cliente síncrono también sirve: Django adapta la vista async
+        self.client.force_login(self.user)
+        self.client.get(reverse("eventos_list"))
+        with self.assertNumQueries(2):  # sesión y usuario
+            self.assertContains(self.client.get(reverse("eventos_list")), "Poda de otoño")
+
+
+class EnVivoTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rosa", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Ajedrez", propietario=cls.user)
+        cls.otra = Comunidad.objects.create(nombre="Damas", propietario=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        # Backend nuevo por test: sin suscriptores de otros tests
+        patcher = mock.patch.object(en_vivo, "_backend", en_vivo.BackendMemoria())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def publicados(self, accion):
+        with mock.patch.object(en_vivo, "publicar") as publicar:
+            with self.captureOnCommitCallbacks(execute=True):
+                accion()
+        return [(cid, m["accion"], m["id"]) for llamada in publicar.call_args_list for cid, m in llamada.args[0]]
+
+    def test_senales_publican_tras_el_commit(self):
+        c, o = self.comunidad.pk, self.otra.pk
+        evento = None
+
+        def crear():
+            nonlocal evento
+            evento = Evento.objects.create(titulo="Torneo", fecha=date.today(), comunidad=self.comunidad, creado_por=self.user)
+
+        self.assertEqual(self.publicados(crear), [(c, "creado", evento.pk)])
+
+        def editar():
+            evento.titulo = "Torneo rápido"
+            evento.save()
+
+        self.assertEqual(self.publicados(editar), [(c, "editado", evento.pk)])
+
+        def mover():
+            evento.comunidad = self.otra
+            evento.save()
+
+        self.assertEqual(self.publicados(mover), [(c, "borrado", evento.pk), (o, "creado", evento.pk)])
+        pk = evento.pk
+        self.assertEqual(self.publicados(evento.delete), [(o, "borrado", pk)])
+
+        # Sin commit no se publica nada
+        with mock.patch.object(en_vivo, "publicar") as publicar:
+            Evento.objects.create(titulo="Simultáneas", fecha=date.today(), comunidad=self.comunidad, creado_por=self.user)
+        publicar.assert_not_called()
+
+    def test_mensaje_lleva_los_datos_del_evento(self):
+        evento = Evento(pk=7, titulo="Blitz", fecha=date(2030, 1, 2), hora=time(18, 0), tipo="Otro", comunidad=self.comunidad)
+        mensaje = en_vivo.mensaje("editado", evento)
+        self.assertEqual(mensaje["evento"]["titulo"], "Blitz")
+        self.assertEqual(mensaje["evento"]["comunidad"], self.comunidad.pk)
+        self.assertIn('"fecha": "2030-01-02"', en_vivo.formatear([mensaje]))
+        self.assertEqual(en_vivo.mensaje("borrado", evento), {"accion": "borrado", "id": 7})
+
+    async def test_agrupa_las_rafagas(self):
+        flujo = en_vivo.escuchar("comunidad:1", ventana=0.05, latido=5)
+        self.assertEqual(await anext(flujo), "retry: 3000\n\n")
+        en_vivo.publicar([
+            (1, {"accion": "creado", "id": 1, "evento": {"titulo": "a"}}),
+            (1, {"accion": "editado", "id": 2, "evento": {"titulo": "b"}}),
+            (1, {"accion": "editado", "id": 1, "evento": {"titulo": "a2"}}),
+            (2, {"accion": "borrado", "id": 3}),  # otro canal
+        ])
+        lote = await anext(flujo)
+        self.assertTrue(lote.startswith("event: eventos\ndata: "))
+        datos = json.loads(lote.split("data: ", 1)[1])
+        self.assertEqual([(m["id"], m["evento"]["titulo"]) for m in datos], [(2, "b"), (1, "a2")])
+
+        self.assertEqual(en_vivo.obtener_backend().total_suscripciones(), 1)
+        await flujo.aclose()
+        self.assertEqual(en_vivo.obtener_backend().total_suscripciones(), 0)
+
+    async def test_latido_y_cola_llena(self):
+        flujo = en_vivo.escuchar("comunidad:1", ventana=0, latido=0.01)
+        await anext(flujo)
+        self.assertEqual(await anext(flujo), ": latido\n\n")
+        await flujo.aclose()
+
+        with mock.patch.object(en_vivo, "COLA_MAX", 2):
+            flujo = en_vivo.escuchar("comunidad:1", ventana=0.05, latido=5)
+            await anext(flujo)
+            en_vivo.publicar([(1, {"accion": "borrado", "id": i}) for i in range(5)])
+            self.assertEqual(json.loads((await anext(flujo)).split("data: ", 1)[1]), [{"accion": "recargar"}])
+            await flujo.aclose()
+
+    async def test_vista_stream(self):
+        url = reverse("comunidad_eventos_stream", args=[self.comunidad.pk])
+        self.assertEqual((await self.async_client.get(url)).status_code, 302)
+        await self.async_client.aforce_login(self.user)
+        self.assertEqual((await self.async_client.get(reverse("comunidad_eventos_stream", args=[0]))).status_code, 404)
+
+        resp = await self.async_client.get(url)
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        self.assertEqual(resp["Cache-Control"], "no-cache")
+        contenido = aiter(resp.streaming_content)
+        self.assertEqual(await anext(contenido), b"retry: 3000\n\n")
+        await contenido.aclose()
+        pagina = await self.async_client.get(reverse("comunidad_detalle", args=[self.comunidad.pk]))
+        self.assertContains(pagina, "data-stream=")
+
+    def test_stream_con_wsgi_no_bloquea(self):
+        # El cliente síncrono pasa por el handler WSGI: el stream no llegaría
+        # nunca, así que ni se abre (204) ni la página lo pide
+        self.client.force_login(self.user)
+        with mock.patch.object(en_vivo, "escuchar", side_effect=AssertionError("no debe abrirse")):
+            resp = self.client.get(reverse("comunidad_eventos_stream", args=[self.comunidad.pk]))
+        self.assertEqual(resp.status_code, 204)
+        self.assertFalse(resp.streaming)
+        self.assertNotContains(self.client.get(reverse("comunidad_detalle", args=[self.comunidad.pk])), "data-stream=")
+
+
+def imagen_subida(ancho, alto, formato="PNG", nombre="foto.png"):
+    buffer = BytesIO()
+    Image.new("RGBA" if formato == "PNG" else "RGB", (ancho, alto), (200, 30, 30, 128)).save(buffer, formato)
+    return SimpleUploadedFile(nombre, buffer.getvalue(), content_type=f"image/{formato.lower()}")
+
+
+class MiniaturasTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("tere", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Fotografía", propietario=cls.user)
+        cls.comunidad.miembros.add(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajuste = override_settings(MEDIA_ROOT=media.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def subir(self, archivo):
+        self.client.force_login(self.user)
+        with mock.patch.object(miniaturas, "programar") as programar:
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.post(reverse("perfil"), {"foto": archivo})
+        return resp, programar
+
+    def test_genera_webp_y_jpeg_cuadradas(self):
+        perfil = self.user.profile
+        perfil.foto.save("foto.png", imagen_subida(400, 200), save=False)
+        for tamano, lado in miniaturas.TAMANOS.items():
+            for formato, pil in (("webp", "WEBP"), ("jpg", "JPEG")):
+                destino = miniaturas.generar(perfil.foto.name, tamano, formato)
+                with default_storage.open(destino) as f, Image.open(f) as img:
+                    self.assertEqual((img.format, img.size), (pil, (lado, lado)))
+        # Ya existe: no se vuelve a decodificar el original
+        with mock.patch.object(miniaturas, "_reducir") as reducir:
+            miniaturas.generar(perfil.foto.name, "chica", "jpg")
+        reducir.assert_not_called()
+
+    def test_limite_de_pixeles(self):
+        with mock.patch.object(miniaturas, "MAX_PIXELES", 100 * 100):
+            with self.assertRaises(miniaturas.ImagenDemasiadoGrande):
+                miniaturas.comprobar(imagen_subida(101, 100))
+            resp, programar = self.subir(imagen_subida(200, 200))
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("píxeles", resp.context["form"].errors["foto"][0])
+        programar.assert_not_called()
+
+    def test_subida_genera_en_segundo_plano(self):
+        resp, programar = self.subir(imagen_subida(50, 50, "JPEG", "cara.jpg"))
+        self.assertRedirects(resp, reverse("perfil"))
+        primera = Profile.objects.get(user=self.user).foto.name
+        programar.assert_called_once_with(miniaturas.generar_todas, primera)
+
+        _, programar = self.subir(imagen_subida(60, 60, "JPEG", "cara2.jpg"))
+        segunda = Profile.objects.get(user=self.user).foto.name
+        self.assertEqual(programar.call_args_list, [
+            mock.call(miniaturas.generar_todas, segunda), mock.call(miniaturas.borrar_todas, primera),
+        ])
+
+    def test_miniatura_perezosa(self):
+        self.subir(imagen_subida(300, 300))
+        nombre = Profile.objects.get(user=self.user).foto.name
+        perezosa = reverse("miniatura_perfil", args=[self.user.pk, "chica", "webp"])
+        perezosa += f"?v={miniaturas.clave(nombre)}"
+        # Renderizar no consulta el storage: siempre enlaza la vista perezosa
+        with mock.patch.object(default_storage, "exists", side_effect=AssertionError("stat al renderizar")):
+            resp = self.client.get(reverse("comunidad_miembros", args=[self.comunidad.pk]))
+        self.assertContains(resp, perezosa)
+
+        resp = self.client.get(perezosa)
+        destino = miniaturas.ruta(nombre, "chica", "webp")
+        self.assertRedirects(resp, default_storage.url(destino), fetch_redirect_response=False)
+        self.assertIn("max-age", resp["Cache-Control"])
+        self.assertTrue(default_storage.exists(destino))
+        # Con una clave vieja redirige igual, pero sin cachear
+        resp = self.client.get(reverse("miniatura_perfil", args=[self.user.pk, "chica", "webp"]) + "?v=vieja")
+        self.assertRedirects(resp, default_storage.url(destino), fetch_redirect_response=False)
+        self.assertFalse(resp.has_header("Cache-Control"))
+
+        self.assertEqual(self.client.get(reverse("miniatura_perfil", args=[self.user.pk, "enorme", "jpg"])).status_code, 404)
+        otro = User.objects.create_user("sin-foto", password="clave-segura-123")
+        self.assertEqual(self.client.get(reverse("miniatura_perfil", args=[otro.pk, "chica", "jpg"])).status_code, 404)
+
+
+FALLOS_PENDIENTES = []
+
+
+@tareas.tarea
+def tarea_que_falla(marca):
+    if FALLOS_PENDIENTES:
+        FALLOS_PENDIENTES.pop()
+        raise RuntimeError(f"fallo {marca}")
+
+
+class TareasTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("ines", password="clave-segura-123")
+        cls.miembro = User.objects.create_user("joel", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Teatro", propietario=cls.user)
+        cls.comunidad.miembros.add(cls.miembro)
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(tareas, "EN_LINEA", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fan_out_del_feed_va_por_la_cola(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            evento = Evento.objects.create(titulo="Ensayo", fecha=date.today(), comunidad=self.comunidad, creado_por=self.user)
+        tarea = Tarea.objects.get()
+        self.assertEqual((tarea.nombre, tarea.argumentos), ("appEventWall.feed.repartir_evento", {"args": [evento.pk], "kwargs": {}}))
+        self.assertFalse(EntradaFeed.objects.exists())
+
+        self.assertEqual(tareas.reclamar("w1", 10), [tarea.pk])
+        self.assertEqual(tareas.reclamar("w2", 10), [])  # ya es de w1
+        self.assertTrue(tareas.ejecutar(tarea.pk))
+        self.assertEqual(set(EntradaFeed.objects.values_list("user_id", flat=True)), {self.user.pk, self.miembro.pk})
+        self.assertEqual(Tarea.objects.get().estado, Tarea.HECHA)
+
+    def test_sin_commit_no_se_encola(self):
+        Evento.objects.create(titulo="Ensayo", fecha=date.today(), comunidad=self.comunidad, creado_por=self.user)
+        self.assertFalse(Tarea.objects.exists())
+
+    def test_reintentos_con_espera(self):
+        FALLOS_PENDIENTES[:] = [1, 1]
+        self.addCleanup(FALLOS_PENDIENTES.clear)
+        tarea = tareas.encolar(tarea_que_falla, "x", max_intentos=2)
+        self.assertEqual(tareas.reclamar("w1", 10), [tarea.pk])
+        with self.assertLogs("appEventWall.tareas", "WARNING"):
+            self.assertFalse(tareas.ejecutar(tarea.pk))
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), (Tarea.PENDIENTE, 1))
+        self.assertIn("RuntimeError: fallo x", tarea.ultimo_error)
+        self.assertGreater(tarea.disponible_en, timezone.now() + timedelta(seconds=tareas.ESPERA_BASE * 0.7))
+        self.assertEqual(tareas.reclamar("w1", 10), [])  # aún esperando
+
+        Tarea.objects.update(disponible_en=timezone.now())
+        tareas.reclamar("w1", 10)
+        with self.assertLogs("appEventWall.tareas", "ERROR"):
+            self.assertFalse(tareas.ejecutar(tarea.pk))
+        self.assertEqual(Tarea.objects.get().estado, Tarea.FALLIDA)
+
+    def test_solo_funciones_marcadas(self):
+        with self.assertRaises(tareas.TareaDesconocida):
+            tareas.encolar(os.getcwd)
+        tarea = Tarea.objects.create(nombre="os.getcwd")
+        tareas.reclamar("w1", 1)
+        with self.assertLogs("appEventWall.tareas", "WARNING"):
+            self.assertFalse(tareas.ejecutar(tarea.pk))
+        self.assertIn("TareaDesconocida", Tarea.objects.get().ultimo_error)
+
+    def test_rescatar_colgadas(self):
+        viejo = timezone.now() - timedelta(seconds=tareas.PLAZO_LATIDO + 1)
+        colgada = Tarea.objects.create(nombre="x", estado=Tarea.EN_CURSO, reclamada_en=viejo, latido_en=viejo, intentos=1)
+        agotada = Tarea.objects.create(nombre="y", estado=Tarea.EN_CURSO, reclamada_en=viejo, latido_en=viejo, intentos=5)
+        sin_latido = Tarea.objects.create(nombre="v", estado=Tarea.EN_CURSO, reclamada_en=viejo, intentos=1)
+        # Larga pero con su worker vivo: no se ejecuta dos veces
+        larga = Tarea.objects.create(nombre="w", estado=Tarea.EN_CURSO, reclamada_en=viejo, latido_en=timezone.now())
+        reciente = Tarea.objects.create(nombre="z", estado=Tarea.EN_CURSO, reclamada_en=timezone.now())
+        self.assertEqual(tareas.rescatar_colgadas(), 3)
+        estados = dict(Tarea.objects.values_list("pk", "estado"))
+        self.assertEqual(
+            [estados[colgada.pk], estados[agotada.pk], estados[sin_latido.pk], estados[larga.pk], estados[reciente.pk]],
+            [Tarea.PENDIENTE, Tarea.FALLIDA, Tarea.PENDIENTE, Tarea.EN_CURSO, Tarea.EN_CURSO],
+        )
+
+    def test_latir_renueva_solo_las_propias(self):
+        mia, ajena = Tarea.objects.create(nombre="x"), Tarea.objects.create(nombre="y")
+        tareas.reclamar("w1", 1)
+        tareas.reclamar("w2", 1)
+        viejo = timezone.now() - timedelta(seconds=tareas.PLAZO_LATIDO + 1)
+        Tarea.objects.update(reclamada_en=viejo, latido_en=viejo)
+        self.assertEqual(tareas.latir("w1", [mia.pk, ajena.pk]), 1)
+        self.assertEqual(tareas.rescatar_colgadas(), 1)
+        self.assertEqual(Tarea.objects.get(pk=mia.pk).estado, Tarea.EN_CURSO)
+        self.assertEqual(Tarea.objects.get(pk=ajena.pk).estado, Tarea.PENDIENTE)
+
+
+class RunWorkerTests(TransactionTestCase):
+    # El worker usa sus propios hilos/conexiones: necesita datos confirmados
+
+    def test_vacia_la_cola(self):
+        user = User.objects.create_user("kike", password="clave-segura-123")
+        comunidad = Comunidad.objects.create(nombre="Coro", propietario=user)
+        with mock.patch.object(tareas, "EN_LINEA", False):
+            Evento.objects.create(titulo="Concierto", fecha=date.today(), comunidad=comunidad, creado_por=user)
+        self.assertEqual(Tarea.objects.count(), 1)
+        salida = StringIO()
+        call_command("run_worker", "--una-vez", "--concurrencia", "2", stdout=salida)
+        self.assertIn("Tareas hechas: 1", salida.getvalue())
+        self.assertEqual(EntradaFeed.objects.get().user_id, user.pk)
+
+
+class NotificacionesTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.duena = User.objects.create_user("lara", email="lara@example.com", password="clave-segura-123")
+        cls.autor = User.objects.create_user("mario", email="mario@example.com", password="clave-segura-123")
+        cls.miembros = [
+            User.objects.create_user(f"socio{i}", email=f"socio{i}@example.com" if i else "", password="clave-segura-123")
+            for i in range(3)
+        ]
+        cls.comunidad = Comunidad.objects.create(nombre="Cineclub", propietario=cls.duena)
+        cls.comunidad.miembros.add(cls.autor, *cls.miembros)
+
+    def crear_evento(self, titulo):
+        return Evento.objects.create(titulo=titulo, fecha=date.today(), comunidad=self.comunidad, creado_por=self.autor)
+
+    def test_evento_crear_notifica_a_todos_menos_al_autor(self):
+        self.client.force_login(self.autor)
+        self.client.post(reverse("evento_crear_en_comunidad", args=[self.comunidad.pk]), {
+            "titulo": "Ciclo Kurosawa", "fecha": date.today().isoformat(),
+            "hora_inicio": "20:00", "hora_fin": "22:00", "tipo": "otro",
+        })
+        evento = Evento.objects.get(titulo="Ciclo Kurosawa")
+        self.assertEqual(
+            set(Notificacion.objects.filter(evento=evento).values_list("user_id", flat=True)),
+            {self.duena.pk, *(m.pk for m in self.miembros)},
+        )
+
+    def test_bulk_create_por_bloques(self):
+        evento = self.crear_evento("Noche de terror")
+        with mock.patch.object(notificaciones, "BATCH_SIZE", 2), CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(notificaciones.notificar_evento(evento.pk), 4)
+        inserts = [q for q in consultas.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 2)
+        # Reintentar la tarea no duplica avisos
+        notificaciones.notificar_evento(evento.pk)
+        self.assertEqual(Notificacion.objects.count(), 4)
+
+    def test_propietario_miembro_cuenta_una_vez(self):
+        self.comunidad.miembros.add(self.duena)
+        evento = self.crear_evento("Rashomon")
+        self.assertEqual(notificaciones.notificar_evento(evento.pk), 4)
+        self.assertEqual(Notificacion.objects.filter(user=self.duena).count(), 1)
+        propio = Evento.objects.create(titulo="Ikiru", fecha=date.today(), comunidad=self.comunidad, creado_por=self.duena)
+        self.assertEqual(notificaciones.notificar_evento(propio.pk), 4)
+        self.assertFalse(Notificacion.objects.filter(user=self.duena, evento=propio).exists())
+
+    def test_resumen_solo_carga_las_que_salen(self):
+        for i in range(4):
+            notificaciones.notificar_evento(self.crear_evento(f"Peli {i}").pk)
+        with mock.patch.object(notificaciones, "MAX_EN_RESUMEN", 2):
+            self.assertEqual(notificaciones.enviar_resumenes(), (3, 16))
+        correo = next(m for m in mail.outbox if m.to == ["lara@example.com"])
+        self.assertIn("4 eventos nuevos", correo.subject)
+        self.assertIn("Peli 1", correo.body)
+        self.assertNotIn("Peli 2", correo.body)
+        self.assertIn("y 2 más", correo.body)
+        self.assertFalse(Notificacion.objects.filter(enviada_en__isnull=True).exists())
+
+    def test_un_resumen_por_usuario(self):
+        for titulo in ("Akira", "Ran"):
+            notificaciones.notificar_evento(self.crear_evento(titulo).pk)
+        with mock.patch.object(notificaciones, "USUARIOS_POR_LOTE", 2):
+            correos, incluidas = notificaciones.enviar_resumenes(2)
+        # socio0 no tiene email: sus avisos quedan solo en la web
+        self.assertEqual((correos, incluidas), (3, 8))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["lara@example.com", "socio1@example.com", "socio2@example.com"])
+        self.assertIn("2 eventos nuevos", mail.outbox[0].subject)
+        self.assertIn("Akira (Cineclub)", mail.outbox[0].body)
+        self.assertIn("Ran (Cineclub)", mail.outbox[0].body)
+
+        salida = StringIO()
+        call_command("enviar_resumenes", stdout=salida)
+        self.assertIn("Correos enviados: 0", salida.getvalue())
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_pagina_de_notificaciones(self):
+        notificaciones.notificar_evento(self.crear_evento("Stalker").pk)
+        self.client.force_login(self.duena)
+        resp = self.client.get(reverse("notificaciones"))
+        self.assertContains(resp, "Stalker")
+        self.assertContains(resp, "nueva")
+        self.assertFalse(self.duena.notificaciones.filter(leida=False).exists())
+        self.assertNotContains(self.client.get(reverse("notificaciones")), "event-card nueva")
+
+
+class AjustesTests(TestCase):
+    """Perfiles de EventWall/settings/ (se cargan con runpy, sin tocar los ajustes activos)."""
+
+    def cargar(self, perfil, **entorno):
+        with mock.patch.dict(os.environ, entorno), warnings.catch_warnings():
+            if "EVENTWALL_SECRET_KEY" not in entorno:
+                os.environ.pop("EVENTWALL_SECRET_KEY", None)
+            # El perfil activo ya está en sys.modules: runpy avisa, pero lo ejecuta aparte
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return runpy.run_module(f"EventWall.settings.{perfil}")
+
+    def test_prod_exige_secret_key(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.cargar("prod")
+
+    def test_prod(self):
+        ajustes = self.cargar(
+            "prod", EVENTWALL_SECRET_KEY="x" * 50, EVENTWALL_ALLOWED_HOSTS="a.example.com, b.example.com",
+            EVENTWALL_CACHE_URL="memcached://127.0.0.1:11211", EVENTWALL_DB_CONN_MAX_AGE="120",
+        )
+        self.assertFalse(ajustes["DEBUG"])
+        self.assertEqual(ajustes["ALLOWED_HOSTS"], ["a.example.com", "b.example.com"])
+        self.assertEqual(ajustes["DATABASES"]["default"]["CONN_MAX_AGE"], 120)
+        self.assertTrue(ajustes["DATABASES"]["default"]["CONN_HEALTH_CHECKS"])
+        self.assertFalse(ajustes["TEMPLATES"][0]["APP_DIRS"])
+        self.assertEqual(ajustes["TEMPLATES"][0]["OPTIONS"]["loaders"][0][0], "django.template.loaders.cached.Loader")
+        self.assertEqual(ajustes["SESSION_ENGINE"], "django.contrib.sessions.backends.cached_db")
+        self.assertEqual(ajustes["CACHES"]["default"]["LOCATION"], "127.0.0.1:11211")
+        self.assertEqual(ajustes["STORAGES"]["staticfiles"]["BACKEND"], "appEventWall.estaticos.EstaticosComprimidos")
+        self.assertEqual(ajustes["MIDDLEWARE"][1], "appEventWall.estaticos.EstaticosMiddleware")
+        self.assertFalse(ajustes["EVENTWALL_TAREAS_EN_LINEA"])
+
+    def test_prod_no_modifica_base(self):
+        from EventWall.settings import base
+
+        # Django completa base.DATABASES["default"] (CONN_MAX_AGE...) al abrir
+        # conexiones: se compara con su estado de antes, no con el del archivo
+        antes = copy.deepcopy(base.DATABASES["default"])
+        prod = self.cargar("prod", EVENTWALL_SECRET_KEY="x" * 50, EVENTWALL_DB_CONN_MAX_AGE="120")
+        self.assertIsNot(prod["DATABASES"]["default"], base.DATABASES["default"])
+        self.assertEqual(base.DATABASES["default"], antes)
+        self.assertIsNot(prod["TEMPLATES"][0], base.TEMPLATES[0])
+        self.assertTrue(base.TEMPLATES[0]["APP_DIRS"])
+        # Y el archivo base, cargado de nuevo, no trae los ajustes de prod
+        self.assertNotIn("CONN_MAX_AGE", self.cargar("base")["DATABASES"]["default"])
+
+    def test_replicas(self):
+        ajustes = self.cargar("base", EVENTWALL_DB_HOSTS_REPLICAS="10.0.0.2, 10.0.0.3:3307")
+        self.assertEqual(ajustes["EVENTWALL_DB_REPLICAS"], ["replica1", "replica2"])
+        replica = ajustes["DATABASES"]["replica2"]
+        self.assertEqual((replica["HOST"], replica["PORT"]), ("10.0.0.3", "3307"))
+        self.assertEqual(replica["NAME"], ajustes["DATABASES"]["default"]["NAME"])
+        self.assertEqual(replica["TEST"], {"MIRROR": "default"})
+
+    def test_dev(self):
+        ajustes = self.cargar("dev")
+        self.assertTrue(ajustes["DEBUG"])
+        self.assertEqual(ajustes["CACHES"]["default"]["BACKEND"], "django.core.cache.backends.locmem.LocMemCache")
+
+    def test_cache_url_desconocida(self):
+        from EventWall.settings.base import caches_desde_url
+
+        self.assertEqual(
+            caches_desde_url("redis://r:6379/1")["default"]["BACKEND"], "django.core.cache.backends.redis.RedisCache"
+        )
+        with self.assertRaises(ValueError):
+            caches_desde_url("ftp://x")
+
+
+class EstaticosTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.raiz = tempfile.mkdtemp()
+        cls.ajustes = override_settings(
+            STATIC_ROOT=cls.raiz,
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": "appEventWall.estaticos.EstaticosComprimidos"},
+            },
+        )
+        cls.ajustes.enable()
+        call_command("collectstatic", interactive=False, verbosity=0)
+        cls.manifiesto = json.loads(Path(cls.raiz, "staticfiles.json").read_text())["paths"]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.ajustes.disable()
+        shutil.rmtree(cls.raiz)
+        super().tearDownClass()
+
+    def middleware(self):
+        return estaticos.EstaticosMiddleware(lambda request: HttpResponse("vista"))
+
+    def pedir(self, ruta, **cabeceras):
+        return self.middleware()(RequestFactory().get(ruta, headers=cabeceras))
+
+    def test_minificar_css(self):
+        css = '/* comentario */\n.a > .b ,\n.c :hover {\n  color : red ;\n  font-family: "Segoe  UI", Arial;\n}\n'
+        self.assertEqual(estaticos.minificar_css(css), '.a>.b,.c :hover{color :red;font-family:"Segoe  UI",Arial}')
+
+    def test_plantillas_sin_css_en_linea(self):
+        plantillas = Path(__file__).parent / "Templates"
+        for plantilla in plantillas.rglob("*.html"):
+            self.assertNotIn("<style", plantilla.read_text(), plantilla.name)
+
+    def test_collectstatic_minifica_y_comprime(self):
+        hashed = self.manifiesto["css/styles.css"]
+        self.assertNotEqual(hashed, "css/styles.css")
+        minificado = Path(self.raiz, hashed).read_bytes()
+        self.assertLess(len(minificado), len(Path(self.raiz, "css/styles.css").read_bytes()))
+        self.assertEqual(gzip.decompress(Path(self.raiz, hashed + ".gz").read_bytes()), minificado)
+        # JPEG ya va comprimido
+        self.assertFalse(Path(self.raiz, self.manifiesto["img/EventWall-96.jpg"] + ".gz").exists())
+
+    def test_sirve_comprimido_e_inmutable(self):
+        hashed = self.manifiesto["css/styles.css"]
+        resp = self.pedir("/static/" + hashed, accept_encoding="gzip, deflate")
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertEqual(resp["Cache-Control"], estaticos.CACHE_INMUTABLE)
+        self.assertEqual(resp["Vary"], "Accept-Encoding")
+        self.assertTrue(resp["Content-Type"].startswith("text/css"))
+        self.assertEqual(gzip.decompress(resp.content), Path(self.raiz, hashed).read_bytes())
+
+        resp = self.pedir("/static/" + hashed, accept_encoding="gzip;q=0")
+        self.assertFalse(resp.has_header("Content-Encoding"))
+        self.assertEqual(resp.content, Path(self.raiz, hashed).read_bytes())
+
+    def test_sin_hash_caducidad_corta(self):
+        resp = self.pedir("/static/css/styles.css")
+        self.assertEqual(resp["Cache-Control"], f"public, max-age={estaticos.MAX_AGE}")
+        resp = self.pedir("/static/css/styles.css", if_modified_since=resp["Last-Modified"])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_resto_sigue_a_la_vista(self):
+        self.assertEqual(self.pedir("/static/no/existe.css").content, b"vista")
+        self.assertEqual(self.pedir("/comunidades/").content, b"vista")
+        resp = self.middleware()(RequestFactory().post("/static/css/styles.css"))
+        self.assertEqual(resp.content, b"vista")
+
+    def test_async(self):
+        async def vista(request):
+            return HttpResponse("vista")
+
+        middleware = estaticos.EstaticosMiddleware(vista)
+        self.assertTrue(middleware.async_mode)
+        resp = async_to_sync(middleware)(RequestFactory().get("/static/" + self.manifiesto["css/styles.css"]))
+        self.assertEqual(resp["Cache-Control"], estaticos.CACHE_INMUTABLE)
+
+    def test_sin_collectstatic_no_se_usa(self):
+        with override_settings(STATIC_ROOT=os.path.join(self.raiz, "no-existe")):
+            with self.assertRaises(MiddlewareNotUsed):
+                self.middleware()
+
+
+class ReplicasTests(TransactionTestCase):
+    """
+    Primaria y réplica en dos archivos SQLite. La réplica va "atrasada" hasta
+    que replicar() copia la primaria encima (API de backup de sqlite3).
+    """
+
+    ALIAS = ("primaria", "replica")
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Se registran aquí y no en 'databases': el runner comprueba esos alias
+        # antes de importar nada de esta clase
+        cls.carpeta = tempfile.mkdtemp()
+        nuevas = {
+            alias: {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(cls.carpeta, f"{alias}.sqlite3")}
+            for alias in cls.ALIAS
+        }
+        configuradas = connections.configure_settings({**connections.settings, **nuevas})
+        for alias in nuevas:
+            connections.settings[alias] = configuradas[alias]
+        cls.databases = cls.databases | set(cls.ALIAS)
+        call_command("migrate", database="primaria", verbosity=0)
+        cls.plantilla = os.path.join(cls.carpeta, "plantilla.sqlite3")
+        cls.copiar(connections.settings["primaria"]["NAME"], cls.plantilla)
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in cls.ALIAS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        shutil.rmtree(cls.carpeta)
+        super().tearDownClass()
+
+    @staticmethod
+    def copiar(origen, destino):
+        with closing(sqlite3.connect(origen)) as a, closing(sqlite3.connect(destino)) as b:
+            a.backup(b)
+
+    def replicar(self):
+        connections["replica"].close()
+        self.copiar(connections.settings["primaria"]["NAME"], connections.settings["replica"]["NAME"])
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        # Las dos bases de datos vacías (solo el esquema) en cada test
+        for alias in self.ALIAS:
+            connections[alias].close()
+            self.copiar(self.plantilla, connections.settings[alias]["NAME"])
+        for nombre, valor in (("PRIMARIA", "primaria"), ("REPLICAS", ["replica"])):
+            parche = mock.patch.object(replicas, nombre, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+        self.user = User.objects.create_user("ana", password="clave-segura-123")
+        self.comunidad = Comunidad.objects.create(nombre="Huertos", propietario=self.user)
+        self.client.force_login(self.user)
+        self.replicar()
+
+    def crear_evento(self):
+        return self.client.post(reverse("evento_crear_en_comunidad", args=[self.comunidad.pk]), {
+            "titulo": "Siembra de tomates", "fecha": date.today().isoformat(),
+            "hora_inicio": "10:00", "hora_fin": "11:00", "tipo": "reunion",
+        })
+
+    def test_lecturas_en_replica_y_escrituras_en_primaria(self):
+        otra = Comunidad.objects.create(nombre="Ajedrez", propietario=self.user)
+        self.assertEqual(otra._state.db, "primaria")
+        self.assertFalse(Comunidad.objects.filter(pk=otra.pk).exists())
+        with replicas.en_primaria():
+            self.assertTrue(Comunidad.objects.filter(pk=otra.pk).exists())
+        with transaction.atomic(using="primaria"):
+            self.assertTrue(Comunidad.objects.filter(pk=otra.pk).exists())
+        self.replicar()
+        self.assertTrue(Comunidad.objects.filter(pk=otra.pk).exists())
+
+    def test_lee_lo_que_escribio_tras_redirigir(self):
+        resp = self.crear_evento()
+        self.assertRedirects(resp, reverse("comunidad_detalle", args=[self.comunidad.pk]), fetch_redirect_response=False)
+        self.assertEqual(resp.cookies[replicas.COOKIE]["max-age"], replicas.PEGAJOSO)
+        self.assertContains(self.client.get(resp.url), "Siembra de tomates")
+        buscar = (reverse("eventos_list"), {"q": "tomates"})
+        self.assertContains(self.client.get(*buscar), "Siembra de tomates")
+
+        # Sin la cookie (otro navegador, o pasados PEGAJOSO segundos) se lee de la réplica
+        del self.client.cookies[replicas.COOKIE]
+        self.assertNotContains(self.client.get(*buscar), "Siembra de tomates")
+        self.replicar()
+        self.assertContains(self.client.get(*buscar), "Siembra de tomates")
+
+    def test_cache_se_llena_desde_la_primaria(self):
+        self.crear_evento()
+        del self.client.cookies[replicas.COOKIE]
+        # La réplica no tiene el evento, pero la lista que se cachea sí
+        self.assertContains(self.client.get(reverse("comunidad_detalle", args=[self.comunidad.pk])), "Siembra de tomates")
+
+    def test_lecturas_no_dejan_cookie(self):
+        resp = self.client.get(reverse("Comunidades"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn(replicas.COOKIE, resp.cookies)
+
+    async def test_async(self):
+        await sync_to_async(self.crear_evento)()
+        sesion = settings.SESSION_COOKIE_NAME
+        self.async_client.cookies[sesion] = self.client.cookies[sesion].value
+        resp = await self.async_client.get(reverse("eventos_list"), {"q": "tomates"})
+        self.assertNotContains(resp, "Siembra de tomates")
+        self.async_client.cookies[replicas.COOKIE] = "1"
+        resp = await self.async_client.get(reverse("eventos_list"), {"q": "tomates"})
+        self.assertContains(resp, "Siembra de tomates")
+
+    def test_migraciones_solo_en_la_primaria(self):
+        self.assertFalse(router.allow_migrate("replica", "appEventWall"))
+        self.assertTrue(router.allow_migrate("primaria", "appEventWall"))
+
+
+class LoginTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("ana", password="clave-segura-123")
+
+    def entrar(self, username="ana", password="mala", ip="10.0.0.1"):
+        return self.client.post(reverse("login"), {"username": username, "password": password}, REMOTE_ADDR=ip)
+
+    def contar_verificaciones(self):
+        return mock.patch.object(User, "check_password", autospec=True, side_effect=User.check_password)
+
+    def test_una_sola_verificacion_de_contrasena(self):
+        with self.contar_verificaciones() as verificar:
+            resp = self.entrar(password="clave-segura-123")
+        self.assertRedirects(resp, reverse("home"), fetch_redirect_response=False)
+        self.assertEqual(verificar.call_count, 1)
+        self.assertEqual(int(self.client.session["_auth_user_id"]), self.user.pk)
+
+    def test_bloqueo_por_usuario_sin_llegar_al_hasher(self):
+        capacidad, _ = limites.CUBETAS["usuario"]
+        for _ in range(capacidad):
+            self.assertEqual(self.entrar().status_code, 200)
+        with self.contar_verificaciones() as verificar:
+            resp = self.entrar(password="clave-segura-123")
+        self.assertEqual(resp.status_code, 429)
+        self.assertContains(resp, "Demasiados intentos", status_code=429)
+        self.assertEqual(verificar.call_count, 0)
+        # Otro usuario desde la misma IP sí puede
+        self.assertEqual(self.entrar(username="otro").status_code, 200)
+
+    def test_bloqueo_por_ip(self):
+        with mock.patch.dict(limites.CUBETAS, {"ip": (3, 60)}):
+            for n in range(3):
+                self.entrar(username=f"usuario{n}")
+            self.assertEqual(self.entrar(username="usuario9").status_code, 429)
+            self.assertEqual(self.entrar(username="usuario9", ip="10.0.0.2").status_code, 200)
+
+    def test_fichas_se_recuperan(self):
+        capacidad, recarga = limites.CUBETAS["usuario"]
+        ahora = time_module.time()
+        with mock.patch.object(limites.time, "time", return_value=ahora):
+            for _ in range(capacidad):
+                self.entrar()
+            self.assertEqual(self.entrar().status_code, 429)
+        with mock.patch.object(limites.time, "time", return_value=ahora + recarga):
+            self.assertEqual(self.entrar().status_code, 200)
+            self.assertEqual(self.entrar().status_code, 429)
+
+    def test_login_correcto_reinicia_al_usuario(self):
+        capacidad, _ = limites.CUBETAS["usuario"]
+        for _ in range(capacidad - 1):
+            self.entrar()
+        self.assertEqual(self.entrar(password="clave-segura-123").status_code, 302)
+        self.client.logout()
+        for _ in range(capacidad):
+            self.assertEqual(self.entrar().status_code, 200)
+
+    def test_ip_detras_de_proxies(self):
+        request = RequestFactory().get("/", REMOTE_ADDR="10.0.0.9", HTTP_X_FORWARDED_FOR="1.2.3.4, 5.6.7.8, 10.0.0.8")
+        self.assertEqual(limites.ip_cliente(request), "10.0.0.9")
+        with mock.patch.object(limites, "PROXIES", 2):
+            self.assertEqual(limites.ip_cliente(request), "5.6.7.8")
+
+
+class DirectorioMiembrosTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dueno = User.objects.create_user("dueno", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Coro", propietario=cls.dueno)
+        cls.nombres = ["ana", "andres", "beto", "carla", "carlos", "dani", "elena"]
+        cls.comunidad.miembros.add(*[User.objects.create_user(n, password="clave-segura-123") for n in cls.nombres])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.dueno)
+        self.url = reverse("comunidad_miembros", args=[self.comunidad.pk])
+
+    def usernames(self, resp):
+        return [u.username for u in resp.context["miembros"]]
+
+    def test_username_copiado_en_la_tabla_intermedia(self):
+        self.assertEqual(
+            sorted(Miembro.objects.filter(comunidad=self.comunidad).values_list("username", flat=True)), self.nombres
+        )
+        nueva = Comunidad.objects.create(nombre="Teatro", propietario=self.dueno)
+        ana = User.objects.get(username="ana")
+        ana.miembro_de.add(nueva)
+        self.assertEqual(Miembro.objects.get(comunidad=nueva).username, "ana")
+
+        ana.username = "anabel"
+        ana.save()
+        self.assertEqual(set(Miembro.objects.filter(user=ana).values_list("username", flat=True)), {"anabel"})
+        # Guardar solo last_login (cada login) no toca la tabla intermedia
+        with self.assertNumQueries(1):
+            ana.save(update_fields=["last_login"])
+
+    def test_recorre_todas_las_paginas_con_consultas_constantes(self):
+        vistos, params = [], {"page_size": 3}
+        while True:
+            with self.assertNumQueries(4):  # sesión, usuario, comunidad y la página
+                resp = self.client.get(self.url, params)
+            vistos += self.usernames(resp)
+            self.assertEqual(resp.context["total"], len(self.nombres))
+            if resp.context["siguiente"] is None:
+                break
+            params["after"] = resp.context["siguiente"]
+        self.assertEqual(vistos, self.nombres)
+
+    def test_busqueda_por_prefijo_con_total_en_cache(self):
+        resp = self.client.get(self.url, {"q": "car", "page_size": 1})
+        self.assertEqual(self.usernames(resp), ["carla"])
+        self.assertEqual(resp.context["total"], 2)
+        self.assertContains(resp, "2 miembros empiezan por «car»")
+        resp = self.client.get(self.url, {"q": "car", "page_size": 1, "after": resp.context["siguiente"]})
+        self.assertEqual(self.usernames(resp), ["carlos"])
+        self.assertIsNone(resp.context["siguiente"])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(directorio.total(self.comunidad, "car"), 2)
+        # username__startswith distingue mayúsculas (salvo en SQLite): "Car"
+        # no reutiliza el total de "car"
+        esperado = Miembro.objects.filter(comunidad=self.comunidad, username__startswith="Car").count()
+        with self.assertNumQueries(1):
+            self.assertEqual(directorio.total(self.comunidad, "Car"), esperado)
+        self.assertEqual(self.usernames(self.client.get(self.url, {"q": "zz"})), [])
+
+    def test_cursor_invalido_empieza_desde_el_principio(self):
+        self.assertEqual(self.usernames(self.client.get(self.url, {"after": "%%%"}))[:2], ["ana", "andres"])
+        self.assertEqual(directorio.decodificar_cursor(directorio.codificar_cursor("ñandú")), "ñandú")
+
+    async def test_vista_async(self):
+        await self.async_client.aforce_login(self.dueno)
+        with self.settings(ROOT_URLCONF=__name__):
+            resp = await self.async_client.get(self.url, {"q": "an"})
+        self.assertEqual(self.usernames(resp), ["ana", "andres"])
+        self.assertEqual(resp.context["total"], 2)
+
+
+class AutocompletarComunidadTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rosa", password="clave-segura-123")
+        otro = User.objects.create_user("tomas", password="clave-segura-123")
+        cls.propia = Comunidad.objects.create(nombre="Ajedrez club", propietario=cls.user)
+        cls.miembro = Comunidad.objects.create(nombre="Ajedrez rápido", propietario=otro)
+        cls.ajena = Comunidad.objects.create(nombre="Ajedrez ajeno", propietario=otro)
+        cls.otra = Comunidad.objects.create(nombre="Baloncesto", propietario=otro)
+        for c in (cls.miembro, cls.otra):
+            c.miembros.add(cls.user)
+        # Propietario y además miembro: el UNION no la repite
+        cls.propia.miembros.add(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def sugerencias(self, q):
+        resp = self.client.get(reverse("api_comunidades_autocompletar"), {"q": q})
+        self.assertEqual(resp.status_code, 200)
+        return [c["nombre"] for c in resp.json()["resultados"]]
+
+    def test_union_de_propias_y_de_miembro_por_prefijo(self):
+        self.assertEqual(self.sugerencias("AJE"), ["Ajedrez club", "Ajedrez rápido"])
+        self.assertEqual(self.sugerencias(""), ["Ajedrez club", "Ajedrez rápido", "Baloncesto"])
+        self.assertEqual(self.sugerencias("x"), [])
+        with mock.patch.object(membresias, "SUGERENCIAS", 1):
+            self.assertEqual(membresias.sugerencias(self.user, "b"), [(self.otra.pk, "Baloncesto")])
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("api_comunidades_autocompletar")).status_code, 401)
+
+    def test_cache_por_usuario_invalidada_al_unirse(self):
+        self.sugerencias("aje")
+        with self.assertNumQueries(2):  # sesión y usuario
+            self.assertEqual(self.sugerencias("aje"), ["Ajedrez club", "Ajedrez rápido"])
+        self.ajena.miembros.add(self.user)
+        self.assertEqual(self.sugerencias("aje"), ["Ajedrez ajeno", "Ajedrez club", "Ajedrez rápido"])
+
+    def test_formulario_sin_lista_de_comunidades(self):
+        resp = self.client.get(reverse("evento_crear"))
+        self.assertNotContains(resp, "<option value=\"%d\"" % self.propia.pk)
+        self.assertContains(resp, reverse("api_comunidades_autocompletar"))
+
+        resp = self.client.get(reverse("evento_crear_en_comunidad", args=[self.miembro.pk]))
+        self.assertContains(resp, 'value="Ajedrez rápido"')
+
+    def test_validacion_con_una_comprobacion_de_membresia(self):
+        datos = {
+            "titulo": "Simultáneas", "fecha": date.today().isoformat(),
+            "hora_inicio": "10:00", "hora_fin": "11:00", "tipo": "otro",
+        }
+        membresias.comunidades_de(self.user)
+        with self.assertNumQueries(2):  # la comunidad por pk y la validación del ForeignKey del modelo
+            form = EventForm({**datos, "comunidad": self.miembro.pk}, user=self.user)
+            self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data["comunidad"], self.miembro)
+
+        with self.assertNumQueries(0):
+            self.assertFalse(EventForm({**datos, "comunidad": self.ajena.pk}, user=self.user).is_valid())
+        self.assertFalse(EventForm({**datos, "comunidad": "x"}, user=self.user).is_valid())
+        self.assertFalse(EventForm({**datos, "comunidad": self.propia.pk}).is_valid())
+        self.assertTrue(EventForm(datos, user=self.user).is_valid())
+
+        resp = self.client.post(reverse("evento_crear"), {**datos, "comunidad": self.ajena.pk})
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(Evento.objects.exists())
+        self.client.post(reverse("evento_crear"), {**datos, "comunidad": self.propia.pk})
+        self.assertEqual(Evento.objects.get().comunidad, self.propia)
+
+
+class RecurrenciaTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("vera", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Coro", propietario=cls.user)
+
+    def serie(self, regla, fecha=date(2026, 1, 1), hora=None, titulo="Ensayo"):
+        return Evento.objects.create(titulo=titulo, fecha=fecha, hora=hora, recurrencia=regla, comunidad=self.comunidad)
+
+    def test_parsear_normaliza_y_rechaza(self):
+        regla = recurrencia.parsear("rrule:byday=th,tu;freq=weekly;until=20271231")
+        self.assertEqual(str(regla), "FREQ=WEEKLY;BYDAY=TU,TH;UNTIL=20271231")
+        for texto in (
+            "FREQ=YEARLY", "FREQ=DAILY;BYDAY=MO", "FREQ=DAILY;COUNT=2;UNTIL=20270101",
+            "FREQ=DAILY;COUNT=0", "FREQ=WEEKLY;BYDAY=XX", "FREQ=DAILY;UNTIL=2027", "INTERVAL=2",
+            "FREQ=DAILY;COUNT=²", "FREQ=DAILY;INTERVAL=٣",
+        ):
+            with self.assertRaises(recurrencia.ReglaInvalida, msg=texto):
+                recurrencia.parsear(texto)
+
+    def test_fechas_solo_de_la_ventana(self):
+        self.assertEqual(
+            list(recurrencia.fechas("FREQ=WEEKLY;BYDAY=TU,TH;COUNT=5", date(2026, 1, 1))),
+            [date(2026, 1, 1), date(2026, 1, 6), date(2026, 1, 8), date(2026, 1, 13), date(2026, 1, 15)],
+        )
+        self.assertEqual(
+            list(recurrencia.fechas("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH", date(2026, 1, 1), date(2026, 3, 1), date(2026, 3, 20))),
+            [date(2026, 3, 9), date(2026, 3, 12)],
+        )
+        # Los meses sin día 31 no tienen ocurrencia
+        self.assertEqual(
+            list(recurrencia.fechas("FREQ=MONTHLY;COUNT=3", date(2026, 1, 31))),
+            [date(2026, 1, 31), date(2026, 3, 31), date(2026, 5, 31)],
+        )
+        # Sin fin: salta directamente a la ventana pedida
+        self.assertEqual(
+            list(recurrencia.fechas("FREQ=DAILY", date(2026, 1, 1), date(9000, 1, 1), date(9000, 1, 2))),
+            [date(9000, 1, 1), date(9000, 1, 2)],
+        )
+
+    def test_recurrencia_hasta_al_guardar(self):
+        self.assertEqual(self.serie("FREQ=MONTHLY;COUNT=3", date(2026, 1, 31)).recurrencia_hasta, date(2026, 5, 31))
+        self.assertEqual(self.serie("FREQ=DAILY").recurrencia_hasta, recurrencia.SIN_FIN)
+        evento = self.serie("FREQ=DAILY;UNTIL=20260110")
+        self.assertEqual(evento.recurrencia_hasta, date(2026, 1, 10))
+        self.assertEqual(evento.recurrencia_legible, "Cada día hasta 10/01/2026")
+        evento.recurrencia = ""
+        evento.save()
+        self.assertIsNone(Evento.objects.get(pk=evento.pk).recurrencia_hasta)
+
+    def test_lista_mezcla_ocurrencias_con_cursor(self):
+        self.serie("FREQ=DAILY;INTERVAL=2;COUNT=4", hora=time(18))
+        for dia in (2, 4, 20):
+            Evento.objects.create(titulo=f"Simple {dia}", fecha=date(2026, 1, dia), comunidad=self.comunidad)
+        vistos, after = [], None
+        while True:
+            filas, after = paginacion.paginar_con_series(Evento.objects.all(), after=after, page_size=3)
+            vistos += [(e.fecha.day, e.titulo) for e in filas]
+            if not after:
+                break
+        self.assertEqual(vistos, [
+            (1, "Ensayo"), (2, "Simple 2"), (3, "Ensayo"), (4, "Simple 4"),
+            (5, "Ensayo"), (7, "Ensayo"), (20, "Simple 20"),
+        ])
+
+        resp = self.client.get(reverse("eventos_list"))
+        self.assertEqual(resp.status_code, 302)
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("eventos_list"))
+        self.assertContains(resp, "Se repite", count=4)
+        self.assertContains(resp, "05/01/2026")
+
+    def test_lista_y_feed_leen_la_ventana_materializada(self):
+        hoy = date.today()
+        for i in range(5):
+            self.serie("FREQ=DAILY;COUNT=10", hoy - timedelta(days=i), hora=time(8 + i), titulo=f"Serie {i}")
+        for dia in range(0, 12, 3):
+            Evento.objects.create(titulo=f"Simple {dia}", fecha=hoy + timedelta(days=dia), hora=time(9), comunidad=self.comunidad)
+        socio = User.objects.create_user("wanda")
+        self.comunidad.miembros.add(socio)
+
+        def recorrer(comunidad_id=None):
+            vistos, after = [], None
+            while True:
+                filas, after = paginacion.paginar_con_series(Evento.objects.all(), after=after, page_size=4, comunidad_id=comunidad_id)
+                vistos += [(e.fecha, e.hora, e.titulo) for e in filas]
+                if not after:
+                    return vistos
+
+        def muro():
+            vistos, after = [], None
+            while True:
+                filas, after = feed.pagina(User.objects.get(pk=socio.pk), after=after, page_size=4)
+                vistos += [(f["fecha"], f["hora"], f["id"]) for f in filas]
+                if not after:
+                    return vistos
+
+        al_vuelo, muro_al_vuelo = recorrer(), muro()
+        self.assertEqual(len(al_vuelo), 54)
+        # La ventana acaba antes que las series: el resto se genera al vuelo
+        with self.captureOnCommitCallbacks(execute=True):
+            recurrencia.refrescar(hasta=hoy + timedelta(days=3))
+        self.assertEqual(recorrer(), al_vuelo)
+        self.assertEqual(recorrer(self.comunidad.pk), al_vuelo)
+        self.assertEqual(muro(), muro_al_vuelo)
+
+        # Una página dentro de la ventana no mira las series
+        with CaptureQueriesContext(connection) as ctx:
+            filas, _ = paginacion.paginar_con_series(Evento.objects.all(), page_size=4)
+        self.assertEqual([e.titulo for e in filas], ["Serie 4", "Serie 3", "Serie 4", "Serie 2"])
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertIn("appEventWall_ocurrencia", ctx.captured_queries[1]["sql"])
+
+    def test_calendario_al_vuelo_y_materializado(self):
+        serie = self.serie("FREQ=WEEKLY;BYDAY=MO", date(2026, 3, 2), time(19))
+        Evento.objects.create(titulo="Concierto", fecha=date(2026, 3, 9), hora=time(20), comunidad=self.comunidad)
+        esperado = {
+            date(2026, 3, d): ["Ensayo"] for d in (2, 16, 23, 30)
+        } | {date(2026, 3, 9): ["Ensayo", "Concierto"]}
+
+        def titulos():
+            dias = calendario.por_dia([self.comunidad.pk], date(2026, 3, 1), date(2026, 3, 31))
+            return {f: [e["titulo"] for e in eventos] for f, eventos in dias.items()}
+
+        self.assertEqual(titulos(), esperado)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(recurrencia.refrescar(date(2026, 3, 1), date(2026, 4, 30)), 9)
+        self.assertEqual(recurrencia.ventana(), (date(2026, 3, 1), date(2026, 4, 30)))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(titulos(), esperado)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertTrue(any("appEventWall_ocurrencia" in q["sql"] for q in ctx.captured_queries))
+
+        # Al editar la serie se rehacen solo sus filas
+        serie.recurrencia = "FREQ=WEEKLY;BYDAY=MO;COUNT=2"
+        serie.save()
+        self.assertEqual(list(serie.ocurrencias.values_list("fecha", flat=True)), [date(2026, 3, 2), date(2026, 3, 9)])
+        serie.fecha = date(2026, 3, 30)
+        serie.save()
+        self.assertEqual(list(serie.ocurrencias.values_list("fecha", flat=True)), [date(2026, 3, 30), date(2026, 4, 6)])
+
+    def test_feed_con_ocurrencias_futuras(self):
+        socio = User.objects.create_user("wally")
+        self.comunidad.miembros.add(socio)
+        hoy = date.today()
+        self.serie("FREQ=DAILY;COUNT=30", hoy - timedelta(days=10))
+        Evento.objects.create(titulo="Único", fecha=hoy + timedelta(days=1), hora=time(12), comunidad=self.comunidad)
+        filas, after = feed.pagina(User.objects.get(pk=socio.pk), page_size=3)
+        self.assertEqual([f["fecha"] - hoy for f in filas], [timedelta(0), timedelta(1), timedelta(1)])
+        self.assertIn("recurrencia", filas[0])
+        resto, after = feed.pagina(User.objects.get(pk=socio.pk), after=after, page_size=100)
+        self.assertIsNone(after)
+        self.assertEqual(len(resto), 18)
+
+    def test_formulario_valida_la_regla(self):
+        datos = {
+            "titulo": "Taller", "fecha": f"{date.today() + timedelta(days=7):%d/%m/%Y}", "hora_inicio": "18:00", "hora_fin": "19:00",
+            "tipo": Evento.TIPO_CHOICES[0][0],
+        }
+        form = EventForm(datos | {"recurrencia": "freq=weekly;byday=fr"}, user=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data["recurrencia"], "FREQ=WEEKLY;BYDAY=FR")
+        form = EventForm(datos | {"recurrencia": "FREQ=HOURLY"}, user=self.user)
+        self.assertFalse(form.is_valid())
+        self.assertIn("recurrencia", form.errors)
+        # UNTIL antes de la fecha, o una regla que no da ninguna fecha
+        fecha = date.today() + timedelta(days=7)
+        otro_dia = recurrencia.DIAS_SEMANA[(fecha.weekday() + 1) % 7]
+        for regla in (f"FREQ=DAILY;UNTIL={fecha - timedelta(days=1):%Y%m%d}", f"FREQ=WEEKLY;BYDAY={otro_dia};UNTIL={fecha:%Y%m%d}"):
+            form = EventForm(datos | {"recurrencia": regla}, user=self.user)
+            self.assertFalse(form.is_valid(), regla)
+            self.assertIn("recurrencia", form.errors)
+
+    def test_ics_con_rrule(self):
+        self.serie("FREQ=WEEKLY;UNTIL=20261231", hora=time(9))
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("comunidad_eventos_ics", args=[self.comunidad.pk]))
+        self.assertIn("RRULE:FREQ=WEEKLY;UNTIL=20261231T235959\r\n", b"".join(resp.streaming_content).decode())
+
+
+class ConflictosTests(EventWallTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("yago", password="clave-segura-123")
+        cls.comunidad = Comunidad.objects.create(nombre="Teatro", propietario=cls.user)
+        cls.otra = Comunidad.objects.create(nombre="Danza", propietario=cls.user)
+        cls.dia = date.today() + timedelta(days=3)
+
+    def evento(self, titulo, hora, hora_fin=None, lugar="Aula Magna", dia=None, comunidad=None, **kwargs):
+        return Evento.objects.create(
+            titulo=titulo, fecha=dia or self.dia, hora=hora, hora_fin=hora_fin, lugar=lugar,
+            comunidad=comunidad or self.comunidad, **kwargs,
+        )
+
+    def test_clave_lugar(self):
+        self.assertEqual(conflictos.clave_lugar("  Aula  Mágna "), "aula magna")
+        # Los nombres que no son latinos no se pierden
+        self.assertEqual(conflictos.clave_lugar("Аудитория 1"), "аудитория 1")
+        self.assertNotEqual(conflictos.clave_lugar("Аудитория 1"), conflictos.clave_lugar("Зал 1"))
+        self.assertEqual(conflictos.clave_lugar("Йога 教室"), conflictos.clave_lugar("йога  教室"))
+        self.assertEqual(self.evento("Ensayo", time(10), lugar="SALÓN  de actos").lugar_clave, "salon de actos")
+
+    def test_solapados_por_rango_del_indice(self):
+        self.evento("Diez", time(10), time(11))
+        self.evento("Once", time(11), time(12))
+        self.evento("Sin fin", time(10, 30))  # dura DURACION (60 minutos)
+        self.evento("Otro día", time(10), time(12), dia=self.dia + timedelta(days=1))
+        self.evento("Otro lugar", time(10), time(12), lugar="Patio")
+        self.evento("Todo el día", None)
+
+        def titulos(*horas, **kwargs):
+            return [e.titulo for e in conflictos.solapados("aula mágna", self.dia, *horas, **kwargs)]
+
+        self.assertEqual(titulos(time(10, 45), time(11, 15)), ["Diez", "Sin fin", "Once"])
+        # Acabar cuando empieza el otro no es un choque
+        self.assertEqual(titulos(time(9), time(10)), [])
+        self.assertEqual(titulos(time(11, 30)), ["Once"])
+        diez = Evento.objects.get(titulo="Diez")
+        self.assertEqual(titulos(time(10), time(10, 15), excluir=diez.pk), [])
+        self.assertEqual(conflictos.solapados("", self.dia, time(10)), [])
+
+        qs = Evento.objects.filter(lugar_clave="aula magna", fecha=self.dia, hora__lt=time(11))
+        self.assertIn("evento_lugar_fecha_hora_idx", qs.explain())
+
+    def test_solapados_con_series(self):
+        martes = self.dia + timedelta(days=(1 - self.dia.weekday()) % 7)
+        self.evento("Clase", time(18), time(20), dia=martes, recurrencia="FREQ=WEEKLY;BYDAY=TU")
+        choques = conflictos.solapados("Aula Magna", martes + timedelta(days=14), time(19), time(19, 30))
+        self.assertEqual([(e.titulo, e.fecha) for e in choques], [("Clase", martes + timedelta(days=14))])
+        self.assertEqual(conflictos.solapados("Aula Magna", martes + timedelta(days=1), time(19)), [])
+
+    def test_formulario_guarda_hora_fin_y_avisa_del_choque(self):
+        datos = {
+            "titulo": "Estreno", "fecha": f"{self.dia:%d/%m/%Y}", "hora_inicio": "20:00", "hora_fin": "22:00",
+            "lugar": "Aula Magna", "tipo": "otro", "comunidad": self.comunidad.pk,
+        }
+        form = EventForm(datos, user=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        evento = form.save()
+        self.assertEqual((evento.hora, evento.hora_fin), (time(20), time(22)))
+        self.assertEqual(EventForm(instance=evento, user=self.user).initial["hora_fin"], time(22))
+
+        form = EventForm(datos | {"titulo": "Pisado", "hora_inicio": "21:30", "hora_fin": "23:00"}, user=self.user)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors["lugar"], ["Aula Magna está ocupado de 20:00 a 22:00 por «Estreno»."])
+        # Editar el propio evento no choca consigo mismo
+        form = EventForm(datos | {"hora_fin": "23:00"}, instance=evento, user=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        # Otra comunidad (o ninguna) no se bloquea: lo informa check_conflicts
+        for comunidad in (self.otra.pk, ""):
+            form = EventForm(datos | {"titulo": "Ajeno", "comunidad": comunidad}, user=self.user)
+            self.assertTrue(form.is_valid(), form.errors)
+
+    def test_formulario_mira_todas_las_fechas_de_la_serie(self):
+        self.evento("Función", time(20), time(22), dia=self.dia + timedelta(days=14))
+        datos = {
+            "titulo": "Ensayos", "fecha": f"{self.dia:%d/%m/%Y}", "hora_inicio": "21:00", "hora_fin": "22:30",
+            "lugar": "Aula Magna", "tipo": "otro", "comunidad": self.comunidad.pk,
+        }
+        form = EventForm(datos | {"recurrencia": "FREQ=WEEKLY;COUNT=4"}, user=self.user)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors["lugar"], [
+            f"Aula Magna está ocupado el {self.dia + timedelta(days=14):%d/%m/%Y} de 20:00 a 22:00 por «Función»."
+        ])
+        self.assertTrue(EventForm(datos | {"recurrencia": "FREQ=WEEKLY;COUNT=2"}, user=self.user).is_valid())
+        self.assertTrue(EventForm(datos | {"recurrencia": "FREQ=DAILY;INTERVAL=5;COUNT=4"}, user=self.user).is_valid())
+
+    def test_barrido_igual_que_comparar_todos_con_todos(self):
+        azar = random.Random(7)
+        for i in range(150):
+            hora = time(azar.randrange(8, 20), azar.choice((0, 15, 30, 45)))
+            fin = None if i % 5 == 0 else time(hora.hour + azar.randrange(1, 4), hora.minute)
+            self.evento(
+                f"E{i}", hora, fin, lugar=azar.choice(("Aula Magna", "aula magna", "Patio", "Sala 2")),
+                dia=self.dia + timedelta(days=azar.randrange(4)), comunidad=azar.choice((self.comunidad, self.otra)),
+            )
+        self.evento("Serie", time(12), time(13), lugar="Patio", recurrencia="FREQ=DAILY;COUNT=4")
+
+        eventos = [
+            (e.lugar_clave, f.isoformat(), *conflictos.intervalo(e.hora, e.hora_fin), e.pk, e.comunidad_id)
+            for e in Evento.objects.all()
+            for f in (recurrencia.fechas(e.recurrencia, e.fecha) if e.recurrencia else [e.fecha])
+        ]
+        esperados = {
+            frozenset((a[4], b[4])) for i, a in enumerate(eventos) for b in eventos[i + 1:]
+            if a[:2] == b[:2] and a[2] < b[3] and b[2] < a[3]
+        }
+        pares = list(conflictos.conflictos(chunk_size=7))
+        self.assertEqual(len(pares), len(esperados))
+        self.assertEqual({frozenset((a[4], b[4])) for a, b in pares}, esperados)
+        self.assertTrue(any("Serie" in (a[7], b[7]) for a, b in pares))
+
+        solo_danza = {frozenset((a[4], b[4])) for a, b in conflictos.conflictos([self.otra.pk])}
+        comunidad = dict(Evento.objects.values_list("pk", "comunidad_id"))
+        self.assertEqual(solo_danza, {p for p in esperados if self.otra.pk in {comunidad[pk] for pk in p}})
+
+    def test_informe_check_conflicts(self):
+        self.evento("Diez", time(10), time(11))
+        self.evento("Y media", time(10, 30), time(12), comunidad=self.otra)
+        salida = StringIO()
+        call_command("check_conflicts", stdout=salida)
+        self.assertIn(f"{self.dia.isoformat()} Aula Magna: «Diez»", salida.getvalue())
+        self.assertIn("choca con «Y media»", salida.getvalue())
+        self.assertIn("Conflictos: 1", salida.getvalue())
+        with self.assertRaises(SystemExit):
+            call_command("check_conflicts", check=True, stdout=StringIO())
+        call_command("check_conflicts", hasta=(self.dia - timedelta(days=1)).isoformat(), check=True, stdout=salida)
+        self.assertIn("Conflictos: 0", salida.getvalue())
+
+
+class PresupuestoConsultasMixin:
+    """
+    Harness reutilizable: siembra 'n' comunidades/eventos y comprueba que
+    cada vista se queda dentro de un número fijo de consultas, sin importar n.
+    Las subclases definen 'n'; para el dataset de 100k usar
+    EVENTWALL_TEST_GRANDE=1 (tarda más, pensado para CI nocturno).
+    """
+
+    n = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("presupuesto", password="clave-segura-123")
+        otro = User.objects.create_user("otro", password="clave-segura-123")
+        cls.propia = Comunidad.objects.create(nombre="Propia", propietario=cls.user)
+        Comunidad.objects.bulk_create(
+            Comunidad(nombre=f"Comunidad {i}", descripcion="busqueda", propietario=otro)
+            for i in range(cls.n)
+        )
+        # El usuario es miembro de la mitad de las comunidades
+        Miembro = Comunidad.miembros.through
+        Miembro.objects.bulk_create(
+            Miembro(comunidad_id=pk, user_id=cls.user.pk)
+            for pk in Comunidad.objects.filter(propietario=otro).values_list("pk", flat=True)[: cls.n // 2]
+        )
+        Evento.objects.bulk_create(
+            Evento(
+                titulo=f"Evento {i}",
+                fecha=date.today() + timedelta(days=i % 365),
+                hora=time(i % 24, 0),
+                tipo="taller",
+                comunidad=cls.propia,
+                creado_por=otro,
+            )
+            for i in range(cls.n)
+        )
+        # bulk_create no dispara señales: reindexamos a mano
+        backend = obtener_backend()
+        backend.reconstruir(Comunidad)
+        backend.reconstruir(Evento)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def assertPresupuesto(self, presupuesto, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url, data)
+        self.assertEqual(resp.status_code, 200)
+        consultas = "\n".join(q["sql"] for q in ctx.captured_queries)
+        self.assertLessEqual(
+            len(ctx), presupuesto,
+            f"{url} hizo {len(ctx)} consultas con n={self.n} (presupuesto {presupuesto}):\n{consultas}",
+        )
+        return resp
+
+    # sesión + usuario + consultas propias de la vista (con la caché fría);
+    # las listas con cursor hacen una más para las series (recurrencia.py)
+    def test_eventos_list(self):
+        self.assertPresupuesto(4, reverse("eventos_list"), {"page_size": 200})
+
+    def test_comunidad_detalle(self):
+        self.assertPresupuesto(5, reverse("comunidad_detalle", args=[self.propia.pk]), {"page_size": 200})
+
+    def test_comunidades_list(self):
+        resp = self.assertPresupuesto(6, reverse("Comunidades"), {"q": "busqueda"})
+        self.assertEqual(len(resp.context["resultados"]), min(self.n, LIMITE_RESULTADOS))
+
+
+class PresupuestoConsultas10Tests(PresupuestoConsultasMixin, EventWallTestCase):
+    n = 10
+
+
+class PresupuestoConsultas1kTests(PresupuestoConsultasMixin, EventWallTestCase):
+    n = 1000
+
+
+if os.environ.get("EVENTWALL_TEST_GRANDE"):
+    class PresupuestoConsultas100kTests(PresupuestoConsultasMixin, EventWallTestCase):
+        n = 100_000
+
+
+# urlconf de VistasAsyncTests: las rutas de siempre con las vistas de views_async
+urlpatterns = con_vistas_async(urls_proyecto.urlpatterns)
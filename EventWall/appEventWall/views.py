@@ -1,24 +1,39 @@
+from datetime import date, timedelta
+
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
+from django.template.loader import render_to_string
 from django.contrib.auth.forms import AuthenticationForm
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
+from django.views.decorators.http import condition
 
-from .forms import CustomUserCreationForm, EventForm, ComunidadForm
-from .models import Profile, Evento, Comunidad
+from .forms import CustomUserCreationForm, EventForm, ComunidadForm, FotoPerfilForm
+from .models import Evento, Comunidad, Profile
+from .paginacion import paginar_con_series, obtener_tamano_pagina
+from .busqueda import buscar_comunidades, buscar_eventos, LIMITE_RESULTADOS
+from .membresias import marcar_membresia
+from . import cache_muro, calendario, directorio, en_vivo, exportacion, feed, limites, miniaturas, notificaciones, tareas
 
 
 def login_view(request):
     if request.method == "POST":
+        # Límite por IP y por usuario antes de tocar el hasher (ver limites.py)
+        cubetas = [("ip", limites.ip_cliente(request)), ("usuario", request.POST.get("username", ""))]
+        espera = limites.espera(cubetas)
+        if espera:
+            # Formulario sin datos: validarlo (o mostrar form.errors) autenticaría
+            return render(request, "Login.html", {"form": AuthenticationForm(), "espera": espera}, status=429)
         form = AuthenticationForm(request, data=request.POST)
+        # is_valid() ya llama a authenticate(): no volver a comprobar la contraseña
         if form.is_valid():
-            username = form.cleaned_data.get("username")
-            password = form.cleaned_data.get("password")
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                login(request, user)
-                return redirect("home")
+            limites.reiniciar("usuario", form.cleaned_data["username"])
+            login(request, form.get_user())
+            return redirect("home")
+        limites.gastar(cubetas)
     else:
         form = AuthenticationForm()
     return render(request, "Login.html", {"form": form})
@@ -44,27 +59,79 @@ def logout_view(request):
 
 @login_required
 def home(request):
-    return render(request, "home.html")
+    # Mi muro: próximos eventos de todas mis comunidades (ver feed.py)
+    filas, siguiente = feed.pagina(request.user, request.GET.get("after"), request.GET.get("page_size"))
+    eventos = cache_muro.tarjetas(
+        "fragmentos/evento_lista.html",
+        [(f["id"], None, f["comunidad_id"], f["fecha"] if f.get("recurrencia") else None) for f in filas],
+    )
+    return render(request, "home.html", {"eventos": eventos, "siguiente": siguiente})
 
 
 @login_required
 def perfil_view(request):
-    profile, created = Profile.objects.get_or_create(user=request.user)
-    return render(request, "perfil.html", {"profile": profile})
+    profile = request.user.profile
+    form = FotoPerfilForm(request.POST or None, request.FILES or None, instance=profile)
+    if request.method == "POST" and form.is_valid():
+        # Las miniaturas se generan en segundo plano (signals.py)
+        form.save()
+        messages.success(request, "Foto de perfil actualizada.")
+        return redirect("perfil")
+    return render(request, "perfil.html", {"profile": profile, "form": form})
+
+
+# Segundos que el navegador guarda la redirección a una miniatura (?v=)
+MINIATURA_MAX_AGE = 30 * 24 * 3600
+
+
+@login_required
+def miniatura_perfil(request, user_id, tamano, formato):
+    """Genera la miniatura si aún no existe (ver miniaturas.py) y redirige al archivo."""
+    if tamano not in miniaturas.TAMANOS or formato not in miniaturas.FORMATOS:
+        raise Http404
+    nombre = Profile.objects.filter(user_id=user_id).values_list("foto", flat=True).first()
+    if not nombre:
+        raise Http404
+    try:
+        destino = miniaturas.generar(nombre, tamano, formato)
+    except (OSError, miniaturas.ImagenDemasiadoGrande):
+        # Original borrado o que no es una imagen válida
+        raise Http404
+    response = redirect(default_storage.url(destino))
+    if request.GET.get("v") == miniaturas.clave(nombre):
+        # Con la clave de la foto actual, la URL siempre lleva al mismo archivo
+        response["Cache-Control"] = f"private, max-age={MINIATURA_MAX_AGE}"
+    return response
 
 
 # ------------------- EVENTOS -------------------
 
 @login_required
 def eventos_list(request):
-    eventos = Evento.objects.order_by("fecha", "hora")
-    return render(request, "eventos_list.html", {"eventos": eventos})
+    q = request.GET.get("q", "").strip()
+    if q:
+        # Con búsqueda: los más relevantes primero, sin cursor ni lista cacheada
+        tamano = obtener_tamano_pagina(request.GET.get("page_size"))
+        encontrados = list(buscar_eventos(q).select_related("comunidad")[:tamano])
+        filas = [cache_muro.fila(e) for e in encontrados]
+        cargados, siguiente = {e.id: e for e in encontrados}, None
+    else:
+        after, page_size = request.GET.get("after"), request.GET.get("page_size")
+        filas, siguiente, cargados = cache_muro.pagina(
+            "todos", after, page_size,
+            lambda: paginar_con_series(Evento.objects.select_related("comunidad"), after=after, page_size=page_size),
+        )
+    eventos = cache_muro.tarjetas("fragmentos/evento_lista.html", filas, cargados)
+    return render(request, "eventos_list.html", {"eventos": eventos, "siguiente": siguiente, "query": q})
 
 
 @login_required
 def evento_detalle(request, pk):
-    evento = get_object_or_404(Evento, pk=pk)
-    return render(request, "evento_detalle.html", {"evento": evento})
+    # La página no depende del usuario: se cachea entera por versión del evento
+    html = cache_muro.detalle(pk, lambda: render_to_string(
+        "evento_detalle.html", {"evento": get_object_or_404(Evento, pk=pk)}, request
+    ))
+    return HttpResponse(html)
 
 
 @login_required
@@ -74,9 +141,7 @@ def evento_crear(request, comunidad_id=None):
     if comunidad_id:
         comunidad = get_object_or_404(Comunidad, id=comunidad_id)
         # permiso: solo propietario o miembro
-        is_propietario = comunidad.propietario == request.user
-        is_miembro = comunidad.miembros.filter(pk=request.user.pk).exists() if hasattr(comunidad, "miembros") else False
-        if not (is_propietario or is_miembro):
+        if not comunidad.es_miembro(request.user):
             messages.error(request, "No tienes permiso para crear eventos en esta comunidad.")
             return redirect('comunidad_detalle', pk=comunidad.id)
         initial['comunidad'] = comunidad
@@ -93,15 +158,12 @@ def evento_crear(request, comunidad_id=None):
 
             evento.creado_por = request.user
 
-            # seguridad: si por alguna razón comunidad está asignada en el form, comprobamos permisos
-            if evento.comunidad:
-                is_propietario = evento.comunidad.propietario == request.user
-                is_miembro = evento.comunidad.miembros.filter(pk=request.user.pk).exists() if hasattr(evento.comunidad, "miembros") else False
-                if not (is_propietario or is_miembro):
-                    messages.error(request, "No puedes publicar en esa comunidad.")
-                    return redirect('eventos_list')
-
+            # La comunidad del formulario ya se validó contra las del usuario
+            # (ComunidadDelUsuarioField) y la de la URL, arriba
             evento.save()
+            if evento.comunidad_id:
+                # Avisos a los miembros fuera de la petición (ver notificaciones.py)
+                tareas.encolar_al_confirmar(notificaciones.notificar_evento, evento.pk)
             messages.success(request, "Evento guardado.")
             return redirect('comunidad_detalle', pk=evento.comunidad.id) if evento.comunidad else redirect('eventos_list')
     else:
@@ -117,9 +179,6 @@ def evento_editar(request, pk):
         form = EventForm(request.POST, instance=evento, user=request.user)
         if form.is_valid():
             evento = form.save(commit=False)
-            if evento.comunidad and not evento.comunidad.es_miembro(request.user):
-                messages.error(request, "No tienes permiso para asociar este evento a esa comunidad.")
-                return redirect("eventos_list")
             evento.save()
             messages.success(request, "Evento actualizado.")
             return redirect("eventos_list")
@@ -143,35 +202,25 @@ def evento_eliminar(request, pk):
 def comunidades_list(request):
     q = request.GET.get("q", "").strip()
 
-    # Tus comunidades (propietario)
-    tus_comunidades_qs = Comunidad.objects.filter(propietario=request.user).order_by("-creada_en").prefetch_related("miembros")
+    # Tus comunidades (propietario). Los totales son columnas de Comunidad
+    # e is_miembro sale del set cacheado del usuario.
+    tus_comunidades = marcar_membresia(
+        list(Comunidad.objects.filter(propietario=request.user).order_by("-creada_en")),
+        request.user,
+    )
 
-    # Resultados de búsqueda: buscar en todas las comunidades (incluye tus propias)
-    resultados_qs = Comunidad.objects.none()
+    # Resultados de búsqueda (por relevancia): todas las comunidades menos las tuyas
+    resultados = []
     if q:
-        resultados_qs = (
-            Comunidad.objects.filter(
-                Q(nombre__icontains=q) | Q(descripcion__icontains=q)
-            )
-            .order_by("-creada_en")
-            .prefetch_related("miembros")
+        resultados = marcar_membresia(
+            list(
+                buscar_comunidades(q)
+                .exclude(propietario=request.user)
+                .select_related("propietario")[:LIMITE_RESULTADOS]
+            ),
+            request.user,
         )
 
-    # Convertir a listas (para poder iterar 2 veces y añadir atributos)
-    tus_comunidades = list(tus_comunidades_qs)
-    resultados_list = list(resultados_qs)
-
-    # Evitar que las comunidades que son tuyas aparezcan en "resultados"
-    tus_ids = {c.id for c in tus_comunidades}
-    resultados = [c for c in resultados_list if c.id not in tus_ids]
-
-    # Añadimos atributo booleano para plantilla (evita llamadas complejas en template)
-    for c in tus_comunidades + resultados:
-        try:
-            c.is_miembro = c.miembros.filter(pk=request.user.pk).exists()
-        except Exception:
-            c.is_miembro = False
-
     context = {
         "comunidades": tus_comunidades,
         "query": q,
@@ -199,10 +248,18 @@ def crear_comunidad_view(request):
 
 @login_required
 def comunidad_detalle(request, pk):
-    comunidad = get_object_or_404(Comunidad, pk=pk)
-    eventos = comunidad.eventos.order_by("fecha", "hora")
+    comunidad = get_object_or_404(Comunidad.objects.select_related("propietario"), pk=pk)
+    after, page_size = request.GET.get("after"), request.GET.get("page_size")
+    filas, siguiente, cargados = cache_muro.pagina(
+        f"comunidad:{comunidad.pk}", after, page_size,
+        lambda: paginar_con_series(comunidad.eventos.all(), after=after, page_size=page_size, comunidad_id=comunidad.pk),
+    )
+    eventos = cache_muro.tarjetas("fragmentos/evento_comunidad.html", filas, cargados)
     es_miembro = comunidad.es_miembro(request.user)
-    return render(request, "comunidad_detalle.html", {"comunidad": comunidad, "eventos": eventos, "es_miembro": es_miembro})
+    return render(request, "comunidad_detalle.html", {
+        "comunidad": comunidad, "eventos": eventos, "siguiente": siguiente, "es_miembro": es_miembro,
+        "en_vivo": en_vivo.disponible(request),
+    })
 
 
 @login_required
@@ -245,8 +302,15 @@ def salir_comunidad(request, pk):
 @login_required
 def comunidad_miembros(request, pk):
     comunidad = get_object_or_404(Comunidad, pk=pk)
-    miembros = comunidad.miembros.all().order_by("username") if hasattr(comunidad, "miembros") else []
-    return render(request, "comunidad_miembros.html", {"comunidad": comunidad, "miembros": miembros})
+    q = request.GET.get("q", "").strip()
+    miembros, siguiente = directorio.pagina(comunidad.pk, q, request.GET.get("after"), request.GET.get("page_size"))
+    return render(request, "comunidad_miembros.html", {
+        "comunidad": comunidad,
+        "miembros": miembros,
+        "siguiente": siguiente,
+        "query": q,
+        "total": directorio.total(comunidad, q),
+    })
 
 
 @login_required
@@ -254,7 +318,116 @@ def comunidades_buscar(request):
     q = request.GET.get("q", "").strip()
     resultados = Comunidad.objects.none()
     if q:
-        resultados = Comunidad.objects.filter(
-            Q(nombre__icontains=q) | Q(descripcion__icontains=q)
-        ).exclude(propietario=request.user).order_by("-creada_en")
-    return render(request, "comunidades_buscar.html", {"query": q, "resultados": resultados})
\ No newline at end of file
+        resultados = buscar_comunidades(q).exclude(propietario=request.user)
+    return render(request, "comunidades_buscar.html", {"query": q, "resultados": resultados})
+
+
+# ------------------- CALENDARIO -------------------
+
+@login_required
+def comunidad_calendario(request, pk, anio=None, mes=None):
+    comunidad = get_object_or_404(Comunidad, pk=pk)
+    hoy = date.today()
+    anio, mes = anio or hoy.year, mes or hoy.month
+    if not 1 <= mes <= 12 or not date.min.year < anio < date.max.year:
+        raise Http404
+    primero, ultimo = calendario.rango_mes(anio, mes)
+    dias = calendario.mes_de_comunidad(comunidad.pk, anio, mes)
+    anterior, siguiente = primero - timedelta(days=1), ultimo + timedelta(days=1)
+    return render(request, "calendario.html", {
+        "comunidad": comunidad,
+        "titulo": f"{calendario.MESES[mes - 1]} {anio}",
+        "semanas": calendario.cuadricula(primero, ultimo, dias, mes=mes),
+        "hoy": hoy,
+        "anterior": reverse("comunidad_calendario_mes", args=[pk, anterior.year, anterior.month]),
+        "siguiente": reverse("comunidad_calendario_mes", args=[pk, siguiente.year, siguiente.month]),
+    })
+
+
+@login_required
+def comunidad_semana(request, pk):
+    comunidad = get_object_or_404(Comunidad, pk=pk)
+    hoy = date.today()
+    try:
+        dia = date.fromisoformat(request.GET.get("dia", ""))
+    except ValueError:
+        dia = hoy
+    # Igual que el mes: en los años extremos 'anterior'/'siguiente' se salen de date
+    if not date.min.year < dia.year < date.max.year:
+        raise Http404
+    lunes, domingo = calendario.rango_semana(dia)
+    dias = calendario.semana_de_comunidad(comunidad.pk, dia)
+    url = reverse("comunidad_semana", args=[pk])
+    return render(request, "calendario.html", {
+        "comunidad": comunidad,
+        "titulo": f"Semana del {lunes:%d/%m/%Y} al {domingo:%d/%m/%Y}",
+        "semanas": calendario.cuadricula(lunes, domingo, dias),
+        "hoy": hoy,
+        "anterior": f"{url}?dia={lunes - timedelta(days=7)}",
+        "siguiente": f"{url}?dia={lunes + timedelta(days=7)}",
+    })
+
+
+@login_required
+def eventos_proximos(request):
+    dias = calendario.obtener_dias(request.GET.get("dias"))
+    return render(request, "proximos.html", {
+        "dias": sorted(calendario.proximos(request.user, dias).items()),
+        "num_dias": dias,
+    })
+
+
+# Notificaciones que se muestran (las más recientes)
+LIMITE_NOTIFICACIONES = 50
+
+
+@login_required
+def notificaciones_view(request):
+    recientes = list(
+        request.user.notificaciones.select_related("evento", "comunidad").order_by("-creada_en", "-id")[:LIMITE_NOTIFICACIONES]
+    )
+    # Se marcan leídas al verlas; la plantilla aún resalta las que eran nuevas
+    request.user.notificaciones.filter(leida=False, pk__in=[n.pk for n in recientes]).update(leida=True)
+    return render(request, "notificaciones.html", {"notificaciones": recientes})
+
+
+# ------------------- EXPORTACIÓN -------------------
+
+def _comunidad_a_exportar(request, pk):
+    # etag_func y la vista necesitan la comunidad: la buscamos una sola vez
+    if getattr(request, "_comunidad_a_exportar", None) is None:
+        request._comunidad_a_exportar = get_object_or_404(Comunidad, pk=pk)
+    return request._comunidad_a_exportar
+
+
+def _etag_csv(request, pk):
+    return exportacion.etag(_comunidad_a_exportar(request, pk), "csv")
+
+
+def _etag_ics(request, pk):
+    return exportacion.etag(_comunidad_a_exportar(request, pk), "ics", host=request.get_host())
+
+
+@login_required
+@condition(etag_func=_etag_csv)
+def comunidad_eventos_csv(request, pk):
+    comunidad = _comunidad_a_exportar(request, pk)
+    response = StreamingHttpResponse(
+        exportacion.csv_en_streaming(comunidad), content_type="text/csv; charset=utf-8"
+    )
+    response["Content-Disposition"] = f'attachment; filename="comunidad-{comunidad.pk}-eventos.csv"'
+    return response
+
+
+@login_required
+@condition(etag_func=_etag_ics)
+def comunidad_eventos_ics(request, pk):
+    comunidad = _comunidad_a_exportar(request, pk)
+    response = StreamingHttpResponse(
+        exportacion.ics_en_streaming(comunidad, host=request.get_host()),
+        content_type="text/calendar; charset=utf-8",
+    )
+    response["Content-Disposition"] = f'inline; filename="comunidad-{comunidad.pk}.ics"'
+    # Los clientes de calendario deben revalidar (If-None-Match) en cada sondeo
+    response["Cache-Control"] = "private, no-cache"
+    return response
\ No newline at end of file
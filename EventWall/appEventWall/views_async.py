@@ -0,0 +1,158 @@
+"""
+Variantes async de las vistas de lectura, para servir con ASGI (uvicorn).
+
+Hacen lo mismo que sus gemelas de views.py pero con el ORM async (aget,
+async for, ain_bulk) y la API async de la caché, así bajo ASGI una petición
+no ocupa un hilo de sync_to_async mientras espera a la BD o a la caché.
+urls.py las usa en lugar de las síncronas cuando
+settings.EVENTWALL_VISTAS_ASYNC es True (asgi.py lo activa por defecto).
+
+Las plantillas se renderizan igual que siempre: antes de renderizar todo lo
+que usan ya está cargado (select_related, listas), porque una consulta
+perezosa dentro de la plantilla fallaría en contexto async.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.db import connection
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render
+from django.template.loader import render_to_string
+
+from .busqueda import LIMITE_RESULTADOS, buscar_comunidades, buscar_eventos
+from .membresias import aes_miembro, amarcar_membresia
+from .models import Comunidad, Evento
+from .paginacion import apaginar_con_series, obtener_tamano_pagina
+from . import cache_muro, directorio, en_vivo
+
+# Vistas de views.py que tienen variante aquí (mismo nombre)
+VISTAS = ("eventos_list", "evento_detalle", "comunidad_detalle", "comunidades_list", "comunidad_miembros")
+
+
+async def _usuario(request):
+    # request.user es perezoso y síncrono; lo sustituimos por el usuario ya
+    # cargado (login_required acaba de llamar a auser(), que está cacheado)
+    request.user = await request.auser()
+    return request.user
+
+
+# ------------------- EVENTOS -------------------
+
+@login_required
+async def eventos_list(request):
+    await _usuario(request)
+    q = request.GET.get("q", "").strip()
+    if q:
+        tamano = obtener_tamano_pagina(request.GET.get("page_size"))
+        # El backend FTS5 consulta su tabla al construir el queryset (cursor síncrono)
+        resultados = await sync_to_async(buscar_eventos)(q)
+        encontrados = [e async for e in resultados.select_related("comunidad")[:tamano]]
+        filas = [cache_muro.fila(e) for e in encontrados]
+        cargados, siguiente = {e.id: e for e in encontrados}, None
+    else:
+        after, page_size = request.GET.get("after"), request.GET.get("page_size")
+        filas, siguiente, cargados = await cache_muro.apagina(
+            "todos", after, page_size,
+            lambda: apaginar_con_series(Evento.objects.select_related("comunidad"), after=after, page_size=page_size),
+        )
+    eventos = await cache_muro.atarjetas("fragmentos/evento_lista.html", filas, cargados)
+    return render(request, "eventos_list.html", {"eventos": eventos, "siguiente": siguiente, "query": q})
+
+
+@login_required
+async def evento_detalle(request, pk):
+    await _usuario(request)
+
+    async def renderizar():
+        evento = await aget_object_or_404(Evento, pk=pk)
+        return render_to_string("evento_detalle.html", {"evento": evento}, request)
+
+    return HttpResponse(await cache_muro.adetalle(pk, renderizar))
+
+
+# ------------------- COMUNIDADES -------------------
+
+@login_required
+async def comunidades_list(request):
+    # La búsqueda de comunidades de verdad es ?q= en esta vista
+    # (comunidades_buscar no tiene ruta ni plantilla)
+    user = await _usuario(request)
+    q = request.GET.get("q", "").strip()
+    tus_comunidades = await amarcar_membresia(
+        [c async for c in Comunidad.objects.filter(propietario=user).order_by("-creada_en")], user
+    )
+    resultados = []
+    if q:
+        encontradas = await sync_to_async(buscar_comunidades)(q)
+        resultados = await amarcar_membresia(
+            [
+                c async for c in encontradas.exclude(propietario=user)
+                .select_related("propietario")[:LIMITE_RESULTADOS]
+            ],
+            user,
+        )
+    return render(request, "Comunidades.html", {"comunidades": tus_comunidades, "query": q, "resultados": resultados})
+
+
+@login_required
+async def comunidad_detalle(request, pk):
+    user = await _usuario(request)
+    comunidad = await aget_object_or_404(Comunidad.objects.select_related("propietario"), pk=pk)
+    after, page_size = request.GET.get("after"), request.GET.get("page_size")
+    filas, siguiente, cargados = await cache_muro.apagina(
+        f"comunidad:{comunidad.pk}", after, page_size,
+        lambda: apaginar_con_series(comunidad.eventos.all(), after=after, page_size=page_size, comunidad_id=comunidad.pk),
+    )
+    eventos = await cache_muro.atarjetas("fragmentos/evento_comunidad.html", filas, cargados)
+    # Mismas reglas que Comunidad.es_miembro
+    es_miembro = comunidad.propietario_id == user.id or await aes_miembro(user, comunidad.pk)
+    return render(request, "comunidad_detalle.html", {
+        "comunidad": comunidad, "eventos": eventos, "siguiente": siguiente, "es_miembro": es_miembro,
+        "en_vivo": en_vivo.disponible(request),
+    })
+
+
+@login_required
+async def comunidad_miembros(request, pk):
+    await _usuario(request)
+    comunidad = await aget_object_or_404(Comunidad, pk=pk)
+    q = request.GET.get("q", "").strip()
+    miembros, siguiente = await directorio.apagina(comunidad.pk, q, request.GET.get("after"), request.GET.get("page_size"))
+    return render(request, "comunidad_miembros.html", {
+        "comunidad": comunidad,
+        "miembros": miembros,
+        "siguiente": siguiente,
+        "query": q,
+        "total": await directorio.atotal(comunidad, q),
+    })
+
+
+def _soltar_conexion():
+    # Dentro de una transacción (ATOMIC_REQUESTS, tests) no se puede cerrar
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+@login_required
+async def comunidad_eventos_stream(request, pk):
+    """
+    Server-Sent Events con los eventos creados/editados/borrados de la
+    comunidad (ver en_vivo.py). Solo funciona con ASGI: con WSGI la
+    respuesta no se manda hasta que acaba el generador, que no acaba nunca,
+    así que se responde 204 (EventSource no reintenta). El bucle del stream
+    es todo async; el hilo que Django abre por petición para el código
+    síncrono (middlewares) sigue existiendo, parado, hasta que se cierra la
+    conexión.
+    """
+    if not en_vivo.disponible(request):
+        return HttpResponse(status=204)
+    await _usuario(request)
+    if not await Comunidad.objects.filter(pk=pk).aexists():
+        raise Http404
+    # La conexión SSE puede durar horas: que no retenga la conexión a la BD
+    # (la del hilo de la petición, que es el que usa el ORM async)
+    await sync_to_async(_soltar_conexion)()
+    response = StreamingHttpResponse(en_vivo.escuchar(en_vivo.canal_comunidad(pk)), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # nginx: no acumular la respuesta en su búfer
+    response["X-Accel-Buffering"] = "no"
+    return response